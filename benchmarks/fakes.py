@@ -0,0 +1,189 @@
+import asyncio
+import itertools
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from outbound import OutboundScheduler
+
+class FakeDiscord:
+    """Stands in for the Discord REST API behind the fake objects.
+
+    Every REST call sleeps for the configured latency and is counted by kind.
+    Calls that make something visible to users (webhook posts, channel
+    messages, reactions, DMs and followups) are reported to on_delivery with
+    the display name of the user whose message, reaction or command caused it.
+    """
+
+    def __init__(self, latency: float = 0.05, on_delivery: Optional[Callable[[str], None]] = None):
+        self.latency = latency
+        self.on_delivery = on_delivery
+        self.calls: Counter = Counter()
+        self._ids = itertools.count(10 ** 17)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    async def rest(self, kind: str):
+        self.calls[kind] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def deliver(self, key: str):
+        if self.on_delivery:
+            self.on_delivery(key)
+
+class FakeAsset:
+    def __init__(self, url: str):
+        self.url = url
+
+class FakePermissions:
+    def __init__(self, read_messages: bool = True):
+        self.read_messages = read_messages
+
+class FakeUser:
+    """A user or member; the display name doubles as the key deliveries are reported under"""
+
+    def __init__(self, discord: FakeDiscord, user_id: int, name: str, bot: bool = False):
+        self._discord = discord
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.mention = f"<@{user_id}>"
+        self.display_avatar = FakeAsset(f"https://cdn.discordapp.com/embed/avatars/{user_id % 6}.png")
+
+    async def send(self, content: Optional[str] = None, **kwargs):
+        await self._discord.rest('dm_send')
+        self._discord.deliver(self.display_name)
+
+class FakeGuild:
+    def __init__(self, discord: FakeDiscord, guild_id: int):
+        self._discord = discord
+        self.id = guild_id
+        self.name = f"guild-{guild_id}"
+        self.channels: Dict[int, 'FakeChannel'] = {}
+
+    def get_channel_or_thread(self, channel_id: int) -> Optional['FakeChannel']:
+        return self.channels.get(channel_id)
+
+class FakeWebhook:
+    def __init__(self, discord: FakeDiscord, channel: 'FakeChannel', name: str):
+        self._discord = discord
+        self.channel = channel
+        self.id = discord.next_id()
+        self.name = name
+        self.token = f"token-{self.id}"
+
+    async def send(self, content: Optional[str] = None, username: Optional[str] = None, avatar_url: Optional[str] = None, **kwargs):
+        await self._discord.rest('webhook_send')
+        # Translation posts are named "<flags> <author display name>"
+        if username:
+            self._discord.deliver(username.rsplit(' ', 1)[-1])
+
+class FakeChannel:
+    def __init__(self, discord: FakeDiscord, channel_id: int, guild: FakeGuild, members: List[FakeUser]):
+        self._discord = discord
+        self.id = channel_id
+        self.name = f"channel-{channel_id}"
+        self.guild = guild
+        self.members = members
+        self.messages: Dict[int, 'FakeMessage'] = {}
+        self._webhooks: List[FakeWebhook] = []
+        guild.channels[channel_id] = self
+
+    def permissions_for(self, member: FakeUser) -> FakePermissions:
+        return FakePermissions(read_messages=True)
+
+    async def webhooks(self) -> List[FakeWebhook]:
+        await self._discord.rest('webhooks_fetch')
+        return list(self._webhooks)
+
+    async def create_webhook(self, name: str, **kwargs) -> FakeWebhook:
+        await self._discord.rest('webhook_create')
+        webhook = FakeWebhook(self._discord, self, name)
+        self._webhooks.append(webhook)
+        return webhook
+
+    async def fetch_message(self, message_id: int) -> Optional['FakeMessage']:
+        await self._discord.rest('message_fetch')
+        return self.messages.get(message_id)
+
+    async def send(self, content: Optional[str] = None, **kwargs):
+        await self._discord.rest('channel_send')
+
+class FakeMessage:
+    def __init__(self, discord: FakeDiscord, channel: FakeChannel, author: FakeUser, content: str):
+        self._discord = discord
+        self.id = discord.next_id()
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.reference = None
+        self.reactions = []
+        self.jump_url = f"https://discord.com/channels/{channel.guild.id}/{channel.id}/{self.id}"
+        channel.messages[self.id] = self
+
+    async def add_reaction(self, emoji: str):
+        await self._discord.rest('reaction_add')
+        self._discord.deliver(self.author.display_name)
+
+class FakeReactionPayload:
+    """The parts of discord.RawReactionActionEvent the reaction listeners read"""
+
+    def __init__(self, user_id: int, emoji: str, message: FakeMessage):
+        self.user_id = user_id
+        self.emoji = emoji
+        self.message_id = message.id
+        self.channel_id = message.channel.id
+        self.guild_id = message.guild.id
+
+class FakeInteractionResponse:
+    def __init__(self, discord: FakeDiscord):
+        self._discord = discord
+
+    async def defer(self, ephemeral: bool = False, **kwargs):
+        await self._discord.rest('interaction_defer')
+
+class FakeFollowup:
+    def __init__(self, discord: FakeDiscord, user: FakeUser):
+        self._discord = discord
+        self._user = user
+
+    async def send(self, content: Optional[str] = None, **kwargs):
+        await self._discord.rest('followup_send')
+        self._discord.deliver(self._user.display_name)
+
+class FakeInteraction:
+    def __init__(self, discord: FakeDiscord, user: FakeUser, channel: FakeChannel):
+        self.id = discord.next_id()
+        self.user = user
+        self.guild_id = channel.guild.id
+        self.channel_id = channel.id
+        self.response = FakeInteractionResponse(discord)
+        self.followup = FakeFollowup(discord, user)
+
+class FakeBot:
+    """The parts of TranslatorBot the cogs use, with the real outbound scheduler"""
+
+    def __init__(self, discord: FakeDiscord):
+        self._discord = discord
+        self.user = FakeUser(discord, discord.next_id(), 'TongueTwist', bot=True)
+        self.outbound = OutboundScheduler()
+        self.channels: Dict[int, FakeChannel] = {}
+        self.users: Dict[int, FakeUser] = {}
+
+    def add_channel(self, channel: FakeChannel):
+        self.channels[channel.id] = channel
+        for member in channel.members:
+            self.users[member.id] = member
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.channels.get(channel_id)
+
+    async def fetch_user(self, user_id: int) -> Optional[FakeUser]:
+        await self._discord.rest('user_fetch')
+        return self.users.get(user_id)
+
+    def dispatch(self, event: str, *args, **kwargs):
+        pass
@@ -0,0 +1,128 @@
+import asyncio
+import random
+from collections import Counter
+from typing import List, Optional
+
+from aiohttp import web
+
+class MockProviderServer:
+    """Local aiohttp server that answers like Google Translate, DeepL and LibreTranslate.
+
+    Translations are the input prefixed with the target language, so masked
+    markup placeholders survive the round trip. Every request waits for the
+    configured latency (plus jitter) and then fails with a 500 or a 429 at the
+    configured rates.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.1,
+        jitter: float = 0.05,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.host = host
+        self.port = port
+        self.random = random.Random(seed)
+        # (provider, endpoint) -> requests, and (provider, status) -> responses
+        self.calls: Counter = Counter()
+        self.responses: Counter = Counter()
+        self.characters: Counter = Counter()
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_post('/google/language/translate/v2', self._google_translate)
+        self.app.router.add_post('/google/language/translate/v2/detect', self._google_detect)
+        self.app.router.add_post('/deepl/v2/translate', self._deepl_translate)
+        self.app.router.add_post('/libre/translate', self._libre_translate)
+        # Connection warm-up sends HEAD requests
+        self.app.router.add_route('HEAD', '/{tail:.*}', self._head)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Port 0 asks the OS for a free port; read back the one we got
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def upstream_calls(self, provider: Optional[str] = None) -> int:
+        return sum(count for (name, _), count in self.calls.items() if provider is None or name == provider)
+
+    async def _simulate(self, provider: str, endpoint: str) -> Optional[web.Response]:
+        """Wait out the simulated latency and return an error response if this request should fail"""
+        self.calls[provider, endpoint] += 1
+        delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            self.responses[provider, 429] += 1
+            return web.json_response({'message': 'Too many requests'}, status=429, headers={'Retry-After': '1'})
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.responses[provider, 500] += 1
+            return web.json_response({'message': 'Internal error'}, status=500)
+        self.responses[provider, 200] += 1
+        return None
+
+    def _translate_texts(self, provider: str, texts: List[str], target_lang: str) -> List[str]:
+        self.characters[provider] += sum(len(text) for text in texts)
+        return [f"[{target_lang.lower()}] {text}" for text in texts]
+
+    async def _head(self, request: web.Request) -> web.Response:
+        return web.Response()
+
+    async def _google_translate(self, request: web.Request) -> web.Response:
+        error = await self._simulate('google', 'translate')
+        if error:
+            return error
+        form = await request.post()
+        translated = self._translate_texts('google', form.getall('q', []), form['target'])
+        return web.json_response({
+            'data': {'translations': [{'translatedText': text} for text in translated]}
+        })
+
+    async def _google_detect(self, request: web.Request) -> web.Response:
+        error = await self._simulate('google', 'detect')
+        if error:
+            return error
+        return web.json_response({
+            'data': {'detections': [[{'language': 'en', 'confidence': 1.0, 'isReliable': True}]]}
+        })
+
+    async def _deepl_translate(self, request: web.Request) -> web.Response:
+        error = await self._simulate('deepl', 'translate')
+        if error:
+            return error
+        form = await request.post()
+        translated = self._translate_texts('deepl', form.getall('text', []), form['target_lang'])
+        return web.json_response({
+            'translations': [{'detected_source_language': 'EN', 'text': text} for text in translated]
+        })
+
+    async def _libre_translate(self, request: web.Request) -> web.Response:
+        error = await self._simulate('libre', 'translate')
+        if error:
+            return error
+        payload = await request.json()
+        texts = payload['q'] if isinstance(payload['q'], list) else [payload['q']]
+        translated = self._translate_texts('libre', texts, payload['target'])
+        return web.json_response({
+            'translatedText': translated if isinstance(payload['q'], list) else translated[0]
+        })
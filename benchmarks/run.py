@@ -0,0 +1,309 @@
+"""Offline throughput benchmark for the translation cogs.
+
+Replays a synthetic workload of auto-translated messages, flag reactions and
+/translate commands through the real AutoTranslate, ReactionTranslate and
+SlashCommands cogs. Discord is replaced by the stubs in benchmarks/fakes.py and
+the translation APIs by a local mock server, so no token or API key is needed.
+
+    python -m benchmarks.run --workload mixed --messages 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.mock_providers import MockProviderServer
+
+# Share of each job kind in the mixed workload
+MIXED_WORKLOAD = {'auto': 0.8, 'reaction': 0.15, 'slash': 0.05}
+
+SENTENCES = [
+    "Good morning everyone, how is the raid going?",
+    "Can someone help me set up the new bot permissions?",
+    "I just pushed the patch notes to the announcements channel.",
+    "The server will be down for maintenance tonight at 10 PM UTC.",
+    "Has anyone tried the new map yet? The final boss is brutal.",
+    "Check out https://example.com/guide for the full walkthrough.",
+    "Thanks <@123456789012345678>, that fixed it!",
+    "Use `!help` if you get stuck, or ask in the support channel.",
+    "We are looking for two more players for the weekend tournament.",
+    "Please keep this channel on topic and be kind to each other.",
+]
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the translation cogs against fake Discord and mock providers")
+    parser.add_argument('--workload', choices=['auto', 'reaction', 'slash', 'mixed'], default='mixed')
+    parser.add_argument('--messages', type=int, default=300, help="Number of messages, reactions and commands to replay")
+    parser.add_argument('--concurrency', type=int, default=50, help="Jobs in flight at once")
+    parser.add_argument('--guilds', type=int, default=4)
+    parser.add_argument('--channels', type=int, default=2, help="Auto-translate channels per guild")
+    parser.add_argument('--members', type=int, default=20, help="Members per channel")
+    parser.add_argument('--languages', default='en,fr,de,es,ja', help="Comma-separated member languages")
+    parser.add_argument('--providers', default='google,deepl,libre', help="Comma-separated providers to enable")
+    parser.add_argument('--long-ratio', type=float, default=0.1, help="Share of messages long enough to be segmented")
+    parser.add_argument('--repeat-ratio', type=float, default=0.3, help="Share of messages reusing a popular text")
+    parser.add_argument('--provider-latency', type=float, default=0.1, help="Mean mock provider latency in seconds")
+    parser.add_argument('--provider-jitter', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of provider requests answered with a 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Share of provider requests answered with a 429")
+    parser.add_argument('--discord-latency', type=float, default=0.05, help="Latency of each fake Discord REST call")
+    parser.add_argument('--no-rate-limits', action='store_true', help="Lift the providers' configured request rates")
+    parser.add_argument('--budgets', action='store_true', help="Keep the configured character budgets")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    parser.add_argument('--verbose', action='store_true', help="Show the bot's log output")
+    return parser.parse_args(argv)
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+class Job:
+    """One replayed message, reaction or command and when its results reached Discord"""
+
+    def __init__(self, kind: str, key: str):
+        self.kind = kind
+        self.key = key
+        self.started = 0.0
+        self.finished = 0.0
+        self.last_delivery = 0.0
+        self.deliveries = 0
+
+    @property
+    def latency(self) -> float:
+        """From the event arriving to the handler returning or the last post landing, whichever is later"""
+        return max(self.finished, self.last_delivery) - self.started
+
+def build_texts(rng: random.Random, count: int, long_ratio: float, repeat_ratio: float) -> List[str]:
+    """Synthetic message texts; a few popular ones repeat so the cache and coalescing get exercised"""
+    popular = [rng.choice(SENTENCES) for _ in range(5)]
+    texts = []
+    for index in range(count):
+        if rng.random() < repeat_ratio:
+            texts.append(rng.choice(popular))
+        elif rng.random() < long_ratio:
+            paragraphs = [' '.join(rng.choice(SENTENCES) for _ in range(8)) for _ in range(6)]
+            texts.append('\n\n'.join(paragraphs) + f" (#{index})")
+        else:
+            texts.append(f"{rng.choice(SENTENCES)} {rng.choice(SENTENCES)} (#{index})")
+    return texts
+
+def configure(args: argparse.Namespace, server_url: str):
+    """Point the providers at the mock server and apply the benchmark's overrides, before the services are created"""
+    from config import CONFIG, TRANSLATION_SERVICES
+
+    enabled = set(args.providers.split(','))
+    paths = {'google': '/google/language/translate/v2', 'deepl': '/deepl/v2/translate', 'libre': '/libre'}
+    for name, settings in TRANSLATION_SERVICES.items():
+        settings['enabled'] = name in enabled
+        settings['api_key'] = 'benchmark' if settings.get('requires_api_key', True) else ''
+        settings['base_url'] = server_url + paths[name]
+        if args.no_rate_limits:
+            settings['requests_per_minute'] = 10 ** 9
+            settings['burst'] = 10 ** 6
+        if not args.budgets:
+            settings['daily_char_budget'] = None
+            settings['monthly_char_budget'] = None
+    if not args.budgets:
+        for key in ('guild_daily_chars', 'guild_monthly_chars', 'channel_daily_chars', 'channel_monthly_chars'):
+            CONFIG['budgets'][key] = None
+    CONFIG['http']['warm_up'] = False
+
+async def drain(outbound, timeout: float = 60.0):
+    """Wait for every queued outbound job to finish"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = outbound.stats
+        if stats['completed'] + stats['failed'] >= stats['submitted']:
+            return
+        await asyncio.sleep(0.01)
+
+async def run(args: argparse.Namespace) -> Dict:
+    rng = random.Random(args.seed)
+    server = MockProviderServer(
+        latency=args.provider_latency,
+        jitter=args.provider_jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed
+    )
+    await server.start()
+
+    # The bot keeps its databases and budget state in the working directory
+    previous_cwd = os.getcwd()
+    workdir = tempfile.TemporaryDirectory(prefix='tonguetwist-bench-')
+    os.chdir(workdir.name)
+    os.environ['DATABASE_BACKEND'] = 'sqlite'
+    os.environ['TRANSLATION_CACHE_PATH'] = os.path.join(workdir.name, 'translation_cache.db')
+    os.environ['BUDGET_STATE_PATH'] = os.path.join(workdir.name, 'budget_state.json')
+    try:
+        configure(args, server.base_url)
+
+        from config import LANGUAGE_TO_FLAG
+        from database import db
+        from translation import translation_service
+        from cogs.auto_translate import AutoTranslate
+        from cogs.reaction_translate import ReactionTranslate
+        from cogs.slash_commands import SlashCommands
+        from benchmarks.fakes import FakeBot, FakeChannel, FakeDiscord, FakeGuild, FakeInteraction, FakeMessage, FakeReactionPayload, FakeUser
+
+        jobs: Dict[str, Job] = {}
+
+        def on_delivery(key: str):
+            job = jobs.get(key)
+            if job:
+                job.deliveries += 1
+                job.last_delivery = time.perf_counter()
+
+        discord = FakeDiscord(args.discord_latency, on_delivery)
+        bot = FakeBot(discord)
+        auto_translate = AutoTranslate(bot)
+        reaction_translate = ReactionTranslate(bot)
+        slash_commands = SlashCommands(bot)
+
+        # Guilds and auto-translate channels whose members prefer the benchmark's languages
+        languages = args.languages.split(',')
+        channels = []
+        for _ in range(args.guilds):
+            guild = FakeGuild(discord, discord.next_id())
+            await db.set_guild_auto_translate(guild.id, True)
+            for _ in range(args.channels):
+                members = []
+                for _ in range(args.members):
+                    member = FakeUser(discord, discord.next_id(), f"member-{len(bot.users)}")
+                    await db.set_user_language(member.id, rng.choice(languages))
+                    members.append(member)
+                    bot.users[member.id] = member
+                channel = FakeChannel(discord, discord.next_id(), guild, members)
+                await db.add_guild_channel_auto_translate(guild.id, channel.id)
+                bot.add_channel(channel)
+                channels.append(channel)
+
+        # Each job has its own author so its posts can be told apart by the webhook username
+        mix = MIXED_WORKLOAD if args.workload == 'mixed' else {args.workload: 1.0}
+        kinds = rng.choices(list(mix), weights=list(mix.values()), k=args.messages)
+        texts = build_texts(rng, args.messages, args.long_ratio, args.repeat_ratio)
+        flags = [LANGUAGE_TO_FLAG[language] for language in languages if language in LANGUAGE_TO_FLAG]
+        handlers = []
+        for index, (kind, text) in enumerate(zip(kinds, texts)):
+            channel = rng.choice(channels)
+            author = FakeUser(discord, discord.next_id(), f"bench-{index}")
+            bot.users[author.id] = author
+            jobs[author.display_name] = job = Job(kind, author.display_name)
+            if kind == 'auto':
+                message = FakeMessage(discord, channel, author, text)
+                handlers.append((job, lambda message=message: auto_translate.on_message(message)))
+            elif kind == 'reaction':
+                message = FakeMessage(discord, channel, author, text)
+                payload = FakeReactionPayload(rng.choice(channel.members).id, rng.choice(flags), message)
+                handlers.append((job, lambda payload=payload: reaction_translate.on_raw_reaction_add(payload)))
+            else:
+                interaction = FakeInteraction(discord, author, channel)
+                target = rng.choice(languages)
+                handlers.append((job, lambda interaction=interaction, text=text, target=target: slash_commands.translate.callback(
+                    slash_commands, interaction, text, target, None, False
+                )))
+
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async def replay(job: Job, handler):
+            async with slots:
+                job.started = time.perf_counter()
+                await handler()
+                job.finished = time.perf_counter()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(replay(job, handler) for job, handler in handlers))
+        await drain(bot.outbound)
+        elapsed = time.perf_counter() - started
+
+        report = build_report(args, list(jobs.values()), elapsed, server, discord.calls)
+
+        await bot.outbound.close()
+        await translation_service.close()
+        await db.close()
+        return report
+    finally:
+        os.chdir(previous_cwd)
+        await server.close()
+        workdir.cleanup()
+
+def build_report(args: argparse.Namespace, jobs: List[Job], elapsed: float, server: MockProviderServer, discord_calls: Counter) -> Dict:
+    def latency_summary(selected: List[Job]) -> Dict:
+        latencies = [job.latency for job in selected]
+        return {
+            'count': len(selected),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'max_ms': round(max(latencies, default=0.0) * 1000, 1),
+        }
+
+    upstream_calls = server.upstream_calls()
+    return {
+        'workload': args.workload,
+        'messages': len(jobs),
+        'concurrency': args.concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'messages_per_s': round(len(jobs) / elapsed, 1) if elapsed else 0.0,
+        'latency': latency_summary(jobs),
+        'latency_by_kind': {
+            kind: latency_summary([job for job in jobs if job.kind == kind])
+            for kind in sorted({job.kind for job in jobs})
+        },
+        'undelivered': sum(1 for job in jobs if not job.deliveries),
+        'upstream_calls': upstream_calls,
+        'upstream_calls_per_message': round(upstream_calls / len(jobs), 3) if jobs else 0.0,
+        'upstream_by_provider': {
+            f"{provider}/{endpoint}": count for (provider, endpoint), count in sorted(server.calls.items())
+        },
+        'upstream_responses': {
+            f"{provider}/{status}": count for (provider, status), count in sorted(server.responses.items())
+        },
+        'upstream_characters': dict(server.characters),
+        'discord_calls': dict(sorted(discord_calls.items())),
+    }
+
+def print_report(report: Dict):
+    latency = report['latency']
+    print(f"Workload:        {report['workload']} ({report['messages']} jobs, concurrency {report['concurrency']})")
+    print(f"Elapsed:         {report['elapsed_s']:.2f} s")
+    print(f"Throughput:      {report['messages_per_s']:.1f} msgs/s")
+    print(f"End-to-end:      p50 {latency['p50_ms']:.1f} ms, p99 {latency['p99_ms']:.1f} ms, max {latency['max_ms']:.1f} ms")
+    for kind, summary in report['latency_by_kind'].items():
+        print(f"  {kind:<13}  {summary['count']:>5} jobs, p50 {summary['p50_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms")
+    print(f"Undelivered:     {report['undelivered']}")
+    print(f"Upstream calls:  {report['upstream_calls']} ({report['upstream_calls_per_message']:.3f} per message)")
+    for name, count in report['upstream_by_provider'].items():
+        print(f"  {name:<22} {count}")
+    print("Upstream responses: " + ', '.join(f"{name} {count}" for name, count in report['upstream_responses'].items()))
+    print("Discord calls:      " + ', '.join(f"{name} {count}" for name, count in report['discord_calls'].items()))
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.CRITICAL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,11 @@ logger = logging.getLogger('discord')
 
 # Import config
 from config import CONFIG
+from budget import budget_manager
+from database import db
+from translation import translation_service
+from metrics import REGISTRY, CallbackMetric
+from outbound import OutboundScheduler
 
 # Create bot instance with all intents
 intents = discord.Intents.default()
@@ -40,7 +45,35 @@ class TranslatorBot(commands.Bot):
             'cogs.reaction_translate',
             'cogs.slash_commands'
         ]
+        # Queues every outbound Discord REST call from the cogs by rate-limit route
+        self.outbound = OutboundScheduler()
+        self.warm_up_task = None
+        self.language_refresh_task = None
+        self._register_metrics()
         
+    def _register_metrics(self):
+        """Expose the outbound scheduler's queues and counters on /metrics"""
+        def queue_depths():
+            # Routes are per channel or interaction, so group them by kind to keep the label set small
+            depths = {}
+            for route, depth in self.outbound.queue_depths().items():
+                key = (('route', route.split(':', 1)[0]),)
+                depths[key] = depths.get(key, 0) + depth
+            return depths
+
+        REGISTRY.register(CallbackMetric(
+            'tonguetwist_outbound_queue_depth',
+            'Discord REST calls waiting in the outbound scheduler, by route kind',
+            'gauge',
+            queue_depths
+        ))
+        REGISTRY.register(CallbackMetric(
+            'tonguetwist_outbound_jobs_total',
+            'Discord REST calls handled by the outbound scheduler, by outcome',
+            'counter',
+            lambda: {(('outcome', outcome),): count for outcome, count in self.outbound.stats.items()}
+        ))
+
     async def setup_hook(self):
         """Setup hook is called when the bot is first starting up"""
         for extension in self.initial_extensions:
@@ -50,6 +83,12 @@ class TranslatorBot(commands.Bot):
             except Exception as e:
                 logger.error(f"Failed to load extension {extension}: {e}")
         
+        # Open provider connections in the background so startup isn't held up by slow providers
+        if CONFIG['http']['warm_up']:
+            self.warm_up_task = asyncio.create_task(translation_service.warm_up())
+        if CONFIG['http']['language_refresh_interval']:
+            self.language_refresh_task = asyncio.create_task(self._refresh_languages())
+        
         # Sync slash commands
         logger.info("Syncing slash commands...")
         try:
@@ -59,6 +98,24 @@ class TranslatorBot(commands.Bot):
         except Exception as e:
             logger.error(f"Failed to sync commands: {e}")
             
+    async def _refresh_languages(self):
+        """Keep each provider's language index in line with its languages endpoint"""
+        while True:
+            await translation_service.refresh_languages()
+            await asyncio.sleep(CONFIG['http']['language_refresh_interval'])
+
+    async def close(self):
+        """Release outbound, translation, budget and database resources before disconnecting"""
+        for task in (self.warm_up_task, self.language_refresh_task):
+            if task and not task.done():
+                task.cancel()
+        await self.outbound.close()
+        await translation_service.close()
+        await budget_manager.flush()
+        await db.flush()
+        await db.close()
+        await super().close()
+            
     async def on_ready(self):
         """Called when the bot is ready"""
         logger.info(f'Logged in as {self.user} (ID: {self.user.id})')
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import aiofiles
+import aiofiles.os
+
+from config import CONFIG, TRANSLATION_SERVICES
+
+logger = logging.getLogger('discord')
+
+# Budget levels, from least to most restricted
+OK = 'ok'
+SOFT = 'soft'  # Past the soft limit: degrade to cheaper ways of translating
+HARD = 'hard'  # Past the limit: no more upstream requests until the period rolls over
+
+_LEVELS = [OK, SOFT, HARD]
+
+class BudgetManager:
+    """Counts characters sent upstream per provider, guild and channel, and enforces daily and monthly budgets.
+
+    Usage is kept in memory and written to a JSON file in the background so it
+    survives restarts. The dashboard reads it from another thread, so every
+    access goes through a lock.
+    """
+
+    def __init__(self, filename: str = None):
+        self.filename = filename or CONFIG['budgets']['path']
+        self._lock = threading.Lock()
+        self._flush_handle = None
+        self._flush_task = None
+        self._dirty = False
+        self.data = self._empty(time.gmtime())
+        self._load_sync()
+
+    @staticmethod
+    def _empty(now: time.struct_time) -> Dict:
+        return {
+            'day': time.strftime('%Y-%m-%d', now),
+            'month': time.strftime('%Y-%m', now),
+            'daily': {'providers': {}, 'guilds': {}, 'channels': {}},
+            'monthly': {'providers': {}, 'guilds': {}, 'channels': {}},
+        }
+
+    def _load_sync(self):
+        """Load saved usage, starting fresh if there is none or it can't be read"""
+        try:
+            if os.path.exists(self.filename):
+                with open(self.filename, 'r') as f:
+                    content = f.read()
+                if content.strip():
+                    self.data.update(json.loads(content))
+                    logger.info(f"Budget state loaded from {self.filename}")
+        except Exception as e:
+            logger.error(f"Error loading budget state, starting from zero: {e}")
+        self._roll()
+
+    def _roll(self):
+        """Reset counters whose day or month has passed (caller holds the lock or is __init__)"""
+        now = time.gmtime()
+        day = time.strftime('%Y-%m-%d', now)
+        month = time.strftime('%Y-%m', now)
+        if self.data['day'] != day:
+            self.data['day'] = day
+            self.data['daily'] = {'providers': {}, 'guilds': {}, 'channels': {}}
+        if self.data['month'] != month:
+            self.data['month'] = month
+            self.data['monthly'] = {'providers': {}, 'guilds': {}, 'channels': {}}
+
+    def _add(self, kind: str, key: str, characters: int):
+        for period in ('daily', 'monthly'):
+            usage = self.data[period][kind]
+            usage[key] = usage.get(key, 0) + characters
+
+    def charge_provider(self, provider: str, characters: int):
+        """Count characters sent to a provider, answered or not"""
+        with self._lock:
+            self._roll()
+            self._add('providers', provider, characters)
+        self._mark_dirty()
+
+    def charge_scope(self, guild_id: Optional[int], channel_id: Optional[int], characters: int):
+        """Count characters sent upstream on behalf of a guild and channel"""
+        if guild_id is None and channel_id is None:
+            return
+        with self._lock:
+            self._roll()
+            if guild_id is not None:
+                self._add('guilds', str(guild_id), characters)
+            if channel_id is not None:
+                self._add('channels', str(channel_id), characters)
+        self._mark_dirty()
+
+    @staticmethod
+    def _level(used: int, limit: Optional[int]) -> str:
+        if not limit:
+            return OK
+        if used >= limit:
+            return HARD
+        if used >= limit * CONFIG['budgets']['soft_limit']:
+            return SOFT
+        return OK
+
+    def _usage_level(self, kind: str, key: str, daily_limit: Optional[int], monthly_limit: Optional[int]) -> str:
+        with self._lock:
+            self._roll()
+            daily = self.data['daily'][kind].get(key, 0)
+            monthly = self.data['monthly'][kind].get(key, 0)
+        return max(self._level(daily, daily_limit), self._level(monthly, monthly_limit), key=_LEVELS.index)
+
+    def provider_level(self, provider: str) -> str:
+        settings = TRANSLATION_SERVICES.get(provider, {})
+        return self._usage_level(
+            'providers', provider, settings.get('daily_char_budget'), settings.get('monthly_char_budget')
+        )
+
+    def scope_level(self, guild_id: Optional[int], channel_id: Optional[int]) -> str:
+        """The stricter of the guild's and the channel's budget levels"""
+        settings = CONFIG['budgets']
+        level = OK
+        if guild_id is not None:
+            level = self._usage_level(
+                'guilds', str(guild_id), settings['guild_daily_chars'], settings['guild_monthly_chars']
+            )
+        if channel_id is not None:
+            channel_level = self._usage_level(
+                'channels', str(channel_id), settings['channel_daily_chars'], settings['channel_monthly_chars']
+            )
+            level = max(level, channel_level, key=_LEVELS.index)
+        return level
+
+    @staticmethod
+    def is_free(provider: str) -> bool:
+        """Whether the provider costs nothing per character"""
+        return not TRANSLATION_SERVICES.get(provider, {}).get('cost_per_million')
+
+    def snapshot(self) -> Dict:
+        """Usage, limits and estimated cost, for the dashboard"""
+        with self._lock:
+            self._roll()
+            data = json.loads(json.dumps(self.data))
+
+        providers = []
+        for name, settings in TRANSLATION_SERVICES.items():
+            monthly = data['monthly']['providers'].get(name, 0)
+            providers.append({
+                'name': name,
+                'daily': data['daily']['providers'].get(name, 0),
+                'monthly': monthly,
+                'daily_limit': settings.get('daily_char_budget'),
+                'monthly_limit': settings.get('monthly_char_budget'),
+                'level': self.provider_level(name),
+                'monthly_cost': monthly / 1_000_000 * (settings.get('cost_per_million') or 0),
+            })
+
+        # The busiest guilds are enough for an overview
+        guilds = sorted(data['monthly']['guilds'].items(), key=lambda item: item[1], reverse=True)[:10]
+        return {
+            'day': data['day'],
+            'month': data['month'],
+            'providers': providers,
+            'guilds': [
+                {
+                    'id': guild_id,
+                    'daily': data['daily']['guilds'].get(guild_id, 0),
+                    'monthly': monthly,
+                    'level': self.scope_level(int(guild_id), None),
+                }
+                for guild_id, monthly in guilds
+            ],
+        }
+
+    def _mark_dirty(self):
+        """Schedule a save; usage changes on every translation, so saves are batched"""
+        self._dirty = True
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._flush_handle = loop.call_later(CONFIG['budgets']['flush_interval'], self._start_flush)
+
+    def _start_flush(self):
+        self._flush_handle = None
+        self._flush_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        """Write usage to disk now, atomically"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._dirty:
+            return
+        self._dirty = False
+        with self._lock:
+            content = json.dumps(self.data, indent=2)
+        try:
+            temp_filename = f"{self.filename}.tmp"
+            async with aiofiles.open(temp_filename, 'w') as f:
+                await f.write(content)
+            await aiofiles.os.replace(temp_filename, self.filename)
+            logger.debug(f"Budget state saved to {self.filename}")
+        except Exception as e:
+            self._dirty = True
+            logger.error(f"Error saving budget state: {e}")
+
+# Create the budget manager instance
+budget_manager = BudgetManager()
@@ -1,13 +1,21 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import logging
 import asyncio
-from typing import Dict, List, Union
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple, Union
 
 from config import CONFIG, LANGUAGES
+from budget import HARD, OK, budget_manager
 from database import db
+from metrics import HANDLED_TOTAL, STAGE_SECONDS
+from outbound import BACKGROUND, INTERACTIVE
 from translation import translation_service
-from utils.message_utils import send_translated_message
+from translation_scheduler import DeadlineExceeded, translation_scheduler
+from utils.audience_index import AudienceIndex
+from utils.message_utils import invalidate_webhooks, send_combined_translation, send_translated_message, warm_webhooks
+from utils.text_segmentation import join_segments, split_segments
 
 logger = logging.getLogger('discord')
 
@@ -16,7 +24,39 @@ class AutoTranslate(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
-        self.message_cache = {}  # Store original messages that have been translated
+        # Store original messages that have been translated, oldest first
+        self.message_cache: 'OrderedDict[int, Dict]' = OrderedDict()
+        # Distinct member languages per auto-translate channel
+        self.audience = AudienceIndex(db.get_user_language)
+    
+    async def cog_load(self):
+        self.compact_messages.start()
+    
+    async def cog_unload(self):
+        self.compact_messages.cancel()
+    
+    @tasks.loop(seconds=CONFIG['message_retention']['compaction_interval'])
+    async def compact_messages(self):
+        """Drop expired translations from the message cache and the database"""
+        try:
+            self._prune_message_cache()
+            removed = await db.compact_messages(
+                CONFIG['message_retention']['max_age'],
+                CONFIG['message_retention']['max_entries']
+            )
+            if removed:
+                logger.info(f"Compacted {removed} expired message translations")
+        except Exception as e:
+            logger.error(f"Error compacting message translations: {e}")
+    
+    def _prune_message_cache(self):
+        """Evict message cache entries that are too old or over the size limit"""
+        cutoff = time.time() - CONFIG['message_retention']['max_age']
+        while self.message_cache:
+            oldest = next(iter(self.message_cache.values()))
+            if oldest['created_at'] >= cutoff and len(self.message_cache) <= CONFIG['message_retention']['cache_entries']:
+                break
+            self.message_cache.popitem(last=False)
     
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
@@ -29,46 +69,86 @@ class AutoTranslate(commands.Cog):
         if not message.guild:
             return
             
-        # Check if auto-translate is enabled for this guild
-        auto_translate_enabled = await db.get_guild_auto_translate(message.guild.id)
-        if not auto_translate_enabled:
-            return
-            
-        # Check if auto-translate is enabled for this channel
-        auto_translate_channels = await db.get_guild_channels_auto_translate(message.guild.id)
-        if str(message.channel.id) not in auto_translate_channels:
+        # Check if auto-translate is enabled for this guild and channel (in-memory index, no I/O).
+        # Most messages stop here, so this check stays untimed; timing starts once it passes
+        if not db.is_auto_translate_channel(message.guild.id, message.channel.id):
             return
             
         # Get message content
         content = message.content
         if not content or len(content.strip()) == 0:
             return
-            
+        
+        started = time.perf_counter()
+        outcome = 'error'
         try:
             # Detect the language of the message
-            source_lang = await translation_service.detect_language(content)
+            with STAGE_SECONDS.time(handler='auto_translate', stage='detect_language'):
+                source_lang = await translation_service.detect_language(content)
             
-            # Get members who will receive translated messages
-            members = [member for member in message.channel.members if not member.bot]
+            # Collect the distinct target languages of the channel's audience before translating anything
+            with STAGE_SECONDS.time(handler='auto_translate', stage='member_scan'):
+                audience_langs = await self.audience.ensure(message.channel)
+            target_langs = audience_langs - {source_lang}
             
-            # Track translations to avoid duplicates
-            translations = {}
+            # Past the channel's or guild's character budget, auto-translate stops or narrows to the biggest audiences
+            budget_level = budget_manager.scope_level(message.guild.id, message.channel.id)
+            if budget_level == HARD:
+                logger.warning(f"Translation budget exhausted for channel {message.channel.id}, skipping auto-translate")
+                outcome = 'over_budget'
+                return
+            if budget_level != OK:
+                counts = self.audience.language_counts(message.channel.id)
+                top_langs = sorted(target_langs, key=lambda lang: counts[lang], reverse=True)
+                target_langs = set(top_langs[:CONFIG['budgets']['degraded_languages']])
             
-            # Translate for each member with a different language preference
-            for member in members:
-                # Get member's preferred language
-                target_lang = await db.get_user_language(member.id)
-                
-                # Skip if member's language is the same as source, or already translated
-                if target_lang == source_lang or target_lang in translations:
+            # Combined channels get one post with every language instead of one post per language
+            with STAGE_SECONDS.time(handler='auto_translate', stage='config_lookup'):
+                delivery_mode = await db.get_channel_delivery_mode(message.guild.id, message.channel.id)
+            combined = delivery_mode == 'combined'
+            
+            # Under outbound backpressure, merge posts into one, or skip posting and leave the 🌐 DM path
+            route = f"webhook:{message.channel.id}"
+            shed_posts = self.bot.outbound.is_saturated(route)
+            if shed_posts:
+                logger.warning(f"Outbound queue for channel {message.channel.id} is full, not posting translations")
+            elif self.bot.outbound.is_congested(route):
+                combined = True
+            
+            # Long messages are split up front so segments translate in parallel and post as soon as they're ready
+            segments = split_segments(content, CONFIG['segment_max_chars'])
+            
+            # Translate to all target languages concurrently
+            translations = {}
+            tasks = []
+            for target_lang in target_langs:
+                # Replace the original message with a translated version
+                # for exemple : chaintastic (fr ➜ en)
+                # APP
+                #  — 11:31 PM
+                # Good morning
+                deliver = None
+                if not combined and not shed_posts:
+                    deliver = self._make_delivery(message, route, source_lang, target_lang)
+                tasks.append(asyncio.create_task(self._translate_for_language(segments, message.channel, target_lang, source_lang, deliver)))
+            for next_done in asyncio.as_completed(tasks):
+                target_lang, translated_text = await next_done
+                if translated_text is None:
                     continue
-                    
-                # Translate the message
-                translated_text = await translation_service.translate(content, target_lang, source_lang)
                 translations[target_lang] = translated_text
                 
                 # Store translation in database for future reference
-                await db.add_message_translation(message.id, target_lang, translated_text)
+                with STAGE_SECONDS.time(handler='auto_translate', stage='db_save'):
+                    await db.add_message_translation(message.id, target_lang, translated_text)
+            
+            if combined and not shed_posts and translations:
+                combined_translations = dict(translations)
+                # Shared across retries so a rate-limited job doesn't repeat messages already sent
+                combined_sent = set()
+                self.bot.outbound.post(
+                    route,
+                    lambda: send_combined_translation(message.channel, message, combined_translations, source_lang, combined_sent)
+                )
             
             # Send notifications for available translations if any were made
             if translations:
@@ -76,46 +156,18 @@ class AutoTranslate(commands.Cog):
                 self.message_cache[message.id] = {
                     'original': content,
                     'source_lang': source_lang,
-                    'translations': translations
+                    'translations': translations,
+                    'created_at': time.time()
                 }
+                self._prune_message_cache()
                 
                 # Add a reaction to indicate translation is available
-                await message.add_reaction('🌐')
+                self.bot.outbound.post(f"reaction:{message.channel.id}", lambda: message.add_reaction('🌐'))
                 
                 # Store original message reference
-                await db.add_message_translation(message.id, source_lang, content)
-
-
-                # Replace the original message with a translated version
-                # for exemple : chaintastic (fr ➜ en)
-                # APP
-                #  — 11:31 PM
-                # Good morning
-                # Send translated messages to the channel
-                for target_lang, translated_text in translations.items():
-                    # Check if the translated text exceeds Discord's character limit
-                    if len(translated_text) > CONFIG['max_message_length']:
-                        # Split the message into chunks
-                        chunks = [
-                            translated_text[i:i + CONFIG['max_message_length']]
-                            for i in range(0, len(translated_text), CONFIG['max_message_length'])
-                        ]
-                        for chunk in chunks:
-                            await send_translated_message(
-                                channel=message.channel,
-                                original_message=message,
-                                translated_text=translated_text,
-                                source_lang=source_lang,
-                                target_lang=target_lang
-                            )
-                    else:
-                        await send_translated_message(
-                            channel=message.channel,
-                            original_message=message,
-                            translated_text=translated_text,
-                            source_lang=source_lang,
-                            target_lang=target_lang
-                        )
+                with STAGE_SECONDS.time(handler='auto_translate', stage='db_save'):
+                    await db.add_message_translation(message.id, source_lang, content)
+                outcome = 'translated'
             else:
                 # No translations were made, so just send the original message
                 embed = discord.Embed(
@@ -124,7 +176,8 @@ class AutoTranslate(commands.Cog):
                     color=discord.Color(CONFIG['embed_color'])
                 )
                 embed.set_footer(text=f"Language: {source_lang}")
-                await message.channel.send(embed=embed)
+                self.bot.outbound.post(f"channel:{message.channel.id}", lambda: message.channel.send(embed=embed))
+                outcome = 'untranslated'
         except discord.Forbidden:
             # Handle permission errors (e.g., bot cannot send messages)
             logger.error(f"Permission error: {message.channel.name} - {message.content}")
@@ -145,6 +198,215 @@ class AutoTranslate(commands.Cog):
             logger.error(f"Value error in translations: {e}")
         except Exception as e:
             logger.error(f"Error in auto-translate: {e}")
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, handler='auto_translate', stage='total')
+            HANDLED_TOTAL.inc(handler='auto_translate', outcome=outcome)
+    
+    async def _translate_for_language(
+        self,
+        segments: List[Tuple[str, str]],
+        channel: discord.abc.GuildChannel,
+        target_lang: str,
+        source_lang: str,
+        deliver: Optional[Callable[[int, str], None]] = None
+    ) -> Tuple[str, Optional[str]]:
+        """Translate content to one language, returning None instead of raising on failure or timeout"""
+        try:
+            with STAGE_SECONDS.time(handler='auto_translate', stage='translate'):
+                translated_text = await self._translate_segments(
+                    segments,
+                    channel,
+                    target_lang,
+                    source_lang,
+                    deliver,
+                    priority=BACKGROUND,
+                    deadline=time.monotonic() + CONFIG['translation_timeout']
+                )
+            return target_lang, translated_text
+        except DeadlineExceeded:
+            logger.warning(f"Auto-translate to {target_lang} timed out")
+        except Exception as e:
+            logger.error(f"Error translating to {target_lang}: {e}")
+        return target_lang, None
+    
+    async def _translate_segments(
+        self,
+        segments: List[Tuple[str, str]],
+        channel: discord.abc.GuildChannel,
+        target_lang: str,
+        source_lang: str,
+        deliver: Optional[Callable[[int, str], None]] = None,
+        priority: int = INTERACTIVE,
+        deadline: Optional[float] = None
+    ) -> str:
+        """Translate segments in parallel through the translation scheduler and rejoin them, charging the channel's budget.
+        
+        deliver, if given, is called with each translated segment in order as
+        soon as every segment before it is done.
+        """
+        guild = getattr(channel, 'guild', None)
+        guild_id = guild.id if guild else None
+        if deadline is None:
+            deadline = time.monotonic() + translation_scheduler.default_timeout(priority)
+        
+        def schedule(segment: str, coalesce: bool) -> Awaitable[str]:
+            return translation_scheduler.submit(
+                lambda: translation_service.translate(
+                    segment, target_lang, source_lang, coalesce=coalesce, guild_id=guild_id, channel_id=channel.id
+                ),
+                priority,
+                guild_id,
+                deadline
+            )
+        
+        if len(segments) == 1:
+            translated_text = await schedule(segments[0][0], True)
+            if deliver:
+                deliver(0, translated_text)
+            return translated_text
+        
+        # Segments of one message each get their own request rather than being coalesced back into one
+        tasks = [asyncio.ensure_future(schedule(segment, False)) for segment, _ in segments]
+        try:
+            translated_segments = []
+            for index, task in enumerate(tasks):
+                translated_segments.append(await task)
+                if deliver:
+                    deliver(index, translated_segments[-1])
+        finally:
+            for task in tasks:
+                task.cancel()
+        return join_segments(translated_segments, [separator for _, separator in segments])
+    
+    def _make_delivery(self, message: discord.Message, route: str, source_lang: str, target_lang: str) -> Callable[[int, str], None]:
+        """Build a callback that posts one language's translated segments to the channel in order.
+        
+        The route runs more than one job at a time, so each segment is only
+        submitted once the previous one's post has finished; waiting inside a
+        job would hold a route worker and an outbound slot while idle.
+        """
+        waiting: Deque[Tuple[int, str]] = deque()
+        in_flight = False
+        stopped = False
+        
+        def submit_next(done: Optional[asyncio.Future] = None):
+            nonlocal in_flight, stopped
+            in_flight = False
+            # The scheduler cancels its jobs when it shuts down; don't queue more behind them
+            if done is not None and done.cancelled():
+                stopped = True
+            if stopped or not waiting:
+                waiting.clear()
+                return
+            index, translated_text = waiting.popleft()
+            # Shared across retries so a rate-limited post doesn't repeat chunks already sent
+            sent = set()
+            future = self.bot.outbound.post(
+                route,
+                lambda: self._post_translation(message, translated_text, source_lang, target_lang, jump_link=index == 0, sent=sent)
+            )
+            if future is None:
+                # A translation with a segment missing from the middle is worse than one cut short
+                stopped = True
+                waiting.clear()
+                logger.warning(f"Dropped the rest of the {target_lang} translation of message {message.id} from segment {index}")
+                return
+            in_flight = True
+            future.add_done_callback(submit_next)
+        
+        def deliver(index: int, translated_text: str):
+            if stopped:
+                return
+            waiting.append((index, translated_text))
+            if not in_flight:
+                submit_next()
+        
+        return deliver
+    
+    async def _post_translation(
+        self,
+        message: discord.Message,
+        translated_text: str,
+        source_lang: str,
+        target_lang: str,
+        jump_link: bool = True,
+        sent: Optional[Set[int]] = None
+    ):
+        """Send a translated message to the channel, split across messages if it exceeds the length limit.
+        
+        Chunks whose index is in sent are skipped and sent ones are added, so a retried post doesn't repeat them.
+        """
+        sent = set() if sent is None else sent
+        # Leave room for the jump link
+        max_length = CONFIG['max_message_length'] - 200
+        for index, (chunk, _) in enumerate(split_segments(translated_text, max_length)):
+            if index in sent:
+                continue
+            await send_translated_message(
+                channel=message.channel,
+                original_message=message,
+                translated_text=chunk,
+                source_lang=source_lang,
+                target_lang=target_lang,
+                jump_link=jump_link and index == 0
+            )
+            sent.add(index)
+    
+    async def _refresh_member(self, member: discord.Member):
+        """Re-check which indexed channels a member can read"""
+        language = None
+        for channel_id in self.audience.channels_in_guild(member.guild.id):
+            channel = member.guild.get_channel_or_thread(channel_id)
+            if channel is None:
+                self.audience.invalidate(channel_id)
+                continue
+            if channel.permissions_for(member).read_messages:
+                if not self.audience.has_member(channel_id, member.id):
+                    if language is None:
+                        language = await db.get_user_language(member.id)
+                    self.audience.add_member(channel_id, member.id, language)
+            else:
+                self.audience.remove_member(channel_id, member.id)
+    
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        """Add a new member to the audience of the channels they can read"""
+        if not member.bot:
+            await self._refresh_member(member)
+    
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        """Remove a departed member from every audience in the guild"""
+        for channel_id in self.audience.channels_in_guild(payload.guild_id):
+            self.audience.remove_member(channel_id, payload.user.id)
+    
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        """Role changes can grant or revoke access to channels"""
+        if before.roles != after.roles and not after.bot:
+            await self._refresh_member(after)
+    
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        """Permission overwrite changes are rescanned on the channel's next message"""
+        if before.overwrites != after.overwrites:
+            self.audience.invalidate(after.id)
+    
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        self.audience.invalidate(channel.id)
+        invalidate_webhooks(channel.id)
+    
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        """Role permission changes can affect any channel in the guild"""
+        if before.permissions != after.permissions:
+            self.audience.invalidate_guild(after.guild.id)
+    
+    @commands.Cog.listener()
+    async def on_user_language_update(self, user_id: int, language: str):
+        """Keep audience languages in step with /setlanguage"""
+        self.audience.update_language(user_id, language)
     
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
@@ -169,6 +431,10 @@ class AutoTranslate(commands.Cog):
                 
             # Check if message is in cache or in database
             cached_message = self.message_cache.get(message.id)
+            if cached_message and time.time() - cached_message['created_at'] > CONFIG['message_retention']['max_age']:
+                # Expired entries fall through to the database lookup below
+                del self.message_cache[message.id]
+                cached_message = None
             if cached_message:
                 # Get user's preferred language
                 user = await self.bot.fetch_user(payload.user_id)
@@ -178,9 +444,10 @@ class AutoTranslate(commands.Cog):
                 translation = cached_message['translations'].get(target_lang)
                 if not translation:
                     # Translate now if not already translated
-                    translation = await translation_service.translate(
-                        cached_message['original'], 
-                        target_lang, 
+                    translation = await self._translate_segments(
+                        split_segments(cached_message['original'], CONFIG['segment_max_chars']),
+                        channel,
+                        target_lang,
                         cached_message['source_lang']
                     )
                     cached_message['translations'][target_lang] = translation
@@ -201,20 +468,32 @@ class AutoTranslate(commands.Cog):
                 embed.set_footer(text=f"Translated from {cached_message['source_lang']} to {target_lang}")
                 
                 try:
-                    await user.send(embed=embed)
+                    await self.bot.outbound.submit(f"dm:{user.id}", lambda: user.send(embed=embed), INTERACTIVE)
                 except discord.Forbidden:
                     # Cannot DM the user
                     pass
             else:
                 # Try to get translations from database
                 translations = await db.get_message_translations(message.id)
-                if translations:
+                # Stored translations expire under the retention policy, but a message
+                # we marked with 🌐 can still be translated on demand
+                was_auto_translated = any(str(reaction.emoji) == '🌐' and reaction.me for reaction in message.reactions)
+                if translations or (was_auto_translated and message.content):
                     # Get user's preferred language
                     user = await self.bot.fetch_user(payload.user_id)
                     target_lang = await db.get_user_language(user.id)
                     
                     # Get translation if it exists
                     translation = translations.get(target_lang)
+                    if not translation and message.content:
+                        source_lang = await translation_service.detect_language(message.content)
+                        if source_lang != target_lang:
+                            translation = await self._translate_segments(
+                                split_segments(message.content, CONFIG['segment_max_chars']),
+                                channel,
+                                target_lang,
+                                source_lang
+                            )
                     if translation:
                         # Send the translation as a DM
                         embed = discord.Embed(
@@ -231,7 +510,7 @@ class AutoTranslate(commands.Cog):
                         embed.set_footer(text=f"Translated to {target_lang}")
                         
                         try:
-                            await user.send(embed=embed)
+                            await self.bot.outbound.submit(f"dm:{user.id}", lambda: user.send(embed=embed), INTERACTIVE)
                         except discord.Forbidden:
                             # Cannot DM the user
                             pass
@@ -268,7 +547,8 @@ class AutoTranslate(commands.Cog):
                 f"`{ctx.prefix}autotranslate enable` - Enable auto-translation\n"
                 f"`{ctx.prefix}autotranslate disable` - Disable auto-translation\n"
                 f"`{ctx.prefix}autotranslate add #channel` - Add a channel\n"
-                f"`{ctx.prefix}autotranslate remove #channel` - Remove a channel"
+                f"`{ctx.prefix}autotranslate remove #channel` - Remove a channel\n"
+                f"`{ctx.prefix}autotranslate mode #channel separate|combined` - One post per language or one combined post"
             ),
             inline=False
         )
@@ -294,13 +574,27 @@ class AutoTranslate(commands.Cog):
     async def auto_translate_add(self, ctx, channel: discord.TextChannel):
         """Add a channel to auto-translation"""
         await db.add_guild_channel_auto_translate(ctx.guild.id, channel.id)
+        await warm_webhooks(channel)
         await ctx.send(f"✅ Auto-translation enabled for {channel.mention}.")
     
+    @auto_translate.command(name="mode")
+    @commands.has_permissions(manage_channels=True)
+    async def auto_translate_mode(self, ctx, channel: discord.TextChannel, mode: str):
+        """Choose whether a channel gets one post per language or one combined post"""
+        mode = mode.lower()
+        if mode not in ('separate', 'combined'):
+            await ctx.send("❌ Mode must be `separate` or `combined`.")
+            return
+        await db.set_channel_delivery_mode(ctx.guild.id, channel.id, mode)
+        await ctx.send(f"✅ Auto-translations in {channel.mention} will be posted as **{mode}** messages.")
+    
     @auto_translate.command(name="remove")
     @commands.has_permissions(manage_channels=True)
     async def auto_translate_remove(self, ctx, channel: discord.TextChannel):
         """Remove a channel from auto-translation"""
         await db.remove_guild_channel_auto_translate(ctx.guild.id, channel.id)
+        self.audience.invalidate(channel.id)
+        invalidate_webhooks(channel.id)
         await ctx.send(f"✅ Auto-translation disabled for {channel.mention}.")
 
 async def setup(bot):
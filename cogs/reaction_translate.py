@@ -2,11 +2,15 @@ import discord
 from discord.ext import commands
 import logging
 import asyncio
+import time
 from typing import Dict, Optional
 
 from config import CONFIG, LANGUAGES, LANGUAGE_TO_FLAG
 from database import db
+from metrics import HANDLED_TOTAL, STAGE_SECONDS
+from outbound import INTERACTIVE
 from translation import translation_service
+from translation_scheduler import translation_scheduler
 from utils.message_utils import send_translated_message
 from utils.language_utils import get_language_name
 
@@ -34,13 +38,16 @@ class ReactionTranslate(commands.Cog):
         # Get the target language from the flag emoji
         target_lang = LANGUAGES[emoji]
         
+        started = time.perf_counter()
+        outcome = 'ignored'
         try:
             # Get the channel and message
             channel = self.bot.get_channel(payload.channel_id)
             if not channel:
                 return
                 
-            message = await channel.fetch_message(payload.message_id)
+            with STAGE_SECONDS.time(handler='reaction_translate', stage='fetch_message'):
+                message = await channel.fetch_message(payload.message_id)
             if not message:
                 return
                 
@@ -58,42 +65,57 @@ class ReactionTranslate(commands.Cog):
             
             # Check if we're already processing this translation
             if translation_key in self.pending_translations:
+                outcome = 'duplicate'
                 return
                 
             # Mark as pending
             self.pending_translations[translation_key] = True
             
             try:
+                # Detect source language
+                with STAGE_SECONDS.time(handler='reaction_translate', stage='detect_language'):
+                    source_lang = await translation_service.detect_language(message.content)
+                
                 # Check if we already have this translation in the database
-                translations = await db.get_message_translations(message.id)
+                with STAGE_SECONDS.time(handler='reaction_translate', stage='db_lookup'):
+                    translations = await db.get_message_translations(message.id)
                 if translations and target_lang in translations:
                     translated_text = translations[target_lang]
                 else:
-                    # Detect source language
-                    source_lang = await translation_service.detect_language(message.content)
-                    
                     # No need to translate if the target language is the same as the source
                     if source_lang == target_lang:
-                        del self.pending_translations[translation_key]
+                        outcome = 'same_language'
                         return
                         
                     # Translate the message
-                    translated_text = await translation_service.translate(message.content, target_lang, source_lang)
+                    # Flag reactions run ahead of background auto-translation
+                    with STAGE_SECONDS.time(handler='reaction_translate', stage='translate'):
+                        translated_text = await translation_scheduler.submit(
+                            lambda: translation_service.translate(
+                                message.content, target_lang, source_lang, guild_id=payload.guild_id, channel_id=payload.channel_id
+                            ),
+                            INTERACTIVE,
+                            payload.guild_id
+                        )
                     
                     # Store the translation
-                    await db.add_message_translation(message.id, target_lang, translated_text)
-                
-                # Get the user who requested the translation
-                user = await self.bot.fetch_user(payload.user_id)
+                    with STAGE_SECONDS.time(handler='reaction_translate', stage='db_save'):
+                        await db.add_message_translation(message.id, target_lang, translated_text)
                 
-                # Send the translated message
-                await send_translated_message(
-                    channel=channel,
-                    original_message=message,
-                    translated_text=translated_text,
-                    target_lang=target_lang,
-                    requester=user
-                )
+                # Send the translated message ahead of background auto-translations
+                with STAGE_SECONDS.time(handler='reaction_translate', stage='send'):
+                    await self.bot.outbound.submit(
+                        f"webhook:{channel.id}",
+                        lambda: send_translated_message(
+                            channel=channel,
+                            original_message=message,
+                            translated_text=translated_text,
+                            source_lang=source_lang,
+                            target_lang=target_lang
+                        ),
+                        INTERACTIVE
+                    )
+                outcome = 'translated'
             finally:
                 # Remove from pending regardless of success/failure
                 del self.pending_translations[translation_key]
@@ -103,7 +125,11 @@ class ReactionTranslate(commands.Cog):
             translation_key = f"{payload.message_id}:{target_lang}"
             if translation_key in self.pending_translations:
                 del self.pending_translations[translation_key]
+            outcome = 'error'
             logger.error(f"Error in reaction translation: {e}")
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, handler='reaction_translate', stage='total')
+            HANDLED_TOTAL.inc(handler='reaction_translate', outcome=outcome)
     
     @commands.command(name="flags", aliases=["languages", "langs"])
     async def show_flags(self, ctx):
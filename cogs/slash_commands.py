@@ -2,11 +2,15 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import logging
+import time
 from typing import Optional, List
 
 from config import CONFIG, LANGUAGES, LANGUAGE_TO_FLAG
 from database import db
+from metrics import HANDLED_TOTAL, STAGE_SECONDS
+from outbound import INTERACTIVE
 from translation import translation_service
+from translation_scheduler import DeadlineExceeded, translation_scheduler
 from utils.language_utils import get_language_name, get_language_choices
 
 logger = logging.getLogger('discord')
@@ -39,6 +43,8 @@ class SlashCommands(commands.Cog):
         """Translate text to another language with a slash command"""
         await interaction.response.defer(ephemeral=private)
         
+        started = time.perf_counter()
+        outcome = 'error'
         try:
             # If target language is not specified, use the user's preferred language
             if not target:
@@ -48,7 +54,8 @@ class SlashCommands(commands.Cog):
             
             # Detect source language if not specified
             if not source or source == "auto":
-                source_lang = await translation_service.detect_language(text)
+                with STAGE_SECONDS.time(handler='slash_translate', stage='detect_language'):
+                    source_lang = await translation_service.detect_language(text)
             else:
                 source_lang = source
             
@@ -58,10 +65,18 @@ class SlashCommands(commands.Cog):
                     f"⚠️ The text is already in {get_language_name(target_lang)} ({target_lang}).",
                     ephemeral=private
                 )
+                outcome = 'same_language'
                 return
             
-            # Translate the text
-            translated_text = await translation_service.translate(text, target_lang, source_lang)
+            # Translate the text ahead of background auto-translation
+            with STAGE_SECONDS.time(handler='slash_translate', stage='translate'):
+                translated_text = await translation_scheduler.submit(
+                    lambda: translation_service.translate(
+                        text, target_lang, source_lang, guild_id=interaction.guild_id, channel_id=interaction.channel_id
+                    ),
+                    INTERACTIVE,
+                    interaction.guild_id
+                )
             
             # Create embed
             embed = discord.Embed(
@@ -83,14 +98,30 @@ class SlashCommands(commands.Cog):
                 text=f"Translated from {get_language_name(source_lang)} to {get_language_name(target_lang)}"
             )
             
-            await interaction.followup.send(embed=embed, ephemeral=private)
+            with STAGE_SECONDS.time(handler='slash_translate', stage='send'):
+                await self.bot.outbound.submit(
+                    f"interaction:{interaction.id}",
+                    lambda: interaction.followup.send(embed=embed, ephemeral=private),
+                    INTERACTIVE
+                )
+            outcome = 'translated'
             
+        except DeadlineExceeded:
+            outcome = 'deadline_exceeded'
+            logger.warning("Translate command timed out waiting for a translation")
+            await interaction.followup.send(
+                "⏳ Translation is taking too long right now. Please try again in a moment.",
+                ephemeral=True
+            )
         except Exception as e:
             logger.error(f"Error in translate command: {e}")
             await interaction.followup.send(
                 "❌ An error occurred during translation. Please try again later.",
                 ephemeral=True
             )
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, handler='slash_translate', stage='total')
+            HANDLED_TOTAL.inc(handler='slash_translate', outcome=outcome)
     
     @app_commands.command(name="setlanguage", description="Set your preferred language for translations")
     @app_commands.describe(language="Your preferred language")
@@ -101,6 +132,8 @@ class SlashCommands(commands.Cog):
         
         try:
             await db.set_user_language(interaction.user.id, language)
+            # Let listeners such as the auto-translate audience index pick up the change
+            self.bot.dispatch('user_language_update', interaction.user.id, language)
             
             flag = LANGUAGE_TO_FLAG.get(language, "🌐")
             language_name = get_language_name(language)
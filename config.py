@@ -7,7 +7,87 @@ CONFIG = {
     'embed_color': 0x3498db,  # Blue color for embeds
     'max_message_length': 2000,  # Discord message character limit
     'default_language': 'en',  # Default language
+    'database_backend': os.getenv('DATABASE_BACKEND', 'json'),  # 'json' or 'sqlite'
+    'database_write_behind': True,  # Batch JSON database writes instead of saving on every change
+    'database_flush_interval_ms': 1000,  # Longest a change waits before being written
+    'database_flush_max_changes': 100,  # Flush early once this many changes are pending
     'reaction_timeout': 60 * 60,  # How long to wait for reactions (in seconds)
+    'webhook_pool_size': 2,  # Webhooks per auto-translate channel, each with its own rate-limit bucket
+    'translation_timeout': 10,  # Per-language timeout for auto-translate fan-out (in seconds)
+    'translation_scheduler': {
+        'max_in_flight': 16,  # Translation jobs running at once; the rest queue by priority and guild
+        'interactive_timeout': 10,  # Default deadline for slash commands and reactions (in seconds)
+        'background_timeout': 30,  # Default deadline for other background jobs (in seconds)
+    },
+    'segment_max_chars': 1200,  # Long messages are translated and posted in segments of at most this size
+    'coalesce_window_ms': 15,  # How long to hold translate() calls to batch them together (0 disables)
+    'coalesce_max_batch': 50,  # Flush a held batch early once it reaches this many texts
+    'http': {
+        'connect_timeout': 3,  # Seconds to open a connection to a provider
+        'keepalive_timeout': 60,  # Seconds an idle provider connection stays open for reuse
+        'dns_cache_ttl': 300,  # Seconds resolved provider hostnames are cached
+        'warm_up': True,  # Open provider connections at bot start
+        'language_refresh_interval': 24 * 60 * 60,  # Seconds between provider language list refreshes (0 to only use the configured lists)
+    },
+    'translation_cache': {
+        'path': os.getenv('TRANSLATION_CACHE_PATH', 'translation_cache.db'),
+        'memory_entries': 5000,  # In-memory LRU size
+        'disk_entries': 200000,  # SQLite tier size
+        'ttl': 7 * 24 * 60 * 60,  # How long a cached translation stays valid (in seconds)
+        'prune_interval': 500,  # Prune the SQLite tier after this many writes
+    },
+    'outbound': {
+        'max_in_flight': 40,  # Discord REST calls in flight across all routes
+        'route_concurrency': {'webhook': 2},  # Workers per route kind (default 1); match webhook_pool_size
+        'congestion_depth': 10,  # Queue depth at which auto-translate merges posts
+        'max_queue_depth': 50,  # Queue depth at which background work is rejected
+        'idle_timeout': 60,  # Seconds before an idle route's workers exit
+    },
+    'message_retention': {
+        'max_age': 7 * 24 * 60 * 60,  # How long stored message translations are kept (in seconds)
+        'max_entries': 50000,  # Most messages kept in the database
+        'cache_entries': 1000,  # Most messages kept in the auto-translate in-memory cache
+        'compaction_interval': 10 * 60,  # How often expired entries are removed (in seconds)
+    },
+    'provider_router': {
+        'failure_rate': 0.5,  # Error/timeout share that opens a provider's circuit breaker
+        'min_requests': 5,  # Requests in the window before the breaker can open
+        'window': 30,  # Seconds of results the breaker looks at
+        'cooldown': 30,  # Seconds an open breaker waits before letting a trial request through
+        'max_queue_wait': 2.0,  # Longest a request waits for a rate-limit token before falling back (in seconds)
+        'initial_latency': 0.5,  # Assumed latency before a provider has been measured (in seconds)
+        'latency_alpha': 0.2,  # Weight of each new sample in the latency moving average
+        'latency_samples': 200,  # Recent latencies kept per provider
+        'default_bias': 2.0,  # Traffic weight multiplier for DEFAULT_TRANSLATION_SERVICE
+        'hedging': True,  # Race a backup provider when the primary is slower than its p95 latency
+        'hedge_min_samples': 20,  # Latency samples needed before a provider's p95 is trusted
+        'hedge_max_ratio': 0.1,  # Most hedged requests per primary request (caps the extra upstream load)
+        'hedge_burst': 10,  # Hedged requests that may be sent back to back before the ratio applies
+    },
+    'budgets': {
+        'path': os.getenv('BUDGET_STATE_PATH', 'budget_state.json'),
+        'guild_daily_chars': None,  # Characters a guild may send upstream per day (None for no limit)
+        'guild_monthly_chars': None,
+        'channel_daily_chars': None,
+        'channel_monthly_chars': None,
+        'soft_limit': 0.8,  # Share of a budget after which translation degrades
+        'soft_weight': 0.25,  # Router traffic weight multiplier for providers past their soft limit
+        'degraded_languages': 3,  # Auto-translate targets kept for a channel past its soft limit
+        'flush_interval': 30,  # Seconds between saves of the budget state
+    },
+    'local_translation': {
+        'enabled': os.getenv('LOCAL_TRANSLATION_ENABLED', 'false').lower() == 'true',
+        'engine': os.getenv('LOCAL_TRANSLATION_ENGINE', 'phrase_table'),  # 'phrase_table', or 'module:factory' for a custom engine
+        'phrase_table_path': os.getenv('LOCAL_PHRASE_TABLE_PATH'),  # Extra phrases (JSON), added to the built-in table
+        'workers': 0,  # Engine worker processes, for engines too slow for the event loop (0 runs it in-process)
+        'max_chars': 40,  # Texts up to this long try the local engine before any provider
+        'economy_max_chars': 200,  # Same, while budgets are tight
+        'timeout': 2.0,  # Longest a local lookup may take before falling through to the providers (in seconds)
+    },
+    'language_detection': {
+        'min_confidence': 0.75,  # Below this the local detector defers to the remote one
+        'cache_entries': 10000,  # Remembered detections
+    },
 }
 
 # Language configuration
@@ -44,16 +124,52 @@ TRANSLATION_SERVICES = {
         'api_key': os.getenv('GOOGLE_TRANSLATE_API_KEY', ''),
         'base_url': 'https://translation.googleapis.com/language/translate/v2',
         'enabled': os.getenv('GOOGLE_TRANSLATE_API_KEY', '') != '',
+        'requires_api_key': True,
+        'requests_per_minute': 500,  # Token bucket refill rate
+        'burst': 50,  # Token bucket capacity
+        'max_connections': 8,  # Pooled HTTP connections
+        'timeout': 5,  # Seconds per request
+        'cost_per_million': 20.0,  # Price per million characters, for cost accounting (0 for free)
+        'daily_char_budget': None,  # Characters per day (None for no limit)
+        'monthly_char_budget': None,  # Characters per month
+        'max_concurrency': 8,  # Concurrent in-flight requests
+        'max_batch_size': 128,  # Texts per request
+        'max_batch_chars': 5000,  # Characters per request
+        'languages': None,  # Supported language codes (None for every language in LANGUAGES)
     },
     'libre': {
         'api_key': os.getenv('LIBRETRANSLATE_API_KEY', ''),
         'base_url': os.getenv('LIBRETRANSLATE_URL', 'https://libretranslate.de'),
         'enabled': True,
+        'requires_api_key': False,
+        'requests_per_minute': 100,
+        'burst': 10,
+        'max_connections': 4,
+        'timeout': 5,
+        'cost_per_million': 0.0,
+        'daily_char_budget': None,
+        'monthly_char_budget': None,
+        'max_concurrency': 4,
+        'max_batch_size': 50,
+        'max_batch_chars': 5000,
+        'languages': ['en', 'es', 'fr', 'de', 'it', 'pt', 'ru', 'ja', 'ko', 'zh-CN', 'hi', 'ar', 'tr', 'nl', 'sv', 'pl', 'id', 'vi'],
     },
     'deepl': {
         'enabled': True,
         'api_key': os.getenv("DEEPL_API_KEY"),
-        'base_url': 'https://api-free.deepl.com/v2/translate'
+        'base_url': 'https://api-free.deepl.com/v2/translate',
+        'requires_api_key': True,
+        'requests_per_minute': 50,
+        'burst': 10,
+        'max_connections': 4,
+        'timeout': 5,
+        'cost_per_million': 25.0,
+        'daily_char_budget': None,
+        'monthly_char_budget': None,  # 500000 matches the DeepL API Free allowance
+        'max_concurrency': 4,
+        'max_batch_size': 50,
+        'max_batch_chars': 100000,  # DeepL caps the request body at 128 KiB
+        'languages': ['en', 'es', 'fr', 'de', 'it', 'pt', 'ru', 'ja', 'ko', 'zh-CN', 'zh-TW', 'ar', 'tr', 'nl', 'sv', 'pl', 'id'],
     }
 }
 
@@ -1,8 +1,15 @@
 import os
 import json
+import asyncio
+import sqlite3
+import time
 import aiofiles
+import aiofiles.os
 import logging
-from typing import Dict, List, Any, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Set, Union
+
+from config import CONFIG
 
 logger = logging.getLogger('discord')
 
@@ -12,8 +19,17 @@ class Database:
     def __init__(self, filename="user_preferences.json"):
         self.filename = filename
         self.data = {'users': {}, 'guilds': {}, 'messages': {}}
+        # Write-behind state: mutations mark the store dirty and a background task flushes it
+        self._dirty = False
+        self._changes = 0
+        self._flush_wakeup = None
+        self._flush_task = None
+        self._flush_lock = None
+        # Integer channel IDs per guild, only for guilds with auto-translate enabled
+        self._channel_index: Dict[int, Set[int]] = {}
         # Initialize the data synchronously to avoid coroutine warning
         self._load_sync()
+        self._build_channel_index()
     
     def _load_sync(self):
         """Load data from file synchronously"""
@@ -58,6 +74,7 @@ class Database:
                         logger.info(f"Database file {self.filename} is empty, initializing with defaults")
                         await self._save()
                 logger.info(f"Database loaded from {self.filename}")
+                self._build_channel_index()
             else:
                 logger.info(f"No database file found, creating new one at {self.filename}")
                 await self._save()
@@ -70,13 +87,79 @@ class Database:
             await self._save()
     
     async def _save(self):
-        """Save data to file"""
+        """Save data to file atomically by writing a temp file and renaming it over the original"""
         try:
-            async with aiofiles.open(self.filename, 'w') as f:
+            temp_filename = f"{self.filename}.tmp"
+            async with aiofiles.open(temp_filename, 'w') as f:
                 await f.write(json.dumps(self.data, indent=2))
-            logger.info(f"Database saved to {self.filename}")
+            await aiofiles.os.replace(temp_filename, self.filename)
+            logger.debug(f"Database saved to {self.filename}")
+            return True
         except Exception as e:
             logger.error(f"Error saving database: {e}")
+            return False
+    
+    async def _mark_dirty(self):
+        """Record a mutation and schedule a flush (or save right away if write-behind is off)"""
+        if not CONFIG['database_write_behind']:
+            await self._save()
+            return
+        
+        self._dirty = True
+        self._changes += 1
+        loop = asyncio.get_running_loop()
+        # (Re)start the flusher if there is none on this loop, e.g. after the bot was restarted
+        if self._flush_task is None or self._flush_task.done() or self._flush_task.get_loop() is not loop:
+            self._flush_wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._flush_task = loop.create_task(self._flush_loop())
+        if self._changes >= CONFIG['database_flush_max_changes']:
+            self._flush_wakeup.set()
+    
+    async def _flush_loop(self):
+        """Flush dirty data at most once per interval, or sooner once enough changes pile up"""
+        interval = CONFIG['database_flush_interval_ms'] / 1000
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            await self.flush()
+    
+    async def flush(self) -> None:
+        """Write pending changes to disk now"""
+        if not self._dirty:
+            return
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._changes = 0
+            if not await self._save():
+                # Keep the changes pending so the next flush retries them
+                self._dirty = True
+    
+    def _build_channel_index(self):
+        """Rebuild the auto-translate channel index from the loaded data"""
+        self._channel_index = {}
+        for guild_id_str in self.data.get('guilds', {}):
+            self._reindex_guild(guild_id_str)
+    
+    def _reindex_guild(self, guild_id_str: str):
+        """Refresh one guild's entry in the auto-translate channel index"""
+        guild = self.data['guilds'].get(guild_id_str, {})
+        if guild.get('auto_translate') and guild.get('auto_translate_channels'):
+            self._channel_index[int(guild_id_str)] = {int(channel_id) for channel_id in guild['auto_translate_channels']}
+        else:
+            self._channel_index.pop(int(guild_id_str), None)
+    
+    def is_auto_translate_channel(self, guild_id: int, channel_id: int) -> bool:
+        """Check whether auto-translate is enabled for both the guild and the channel"""
+        channels = self._channel_index.get(guild_id)
+        return channels is not None and channel_id in channels
     
     async def get_user_language(self, user_id: Union[int, str]) -> str:
         """Get the preferred language for a user"""
@@ -89,7 +172,7 @@ class Database:
         if user_id_str not in self.data['users']:
             self.data['users'][user_id_str] = {}
         self.data['users'][user_id_str]['language'] = language
-        await self._save()
+        await self._mark_dirty()
     
     async def get_guild_auto_translate(self, guild_id: Union[int, str]) -> bool:
         """Check if auto-translate is enabled for a guild"""
@@ -102,7 +185,8 @@ class Database:
         if guild_id_str not in self.data['guilds']:
             self.data['guilds'][guild_id_str] = {}
         self.data['guilds'][guild_id_str]['auto_translate'] = enabled
-        await self._save()
+        self._reindex_guild(guild_id_str)
+        await self._mark_dirty()
     
     async def get_guild_channels_auto_translate(self, guild_id: Union[int, str]) -> List[str]:
         """Get channels with auto-translate enabled for a guild"""
@@ -119,7 +203,8 @@ class Database:
             self.data['guilds'][guild_id_str]['auto_translate_channels'] = []
         if channel_id_str not in self.data['guilds'][guild_id_str]['auto_translate_channels']:
             self.data['guilds'][guild_id_str]['auto_translate_channels'].append(channel_id_str)
-            await self._save()
+            self._reindex_guild(guild_id_str)
+            await self._mark_dirty()
     
     async def remove_guild_channel_auto_translate(self, guild_id: Union[int, str], channel_id: Union[int, str]) -> None:
         """Remove a channel from auto-translate list for a guild"""
@@ -128,12 +213,32 @@ class Database:
         if guild_id_str in self.data['guilds'] and 'auto_translate_channels' in self.data['guilds'][guild_id_str]:
             if channel_id_str in self.data['guilds'][guild_id_str]['auto_translate_channels']:
                 self.data['guilds'][guild_id_str]['auto_translate_channels'].remove(channel_id_str)
-                await self._save()
+                self._reindex_guild(guild_id_str)
+                await self._mark_dirty()
+    
+    async def get_channel_delivery_mode(self, guild_id: Union[int, str], channel_id: Union[int, str]) -> str:
+        """Get how auto-translations are posted in a channel ('separate' or 'combined')"""
+        guild_id_str = str(guild_id)  # Convert to string for JSON compatibility
+        channel_id_str = str(channel_id)  # Convert to string for JSON compatibility
+        return self.data['guilds'].get(guild_id_str, {}).get('delivery_modes', {}).get(channel_id_str, 'separate')
+    
+    async def set_channel_delivery_mode(self, guild_id: Union[int, str], channel_id: Union[int, str], mode: str) -> None:
+        """Set how auto-translations are posted in a channel ('separate' or 'combined')"""
+        guild_id_str = str(guild_id)  # Convert to string for JSON compatibility
+        channel_id_str = str(channel_id)  # Convert to string for JSON compatibility
+        if guild_id_str not in self.data['guilds']:
+            self.data['guilds'][guild_id_str] = {}
+        self.data['guilds'][guild_id_str].setdefault('delivery_modes', {})[channel_id_str] = mode
+        await self._mark_dirty()
     
     async def get_message_translations(self, message_id: Union[int, str]) -> Dict[str, str]:
         """Get translations for a message"""
         message_id_str = str(message_id)  # Convert to string for JSON compatibility
-        return self.data.get('messages', {}).get(message_id_str, {}).get('translations', {})
+        entry = self.data.get('messages', {}).get(message_id_str, {})
+        # Entries past the retention age count as gone even before compaction removes them
+        if time.time() - entry.get('created_at', time.time()) > CONFIG['message_retention']['max_age']:
+            return {}
+        return entry.get('translations', {})
     
     async def add_message_translation(self, message_id: Union[int, str], language: str, translation: str) -> None:
         """Add a translation for a message"""
@@ -141,9 +246,345 @@ class Database:
         if 'messages' not in self.data:
             self.data['messages'] = {}
         if message_id_str not in self.data['messages']:
-            self.data['messages'][message_id_str] = {'translations': {}}
+            self.data['messages'][message_id_str] = {'translations': {}, 'created_at': time.time()}
         self.data['messages'][message_id_str]['translations'][language] = translation
-        await self._save()
+        await self._mark_dirty()
+    
+    async def compact_messages(self, max_age: float, max_entries: int) -> int:
+        """Remove message translations older than max_age and the oldest ones beyond max_entries"""
+        messages = self.data.get('messages', {})
+        now = time.time()
+        cutoff = now - max_age
+        expired = []
+        for message_id, entry in messages.items():
+            # Entries from before retention existed start their clock now
+            created_at = entry.setdefault('created_at', now)
+            if created_at < cutoff:
+                expired.append(message_id)
+        for message_id in expired:
+            del messages[message_id]
+        
+        # Messages are stored in insertion order, so the oldest come first
+        overflow = len(messages) - max_entries
+        if overflow > 0:
+            for message_id in list(messages)[:overflow]:
+                del messages[message_id]
+        
+        removed = len(expired) + max(overflow, 0)
+        if removed:
+            await self._mark_dirty()
+        return removed
+    
+    async def close(self) -> None:
+        """Stop the background flusher after writing out pending changes"""
+        await self.flush()
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        self._flush_task = None
+
+class SQLiteDatabase:
+    """SQLite-backed database with the same interface as Database"""
+    
+    def __init__(self, filename="user_preferences.db", json_filename="user_preferences.json"):
+        self.filename = filename
+        self.json_filename = json_filename
+        self._connection = None
+        # All SQLite work runs on one dedicated thread so it never blocks the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='database')
+        # In-memory mirror of guild settings, kept in step with every write
+        self._enabled_guilds: Set[int] = set()
+        self._guild_channels: Dict[int, Set[int]] = {}
+        # Integer channel IDs per guild, only for guilds with auto-translate enabled
+        self._channel_index: Dict[int, Set[int]] = {}
+        self._delivery_modes: Dict[int, str] = {}
+        # Create the schema and migrate synchronously to avoid coroutine warning
+        self._executor.submit(self._setup).result()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database connection (runs on the database thread)"""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.filename, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("PRAGMA foreign_keys=ON")
+        return self._connection
+    
+    def _setup(self):
+        """Create tables and run the one-shot JSON migration (runs on the database thread)"""
+        connection = self._connect()
+        connection.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY,
+                language TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS guilds (
+                guild_id TEXT PRIMARY KEY,
+                auto_translate INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS guild_channels (
+                guild_id TEXT NOT NULL,
+                channel_id TEXT NOT NULL,
+                PRIMARY KEY (guild_id, channel_id)
+            );
+            CREATE TABLE IF NOT EXISTS channel_settings (
+                channel_id TEXT PRIMARY KEY,
+                guild_id TEXT NOT NULL,
+                delivery_mode TEXT NOT NULL DEFAULT 'separate'
+            );
+            CREATE TABLE IF NOT EXISTS message_translations (
+                message_id TEXT NOT NULL,
+                language TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                created_at REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (message_id, language)
+            );
+        ''')
+        # Databases created before retention existed lack the created_at column
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(message_translations)")]
+        if 'created_at' not in columns:
+            connection.execute("ALTER TABLE message_translations ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+            connection.execute("UPDATE message_translations SET created_at = ?", (time.time(),))
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_message_translations_created ON message_translations (created_at)"
+        )
+        connection.commit()
+        self._migrate_from_json(connection)
+        self._load_guild_settings(connection)
+        logger.info(f"Database loaded from {self.filename}")
+    
+    def _load_guild_settings(self, connection: sqlite3.Connection):
+        """Fill the in-memory guild settings mirror and channel index"""
+        self._enabled_guilds = {
+            int(guild_id) for guild_id, in connection.execute("SELECT guild_id FROM guilds WHERE auto_translate = 1")
+        }
+        self._guild_channels = {}
+        for guild_id, channel_id in connection.execute("SELECT guild_id, channel_id FROM guild_channels"):
+            self._guild_channels.setdefault(int(guild_id), set()).add(int(channel_id))
+        self._delivery_modes = {
+            int(channel_id): mode
+            for channel_id, mode in connection.execute("SELECT channel_id, delivery_mode FROM channel_settings")
+        }
+        self._channel_index = {}
+        for guild_id in set(self._enabled_guilds) | set(self._guild_channels):
+            self._reindex_guild(guild_id)
+    
+    def _reindex_guild(self, guild_id: int):
+        """Refresh one guild's entry in the auto-translate channel index"""
+        channels = self._guild_channels.get(guild_id)
+        if guild_id in self._enabled_guilds and channels:
+            self._channel_index[guild_id] = set(channels)
+        else:
+            self._channel_index.pop(guild_id, None)
+    
+    def is_auto_translate_channel(self, guild_id: int, channel_id: int) -> bool:
+        """Check whether auto-translate is enabled for both the guild and the channel"""
+        channels = self._channel_index.get(guild_id)
+        return channels is not None and channel_id in channels
+    
+    def _migrate_from_json(self, connection: sqlite3.Connection):
+        """Import the JSON database once, the first time the SQLite database is opened"""
+        if connection.execute("SELECT 1 FROM meta WHERE key = 'migrated_from_json'").fetchone():
+            return
+        
+        data = {}
+        if os.path.exists(self.json_filename):
+            try:
+                with open(self.json_filename, 'r') as f:
+                    content = f.read()
+                    if content.strip():
+                        data = json.loads(content)
+            except Exception as e:
+                logger.error(f"Error reading {self.json_filename} for migration: {e}")
+                return
+        
+        with connection:
+            for user_id, user in data.get('users', {}).items():
+                if 'language' in user:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO users (user_id, language) VALUES (?, ?)",
+                        (user_id, user['language'])
+                    )
+            for guild_id, guild in data.get('guilds', {}).items():
+                connection.execute(
+                    "INSERT OR REPLACE INTO guilds (guild_id, auto_translate) VALUES (?, ?)",
+                    (guild_id, int(bool(guild.get('auto_translate', False))))
+                )
+                connection.executemany(
+                    "INSERT OR IGNORE INTO guild_channels (guild_id, channel_id) VALUES (?, ?)",
+                    [(guild_id, channel_id) for channel_id in guild.get('auto_translate_channels', [])]
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO channel_settings (channel_id, guild_id, delivery_mode) VALUES (?, ?, ?)",
+                    [(channel_id, guild_id, mode) for channel_id, mode in guild.get('delivery_modes', {}).items()]
+                )
+            for message_id, message in data.get('messages', {}).items():
+                connection.executemany(
+                    "INSERT OR REPLACE INTO message_translations (message_id, language, translation, created_at) VALUES (?, ?, ?, ?)",
+                    [
+                        (message_id, language, translation, message.get('created_at', time.time()))
+                        for language, translation in message.get('translations', {}).items()
+                    ]
+                )
+            connection.execute("INSERT INTO meta (key, value) VALUES ('migrated_from_json', ?)", (self.json_filename,))
+        
+        if data:
+            logger.info(f"Migrated {self.json_filename} into {self.filename}")
+    
+    async def _run(self, func, *args):
+        """Run a function on the database thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+    
+    def _fetchone(self, query: str, params: tuple):
+        return self._connect().execute(query, params).fetchone()
+    
+    def _fetchall(self, query: str, params: tuple):
+        return self._connect().execute(query, params).fetchall()
+    
+    def _execute(self, query: str, params: tuple):
+        connection = self._connect()
+        with connection:
+            connection.execute(query, params)
+    
+    async def get_user_language(self, user_id: Union[int, str]) -> str:
+        """Get the preferred language for a user"""
+        row = await self._run(self._fetchone, "SELECT language FROM users WHERE user_id = ?", (str(user_id),))
+        return row[0] if row else 'en'
+    
+    async def set_user_language(self, user_id: Union[int, str], language: str) -> None:
+        """Set the preferred language for a user"""
+        await self._run(
+            self._execute,
+            "INSERT INTO users (user_id, language) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET language = excluded.language",
+            (str(user_id), language)
+        )
+    
+    async def get_guild_auto_translate(self, guild_id: Union[int, str]) -> bool:
+        """Check if auto-translate is enabled for a guild"""
+        row = await self._run(self._fetchone, "SELECT auto_translate FROM guilds WHERE guild_id = ?", (str(guild_id),))
+        return bool(row[0]) if row else False
+    
+    async def set_guild_auto_translate(self, guild_id: Union[int, str], enabled: bool) -> None:
+        """Enable or disable auto-translate for a guild"""
+        await self._run(
+            self._execute,
+            "INSERT INTO guilds (guild_id, auto_translate) VALUES (?, ?) "
+            "ON CONFLICT(guild_id) DO UPDATE SET auto_translate = excluded.auto_translate",
+            (str(guild_id), int(enabled))
+        )
+        if enabled:
+            self._enabled_guilds.add(int(guild_id))
+        else:
+            self._enabled_guilds.discard(int(guild_id))
+        self._reindex_guild(int(guild_id))
+    
+    async def get_guild_channels_auto_translate(self, guild_id: Union[int, str]) -> List[str]:
+        """Get channels with auto-translate enabled for a guild"""
+        rows = await self._run(
+            self._fetchall,
+            "SELECT channel_id FROM guild_channels WHERE guild_id = ? ORDER BY rowid",
+            (str(guild_id),)
+        )
+        return [row[0] for row in rows]
+    
+    async def add_guild_channel_auto_translate(self, guild_id: Union[int, str], channel_id: Union[int, str]) -> None:
+        """Add a channel to auto-translate list for a guild"""
+        await self._run(
+            self._execute,
+            "INSERT OR IGNORE INTO guild_channels (guild_id, channel_id) VALUES (?, ?)",
+            (str(guild_id), str(channel_id))
+        )
+        self._guild_channels.setdefault(int(guild_id), set()).add(int(channel_id))
+        self._reindex_guild(int(guild_id))
+    
+    async def remove_guild_channel_auto_translate(self, guild_id: Union[int, str], channel_id: Union[int, str]) -> None:
+        """Remove a channel from auto-translate list for a guild"""
+        await self._run(
+            self._execute,
+            "DELETE FROM guild_channels WHERE guild_id = ? AND channel_id = ?",
+            (str(guild_id), str(channel_id))
+        )
+        self._guild_channels.get(int(guild_id), set()).discard(int(channel_id))
+        self._reindex_guild(int(guild_id))
+    
+    async def get_channel_delivery_mode(self, guild_id: Union[int, str], channel_id: Union[int, str]) -> str:
+        """Get how auto-translations are posted in a channel ('separate' or 'combined')"""
+        return self._delivery_modes.get(int(channel_id), 'separate')
+    
+    async def set_channel_delivery_mode(self, guild_id: Union[int, str], channel_id: Union[int, str], mode: str) -> None:
+        """Set how auto-translations are posted in a channel ('separate' or 'combined')"""
+        await self._run(
+            self._execute,
+            "INSERT INTO channel_settings (channel_id, guild_id, delivery_mode) VALUES (?, ?, ?) "
+            "ON CONFLICT(channel_id) DO UPDATE SET delivery_mode = excluded.delivery_mode",
+            (str(channel_id), str(guild_id), mode)
+        )
+        self._delivery_modes[int(channel_id)] = mode
+    
+    async def get_message_translations(self, message_id: Union[int, str]) -> Dict[str, str]:
+        """Get translations for a message"""
+        rows = await self._run(
+            self._fetchall,
+            "SELECT language, translation FROM message_translations WHERE message_id = ? AND created_at >= ?",
+            (str(message_id), time.time() - CONFIG['message_retention']['max_age'])
+        )
+        return {language: translation for language, translation in rows}
+    
+    async def add_message_translation(self, message_id: Union[int, str], language: str, translation: str) -> None:
+        """Add a translation for a message"""
+        await self._run(
+            self._execute,
+            "INSERT OR REPLACE INTO message_translations (message_id, language, translation, created_at) VALUES (?, ?, ?, ?)",
+            (str(message_id), language, translation, time.time())
+        )
+    
+    def _compact_messages(self, max_age: float, max_entries: int) -> int:
+        """Delete expired and overflow message translations (runs on the database thread)
+
+        Returns the number of messages removed, like the JSON backend, rather than translation rows.
+        """
+        connection = self._connect()
+        count_messages = "SELECT COUNT(DISTINCT message_id) FROM message_translations"
+        with connection:
+            before = connection.execute(count_messages).fetchone()[0]
+            connection.execute(
+                "DELETE FROM message_translations WHERE created_at < ?",
+                (time.time() - max_age,)
+            )
+            count = connection.execute(count_messages).fetchone()[0]
+            if count > max_entries:
+                connection.execute(
+                    "DELETE FROM message_translations WHERE message_id IN ("
+                    "SELECT message_id FROM message_translations GROUP BY message_id "
+                    "ORDER BY MIN(created_at) LIMIT ?)",
+                    (count - max_entries,)
+                )
+                count = max_entries
+        return before - count
+    
+    async def compact_messages(self, max_age: float, max_entries: int) -> int:
+        """Remove message translations older than max_age and the oldest ones beyond max_entries"""
+        return await self._run(self._compact_messages, max_age, max_entries)
+    
+    async def flush(self) -> None:
+        """Writes are committed as they happen, so there is nothing to flush"""
+    
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+    
+    async def close(self) -> None:
+        """Close the database connection; it is reopened on next use"""
+        await self._run(self._close)
 
 # Create database instance
-db = Database()
+if CONFIG['database_backend'] == 'sqlite':
+    db = SQLiteDatabase()
+else:
+    db = Database()
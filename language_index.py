@@ -0,0 +1,140 @@
+import logging
+from typing import Dict, Iterable, Optional, Set
+
+from config import LANGUAGES
+from utils.language_utils import LANGUAGE_NAMES
+
+logger = logging.getLogger('discord')
+
+# Every language code the bot uses itself
+KNOWN_LANGUAGES = frozenset(LANGUAGES.values()) | frozenset(LANGUAGE_NAMES)
+
+class LanguageIndex:
+    """Which languages one provider translates from and to, and the codes it uses for them.
+
+    Built at startup from the bot's own languages and the provider's
+    configured list and code tables, so routing can turn down an impossible
+    pair without a request. refresh() narrows or widens it to what the
+    provider's languages endpoint reports. Until then, codes the bot doesn't
+    know are let through, as they were before the index existed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        languages: Optional[Iterable[str]] = None,
+        source_codes: Optional[Dict[str, str]] = None,
+        target_codes: Optional[Dict[str, str]] = None,
+        aliases: Optional[Dict[str, str]] = None,
+        uppercase: bool = False
+    ):
+        self.name = name
+        self.uppercase = uppercase
+        seed = KNOWN_LANGUAGES if languages is None else KNOWN_LANGUAGES & set(languages)
+        self.sources: frozenset = frozenset(seed)
+        self.targets: frozenset = frozenset(seed)
+        # Source -> targets, for providers that report pairs rather than languages
+        self.pair_targets: Optional[Dict[str, frozenset]] = None
+        self.refreshed = False
+
+        # Precomputed code tables: bot code -> provider code
+        self.source_codes = {code: self._default_code(code) for code in KNOWN_LANGUAGES}
+        self.source_codes.update(source_codes or {})
+        self.target_codes = {code: self._default_code(code) for code in KNOWN_LANGUAGES}
+        self.target_codes.update(target_codes or {})
+
+        # Provider code (lowercased) -> bot codes, for reading the languages endpoint;
+        # aliases are other codes the provider may report for a language
+        self._reverse: Dict[str, Set[str]] = {}
+        for table in (self.source_codes, self.target_codes):
+            for code, provider_code in table.items():
+                self._reverse.setdefault(provider_code.lower(), set()).add(code)
+        for provider_code, code in (aliases or {}).items():
+            self._reverse.setdefault(provider_code.lower(), set()).add(code)
+
+    def _default_code(self, code: str) -> str:
+        return code.upper() if self.uppercase else code
+
+    def source_code(self, language: Optional[str]) -> Optional[str]:
+        """The provider's code for a source language, None for auto-detect"""
+        if not language or language == 'auto':
+            return None
+        return self.source_codes.get(language) or self._default_code(language)
+
+    def target_code(self, language: str) -> str:
+        return self.target_codes.get(language) or self._default_code(language)
+
+    def _has(self, languages: frozenset, language: str) -> bool:
+        if language in languages:
+            return True
+        # Unknown codes (e.g. a detected language the bot has no flag for) pass until the provider says otherwise
+        return language not in KNOWN_LANGUAGES and not self.refreshed
+
+    def supports(self, source_lang: Optional[str], target_lang: str) -> bool:
+        """Whether the provider can translate between the two languages; a missing source means auto-detect"""
+        if not self._has(self.targets, target_lang):
+            return False
+        if not source_lang or source_lang == 'auto':
+            return True
+        if not self._has(self.sources, source_lang):
+            return False
+        if self.pair_targets is not None and source_lang in self.pair_targets:
+            return target_lang in self.pair_targets[source_lang]
+        return True
+
+    def _to_bot_codes(self, provider_codes: Iterable[str]) -> Dict[str, str]:
+        """Map the provider's codes back to the bot's, keeping codes the bot doesn't know as they are.
+
+        Returns bot code -> provider code as reported.
+        """
+        codes = {}
+        for provider_code in provider_codes:
+            key = provider_code.lower()
+            if key in self._reverse:
+                for code in self._reverse[key]:
+                    codes.setdefault(code, provider_code)
+            elif key.split('-')[0] in KNOWN_LANGUAGES:
+                # Regional variants such as EN-GB still cover the base language
+                codes.setdefault(key.split('-')[0], provider_code)
+            else:
+                codes.setdefault(key, provider_code)
+        return codes
+
+    @staticmethod
+    def _adopt_codes(table: Dict[str, str], provider_codes: Iterable[str], reported: Dict[str, str]):
+        """Switch to the code the provider reports where the precomputed one isn't among them"""
+        available = {code.lower() for code in provider_codes}
+        for code, provider_code in reported.items():
+            if code in table and table[code].lower() not in available:
+                table[code] = provider_code
+
+    def refresh(
+        self,
+        sources: Iterable[str],
+        targets: Iterable[str],
+        pair_targets: Optional[Dict[str, Iterable[str]]] = None
+    ):
+        """Replace the index with languages reported by the provider, in the provider's codes"""
+        sources = list(sources)
+        targets = list(targets)
+        reported_sources = self._to_bot_codes(sources)
+        reported_targets = self._to_bot_codes(targets)
+        if not reported_sources or not reported_targets:
+            # An empty or unreadable answer shouldn't wipe out a working index
+            logger.warning(f"Ignoring empty language list from translation service {self.name}")
+            return
+        if pair_targets is not None:
+            pairs: Dict[str, frozenset] = {}
+            for source, provider_targets in pair_targets.items():
+                for code in self._to_bot_codes([source]):
+                    pairs[code] = pairs.get(code, frozenset()) | frozenset(self._to_bot_codes(provider_targets))
+            self.pair_targets = pairs
+
+        self._adopt_codes(self.source_codes, sources, reported_sources)
+        self._adopt_codes(self.target_codes, targets, reported_targets)
+        missing = (self.targets & KNOWN_LANGUAGES) - set(reported_targets)
+        if missing:
+            logger.info(f"Translation service {self.name} does not support: {', '.join(sorted(missing))}")
+        self.sources = frozenset(reported_sources)
+        self.targets = frozenset(reported_targets)
+        self.refreshed = True
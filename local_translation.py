@@ -0,0 +1,223 @@
+import asyncio
+import importlib
+import json
+import logging
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from config import CONFIG
+
+logger = logging.getLogger('discord')
+
+# Common short chat phrases by language. The first form of each language is
+# the one produced as output, as written; further forms are accepted as input
+# only. Lookups ignore case.
+PHRASES: List[Dict[str, List[str]]] = [
+    {'en': ['hello', 'hi', 'hey'], 'es': ['hola'], 'fr': ['bonjour', 'salut'], 'de': ['hallo'], 'it': ['ciao'],
+     'pt': ['olá', 'oi'], 'ru': ['привет'], 'ja': ['こんにちは'], 'ko': ['안녕하세요'], 'zh-CN': ['你好'], 'zh-TW': ['你好'],
+     'nl': ['hallo'], 'sv': ['hej'], 'pl': ['cześć'], 'tr': ['merhaba'], 'id': ['halo'], 'vi': ['xin chào'],
+     'hi': ['नमस्ते'], 'ar': ['مرحبا'], 'th': ['สวัสดี']},
+    {'en': ['thanks', 'thank you', 'thx', 'ty'], 'es': ['gracias'], 'fr': ['merci'], 'de': ['danke'], 'it': ['grazie'],
+     'pt': ['obrigado', 'obrigada'], 'ru': ['спасибо'], 'ja': ['ありがとう'], 'ko': ['감사합니다'], 'zh-CN': ['谢谢'],
+     'zh-TW': ['謝謝'], 'nl': ['bedankt', 'dank je'], 'sv': ['tack'], 'pl': ['dziękuję'], 'tr': ['teşekkürler'],
+     'id': ['terima kasih'], 'vi': ['cảm ơn'], 'hi': ['धन्यवाद'], 'ar': ['شكرا'], 'th': ['ขอบคุณ']},
+    {'en': ['good morning'], 'es': ['buenos días'], 'fr': ['bonjour'], 'de': ['Guten Morgen'], 'it': ['buongiorno'],
+     'pt': ['bom dia'], 'ru': ['доброе утро'], 'ja': ['おはようございます'], 'ko': ['좋은 아침입니다'], 'zh-CN': ['早上好'],
+     'zh-TW': ['早安'], 'nl': ['goedemorgen'], 'sv': ['god morgon'], 'pl': ['dzień dobry'], 'tr': ['günaydın'],
+     'id': ['selamat pagi'], 'vi': ['chào buổi sáng'], 'hi': ['सुप्रभात'], 'ar': ['صباح الخير'], 'th': ['อรุณสวัสดิ์']},
+    {'en': ['good night', 'goodnight'], 'es': ['buenas noches'], 'fr': ['bonne nuit'], 'de': ['Gute Nacht'],
+     'it': ['buonanotte'], 'pt': ['boa noite'], 'ru': ['спокойной ночи'], 'ja': ['おやすみなさい'], 'ko': ['안녕히 주무세요'],
+     'zh-CN': ['晚安'], 'zh-TW': ['晚安'], 'nl': ['goedenacht'], 'sv': ['god natt'], 'pl': ['dobranoc'],
+     'tr': ['iyi geceler'], 'id': ['selamat malam'], 'vi': ['chúc ngủ ngon'], 'hi': ['शुभ रात्रि'],
+     'ar': ['تصبح على خير'], 'th': ['ราตรีสวัสดิ์']},
+    {'en': ['goodbye', 'bye'], 'es': ['adiós'], 'fr': ['au revoir'], 'de': ['Tschüss', 'Auf Wiedersehen'],
+     'it': ['arrivederci'], 'pt': ['tchau', 'adeus'], 'ru': ['пока', 'до свидания'], 'ja': ['さようなら'],
+     'ko': ['안녕히 가세요'], 'zh-CN': ['再见'], 'zh-TW': ['再見'], 'nl': ['doei', 'tot ziens'], 'sv': ['hej då'],
+     'pl': ['do widzenia'], 'tr': ['hoşça kal'], 'id': ['sampai jumpa'], 'vi': ['tạm biệt'], 'hi': ['अलविदा'],
+     'ar': ['وداعا'], 'th': ['ลาก่อน']},
+    {'en': ['see you later', 'see you', 'cya'], 'es': ['hasta luego'], 'fr': ['à plus tard', 'à plus'],
+     'de': ['bis später'], 'it': ['a dopo'], 'pt': ['até logo'], 'ru': ['увидимся'], 'ja': ['またね'],
+     'ko': ['나중에 봐요'], 'zh-CN': ['回头见'], 'zh-TW': ['回頭見'], 'nl': ['tot later'], 'sv': ['vi ses'],
+     'pl': ['do zobaczenia'], 'tr': ['sonra görüşürüz'], 'id': ['sampai nanti'], 'vi': ['hẹn gặp lại'],
+     'hi': ['फिर मिलेंगे'], 'ar': ['أراك لاحقا'], 'th': ['แล้วพบกันใหม่']},
+    {'en': ['yes'], 'es': ['sí'], 'fr': ['oui'], 'de': ['ja'], 'it': ['sì'], 'pt': ['sim'], 'ru': ['да'],
+     'ja': ['はい'], 'ko': ['네'], 'zh-CN': ['是'], 'zh-TW': ['是'], 'nl': ['ja'], 'sv': ['ja'], 'pl': ['tak'],
+     'tr': ['evet'], 'id': ['ya'], 'vi': ['vâng'], 'hi': ['हाँ'], 'ar': ['نعم'], 'th': ['ใช่']},
+    {'en': ['no'], 'es': ['no'], 'fr': ['non'], 'de': ['nein'], 'it': ['no'], 'pt': ['não'], 'ru': ['нет'],
+     'ja': ['いいえ'], 'ko': ['아니요'], 'zh-CN': ['不'], 'zh-TW': ['不'], 'nl': ['nee'], 'sv': ['nej'], 'pl': ['nie'],
+     'tr': ['hayır'], 'id': ['tidak'], 'vi': ['không'], 'hi': ['नहीं'], 'ar': ['لا'], 'th': ['ไม่']},
+    {'en': ['please', 'pls'], 'es': ['por favor'], 'fr': ["s'il vous plaît", "s'il te plaît"], 'de': ['bitte'],
+     'it': ['per favore'], 'pt': ['por favor'], 'ru': ['пожалуйста'], 'ja': ['お願いします'], 'ko': ['부탁합니다'],
+     'zh-CN': ['请'], 'zh-TW': ['請'], 'nl': ['alsjeblieft'], 'sv': ['snälla'], 'pl': ['proszę'], 'tr': ['lütfen'],
+     'id': ['tolong'], 'vi': ['làm ơn'], 'hi': ['कृपया'], 'ar': ['من فضلك'], 'th': ['กรุณา']},
+    {'en': ['sorry'], 'es': ['lo siento', 'perdón'], 'fr': ['désolé', 'désolée'], 'de': ['Entschuldigung', 'sorry'],
+     'it': ['scusa'], 'pt': ['desculpe', 'desculpa'], 'ru': ['извините', 'прости'], 'ja': ['ごめんなさい'],
+     'ko': ['죄송합니다'], 'zh-CN': ['对不起'], 'zh-TW': ['對不起'], 'nl': ['sorry'], 'sv': ['förlåt'],
+     'pl': ['przepraszam'], 'tr': ['özür dilerim'], 'id': ['maaf'], 'vi': ['xin lỗi'], 'hi': ['माफ़ कीजिए'],
+     'ar': ['آسف'], 'th': ['ขอโทษ']},
+    {'en': ['welcome'], 'es': ['bienvenido'], 'fr': ['bienvenue'], 'de': ['Willkommen'], 'it': ['benvenuto'],
+     'pt': ['bem-vindo'], 'ru': ['добро пожаловать'], 'ja': ['ようこそ'], 'ko': ['환영합니다'], 'zh-CN': ['欢迎'],
+     'zh-TW': ['歡迎'], 'nl': ['welkom'], 'sv': ['välkommen'], 'pl': ['witamy'], 'tr': ['hoş geldiniz'],
+     'id': ['selamat datang'], 'vi': ['chào mừng'], 'hi': ['स्वागत है'], 'ar': ['أهلا وسهلا'], 'th': ['ยินดีต้อนรับ']},
+    {'en': ['congratulations', 'congrats', 'gratz'], 'es': ['felicidades', 'felicitaciones'], 'fr': ['félicitations'],
+     'de': ['Herzlichen Glückwunsch'], 'it': ['congratulazioni'], 'pt': ['parabéns'], 'ru': ['поздравляю'],
+     'ja': ['おめでとうございます'], 'ko': ['축하합니다'], 'zh-CN': ['恭喜'], 'zh-TW': ['恭喜'], 'nl': ['gefeliciteerd'],
+     'sv': ['grattis'], 'pl': ['gratulacje'], 'tr': ['tebrikler'], 'id': ['selamat'], 'vi': ['chúc mừng'],
+     'hi': ['बधाई हो'], 'ar': ['مبروك'], 'th': ['ยินดีด้วย']},
+    {'en': ['good luck', 'gl'], 'es': ['buena suerte'], 'fr': ['bonne chance'], 'de': ['Viel Glück'],
+     'it': ['buona fortuna'], 'pt': ['boa sorte'], 'ru': ['удачи'], 'ja': ['幸運を祈ります'], 'ko': ['행운을 빕니다'],
+     'zh-CN': ['祝你好运'], 'zh-TW': ['祝你好運'], 'nl': ['veel succes'], 'sv': ['lycka till'], 'pl': ['powodzenia'],
+     'tr': ['iyi şanslar'], 'id': ['semoga berhasil'], 'vi': ['chúc may mắn'], 'hi': ['शुभकामनाएँ'],
+     'ar': ['حظا سعيدا'], 'th': ['โชคดี']},
+    {'en': ['well done', 'good job', 'gj'], 'es': ['buen trabajo'], 'fr': ['bien joué', 'bravo'], 'de': ['gut gemacht'],
+     'it': ['ben fatto'], 'pt': ['bom trabalho'], 'ru': ['молодец'], 'ja': ['よくできました'], 'ko': ['잘했어요'],
+     'zh-CN': ['干得好'], 'zh-TW': ['幹得好'], 'nl': ['goed gedaan'], 'sv': ['bra jobbat'], 'pl': ['dobra robota'],
+     'tr': ['aferin'], 'id': ['kerja bagus'], 'vi': ['làm tốt lắm'], 'hi': ['शाबाश'], 'ar': ['أحسنت'],
+     'th': ['เก่งมาก']},
+    {'en': ['happy birthday'], 'es': ['feliz cumpleaños'], 'fr': ['joyeux anniversaire'],
+     'de': ['Alles Gute zum Geburtstag'], 'it': ['buon compleanno'], 'pt': ['feliz aniversário'],
+     'ru': ['с днём рождения'], 'ja': ['お誕生日おめでとう'], 'ko': ['생일 축하해요'], 'zh-CN': ['生日快乐'],
+     'zh-TW': ['生日快樂'], 'nl': ['gefeliciteerd met je verjaardag'], 'sv': ['grattis på födelsedagen'],
+     'pl': ['wszystkiego najlepszego'], 'tr': ['doğum günün kutlu olsun'], 'id': ['selamat ulang tahun'],
+     'vi': ['chúc mừng sinh nhật'], 'hi': ['जन्मदिन मुबारक'], 'ar': ['عيد ميلاد سعيد'], 'th': ['สุขสันต์วันเกิด']},
+]
+
+# Punctuation around a phrase that is kept as it is rather than looked up
+_EDGE_PUNCTUATION = re.compile(r'^([\s¡¿"\'(]*)(.*?)([\s!?.,…~"\')]*)$', re.DOTALL)
+
+class PhraseTableEngine:
+    """Translates whole messages that are one of a table of common chat phrases.
+
+    Anything else comes back as None so it goes to a provider instead.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        rows = list(PHRASES)
+        if path:
+            with open(path, 'r', encoding='utf-8') as f:
+                # Same layout as PHRASES; a single form may be given as a plain string
+                rows.extend(
+                    {language: [forms] if isinstance(forms, str) else forms for language, forms in row.items()}
+                    for row in json.load(f)
+                )
+        # (language, normalized phrase) -> row; the first row listing a phrase wins
+        self.index: Dict[Tuple[str, str], Dict[str, List[str]]] = {}
+        for row in rows:
+            for language, forms in row.items():
+                for form in forms:
+                    self.index.setdefault((language, self.normalize(form)), row)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return ' '.join(text.lower().split())
+
+    def translate_one(self, text: str, target_lang: str, source_lang: Optional[str] = None) -> Optional[str]:
+        # Short phrases mean different things in different languages ('ya', 'hi'), so guess nothing
+        if not source_lang:
+            return None
+        leading, core, trailing = _EDGE_PUNCTUATION.match(text).groups()
+        phrase = self.normalize(core)
+        if not phrase:
+            return None
+        row = self.index.get((source_lang, phrase))
+        if row is None or target_lang not in row:
+            return None
+        translated = row[target_lang][0]
+        # A capitalized message gets a capitalized translation, for scripts that have case
+        if core[:1].isupper():
+            translated = translated[:1].upper() + translated[1:]
+        # Inverted marks only make sense in Spanish
+        if target_lang != 'es':
+            leading = leading.replace('¡', '').replace('¿', '')
+        return f"{leading}{translated}{trailing}"
+
+    def translate(self, texts: List[str], target_langs: List[str], source_lang: Optional[str] = None) -> List[Optional[str]]:
+        return [self.translate_one(text, target_lang, source_lang) for text, target_lang in zip(texts, target_langs)]
+
+def load_engine(spec: str, phrase_table_path: Optional[str] = None):
+    """Build the engine named in the config: 'phrase_table' or 'module:factory'.
+
+    A custom factory is called without arguments and must return an object
+    with translate(texts, target_langs, source_lang) -> list of str or None.
+    """
+    if spec == 'phrase_table':
+        return PhraseTableEngine(phrase_table_path)
+    module_name, _, attribute = spec.partition(':')
+    factory = getattr(importlib.import_module(module_name), attribute)
+    return factory()
+
+# The engine of a worker process, loaded once by its initializer
+_worker_engine = None
+
+def _init_worker(spec: str, phrase_table_path: Optional[str]):
+    global _worker_engine
+    _worker_engine = load_engine(spec, phrase_table_path)
+
+def _translate_in_worker(texts: List[str], target_langs: List[str], source_lang: Optional[str]) -> List[Optional[str]]:
+    return _worker_engine.translate(texts, target_langs, source_lang)
+
+class LocalTranslator:
+    """Runs the local translation engine on the event loop, or in a process pool for slow engines.
+
+    The pool's workers are spawned rather than forked: the bot shares its
+    process with the dashboard's threads, and forking a threaded process can
+    deadlock the child.
+
+    Results are None for texts the engine can't translate, and for every text
+    when the engine fails or is too slow; callers send those to a provider.
+    """
+
+    def __init__(self):
+        self.settings = CONFIG['local_translation']
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._engine = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings['enabled']
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.settings['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.settings['engine'], self.settings['phrase_table_path'])
+            )
+        return self._pool
+
+    async def translate(self, texts: List[str], target_langs: List[str], source_lang: Optional[str] = None) -> List[Optional[str]]:
+        if not self.enabled or not texts:
+            return [None] * len(texts)
+        try:
+            if self.settings['workers'] <= 0:
+                if self._engine is None:
+                    self._engine = load_engine(self.settings['engine'], self.settings['phrase_table_path'])
+                return self._engine.translate(texts, target_langs, source_lang)
+            loop = asyncio.get_running_loop()
+            return await asyncio.wait_for(
+                loop.run_in_executor(self._executor(), _translate_in_worker, texts, target_langs, source_lang),
+                self.settings['timeout']
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Local translation timed out; falling back to the providers")
+        except BrokenProcessPool:
+            # A crashed worker takes the pool with it; start a new one next time
+            logger.error("Local translation worker died; restarting the pool")
+            self._pool = None
+        except Exception as e:
+            logger.error(f"Local translation failed: {e}")
+        return [None] * len(texts)
+
+    async def warm_up(self):
+        """Start the worker processes and load the engine ahead of the first message"""
+        if self.enabled:
+            await self.translate(['hello'], ['en'], 'en')
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -1,5 +1,5 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response
 import discord
 import asyncio
 import threading
@@ -22,6 +22,8 @@ logger = logging.getLogger('discord_bot_dashboard')
 from config import CONFIG, LANGUAGES, LANGUAGE_TO_FLAG
 from utils.language_utils import get_language_name
 from bot import TranslatorBot
+from budget import budget_manager
+from metrics import REGISTRY
 
 # Create Flask app
 app = Flask(__name__)
@@ -208,6 +210,9 @@ def index():
         "recent_translations": TranslationLog.query.order_by(TranslationLog.timestamp.desc()).limit(5).all()
     }
     
+    # Character usage against provider and guild budgets
+    budgets = budget_manager.snapshot()
+    
     return render_template(
         'index.html',
         bot_status=bot_status,
@@ -216,7 +221,8 @@ def index():
         libre_api_key_set=libre_api_key_set,
         languages=languages,
         config=CONFIG,
-        stats=stats
+        stats=stats,
+        budgets=budgets
     )
 
 @app.route('/start_bot', methods=['POST'])
@@ -359,6 +365,11 @@ def get_bot_status():
             "last_update": datetime.now().timestamp()
         })
 
+@app.route('/metrics')
+def metrics():
+    """Expose bot metrics in the Prometheus text format"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/help')
 def help_page():
     """Show help information"""
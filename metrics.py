@@ -0,0 +1,185 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Upper bounds in seconds; covers in-memory lookups through slow provider calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class _Metric:
+    """Base for metrics keyed by label values; updates come from the bot thread, reads from Flask's"""
+
+    kind = ''
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = self._header()
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+class CallbackMetric(_Metric):
+    """Values read from a callback when the metrics are scraped, for state other objects already keep.
+
+    The callback returns a dict of label tuples (sorted (name, value) pairs) to values.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        callback: Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]
+    ):
+        super().__init__(name, documentation)
+        self.kind = kind
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        try:
+            values = self.callback()
+        except Exception:
+            # A collector that fails mid-shutdown shouldn't break the whole scrape
+            values = {}
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+class Histogram(_Metric):
+    """Fixed-bucket latency histogram"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> (per-bucket counts, the last one for +Inf, sum)
+        self._values: Dict[Tuple[Tuple[str, str], ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts = entry[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            entry[1] += value
+
+    def time(self, **labels) -> 'Timer':
+        """Context manager that observes the time spent inside it"""
+        return Timer(self, labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = {key: ([*counts], total) for key, (counts, total) in self._values.items()}
+        lines = self._header()
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+class Timer:
+    """Times a block and records it in a histogram"""
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self) -> 'Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+class Registry:
+    """Every metric the bot exposes, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+# Time spent in each stage of a handler, e.g. handler="auto_translate", stage="detect_language"
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'tonguetwist_stage_seconds',
+    'Time spent in each stage of message, reaction and command handling'
+))
+HANDLED_TOTAL = REGISTRY.register(Counter(
+    'tonguetwist_handled_total',
+    'Messages, reactions and commands handled, by outcome'
+))
+PROVIDER_SECONDS = REGISTRY.register(Histogram(
+    'tonguetwist_provider_request_seconds',
+    'Latency of translation provider requests'
+))
+PROVIDER_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    'tonguetwist_provider_requests_total',
+    'Translation provider requests, by outcome'
+))
+PROVIDER_CHARACTERS_TOTAL = REGISTRY.register(Counter(
+    'tonguetwist_provider_characters_total',
+    'Characters sent to translation providers'
+))
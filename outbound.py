@@ -0,0 +1,204 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import discord
+
+from config import CONFIG
+
+logger = logging.getLogger('discord')
+
+# Priority classes, lower runs first
+INTERACTIVE = 0  # Replies to something a user just did (slash commands, flag reactions, 🌐 DMs)
+BACKGROUND = 1  # Auto-translation posts and reactions
+
+class OutboundQueueFull(Exception):
+    """Raised when a background job is submitted to a route whose queue is full"""
+
+class _PriorityGate:
+    """Counting semaphore that hands free slots to the highest-priority waiter first"""
+
+    def __init__(self, slots: int):
+        self._slots = slots
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    async def acquire(self, priority: int):
+        if self._slots > 0 and not self._waiters:
+            self._slots -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # A slot handed to us just before cancellation goes to the next waiter
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._slots += 1
+
+class OutboundScheduler:
+    """Central queue for outbound Discord REST calls.
+
+    Jobs are queued per route (the rate-limit bucket they hit, e.g. one
+    channel's webhooks) and run in priority order by that route's workers. A
+    global gate caps in-flight calls across all routes, and queue depth is
+    exposed so callers can shed or merge work under pressure.
+    """
+
+    def __init__(self):
+        settings = CONFIG['outbound']
+        self.max_in_flight = settings['max_in_flight']
+        self.congestion_depth = settings['congestion_depth']
+        self.max_queue_depth = settings['max_queue_depth']
+        self.idle_timeout = settings['idle_timeout']
+        self.route_concurrency = settings['route_concurrency']
+        self._gate = None
+        self._queues: Dict[str, asyncio.PriorityQueue] = {}
+        self._workers: Dict[str, List[asyncio.Task]] = {}
+        self._blocked_until: Dict[str, float] = {}
+        self._sequence = itertools.count()
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rate_limited': 0, 'rejected': 0}
+
+    def _concurrency_for(self, route: str) -> int:
+        """Workers per route; routes are named '<kind>:<id>'"""
+        return self.route_concurrency.get(route.split(':', 1)[0], 1)
+
+    def submit_nowait(
+        self,
+        route: str,
+        job: Callable[[], Awaitable[Any]],
+        priority: int = BACKGROUND
+    ) -> asyncio.Future:
+        """Queue a job and return a future for its result without waiting"""
+        loop = asyncio.get_running_loop()
+        if self._gate is None:
+            self._gate = _PriorityGate(self.max_in_flight)
+
+        queue = self._queues.get(route)
+        if queue is None:
+            queue = self._queues[route] = asyncio.PriorityQueue()
+        if priority >= BACKGROUND and queue.qsize() >= self.max_queue_depth:
+            self.stats['rejected'] += 1
+            raise OutboundQueueFull(f"Outbound queue for {route} is full")
+
+        future = loop.create_future()
+        queue.put_nowait((priority, next(self._sequence), job, future))
+        self.stats['submitted'] += 1
+
+        # Start workers for the route if it has fewer than it should
+        workers = [task for task in self._workers.get(route, []) if not task.done()]
+        while len(workers) < self._concurrency_for(route):
+            workers.append(loop.create_task(self._worker(route, queue)))
+        self._workers[route] = workers
+        return future
+
+    async def submit(self, route: str, job: Callable[[], Awaitable[Any]], priority: int = BACKGROUND) -> Any:
+        """Queue a job and wait for its result"""
+        return await self.submit_nowait(route, job, priority)
+
+    def post(self, route: str, job: Callable[[], Awaitable[Any]], priority: int = BACKGROUND):
+        """Queue a job without waiting for it; failures and rejections are logged instead of raised"""
+        try:
+            future = self.submit_nowait(route, job, priority)
+        except OutboundQueueFull as e:
+            logger.warning(str(e))
+            return None
+
+        def log_failure(done: asyncio.Future):
+            if not done.cancelled() and done.exception():
+                logger.error(f"Outbound job on {route} failed: {done.exception()}")
+        future.add_done_callback(log_failure)
+        return future
+
+    async def _worker(self, route: str, queue: asyncio.PriorityQueue):
+        """Run a route's jobs one at a time, honouring rate-limit pauses"""
+        while True:
+            try:
+                priority, _, job, future = await asyncio.wait_for(queue.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                # Idle routes give their worker back; a new one starts on the next submit
+                if queue.empty():
+                    workers = self._workers.get(route, [])
+                    if asyncio.current_task() in workers:
+                        workers.remove(asyncio.current_task())
+                    if not workers:
+                        self._workers.pop(route, None)
+                        self._queues.pop(route, None)
+                        self._blocked_until.pop(route, None)
+                    return
+                continue
+
+            if future.done():
+                continue
+
+            delay = self._blocked_until.get(route, 0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            await self._gate.acquire(priority)
+            try:
+                result = await job()
+                if not future.done():
+                    future.set_result(result)
+                self.stats['completed'] += 1
+            except (discord.RateLimited, discord.HTTPException) as e:
+                retry_after = getattr(e, 'retry_after', None)
+                if isinstance(e, discord.RateLimited) or getattr(e, 'status', None) == 429:
+                    # Pause the whole route and put the job back at the front of its class
+                    self.stats['rate_limited'] += 1
+                    self._blocked_until[route] = time.monotonic() + (retry_after or 1.0)
+                    logger.warning(f"Outbound route {route} rate limited for {retry_after or 1.0:.2f}s")
+                    queue.put_nowait((priority, -next(self._sequence), job, future))
+                else:
+                    self.stats['failed'] += 1
+                    if not future.done():
+                        future.set_exception(e)
+            except Exception as e:
+                self.stats['failed'] += 1
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._gate.release()
+
+    def queue_depth(self, route: str) -> int:
+        queue = self._queues.get(route)
+        return queue.qsize() if queue else 0
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Pending jobs per route, for metrics"""
+        return {route: queue.qsize() for route, queue in self._queues.items() if queue.qsize()}
+
+    def is_congested(self, route: str) -> bool:
+        """The route is backing up; callers should merge work where they can"""
+        return self.queue_depth(route) >= self.congestion_depth
+
+    def is_saturated(self, route: str) -> bool:
+        """The route's queue is full; background work will be rejected"""
+        return self.queue_depth(route) >= self.max_queue_depth
+
+    async def close(self):
+        """Cancel all workers and fail any jobs still queued"""
+        for workers in self._workers.values():
+            for task in workers:
+                task.cancel()
+        for queue in self._queues.values():
+            while not queue.empty():
+                _, _, _, future = queue.get_nowait()
+                if not future.done():
+                    future.cancel()
+        self._workers.clear()
+        self._queues.clear()
+        self._blocked_until.clear()
+        # The gate stays: cancelled workers still release their slots as they unwind
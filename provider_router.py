@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+from budget import HARD, OK, SOFT, budget_manager
+from config import CONFIG, DEFAULT_TRANSLATION_SERVICE, TRANSLATION_SERVICES
+
+logger = logging.getLogger('discord')
+
+class TokenBucket:
+    """Token bucket that refills continuously at rate tokens per second up to capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> bool:
+        self._refill()
+        return self.tokens >= 1
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def time_until_available(self) -> float:
+        """Seconds until the next token is available"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+class CircuitBreaker:
+    """Opens when the recent error rate is too high, then lets a single trial request through after a cooldown"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate: float, min_requests: int, window: float, cooldown: float):
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.results = deque()  # (timestamp, succeeded)
+
+    def _trim(self, now: float):
+        while self.results and now - self.results[0][0] > self.window:
+            self.results.popleft()
+
+    def allows_request(self) -> bool:
+        """Whether a request may be sent now (does not reserve the half-open trial)"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+            self.trial_in_flight = False
+        if self.state == self.HALF_OPEN:
+            return not self.trial_in_flight
+        return self.state == self.CLOSED
+
+    def on_request(self):
+        if self.state == self.HALF_OPEN:
+            self.trial_in_flight = True
+
+    def record(self, succeeded: bool):
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN:
+            self.trial_in_flight = False
+            if succeeded:
+                self.state = self.CLOSED
+                self.results.clear()
+            else:
+                self.state = self.OPEN
+                self.opened_at = now
+            return
+
+        self.results.append((now, succeeded))
+        self._trim(now)
+        failures = sum(1 for _, ok in self.results if not ok)
+        if len(self.results) >= self.min_requests and failures / len(self.results) >= self.failure_rate:
+            self.state = self.OPEN
+            self.opened_at = now
+
+class ProviderHealth:
+    """Rate limit, breaker and latency statistics for one provider"""
+
+    def __init__(self, name: str, settings: Dict):
+        router_settings = CONFIG['provider_router']
+        self.name = name
+        self.bucket = TokenBucket(settings.get('requests_per_minute', 60) / 60, settings.get('burst', 10))
+        self.breaker = CircuitBreaker(
+            router_settings['failure_rate'],
+            router_settings['min_requests'],
+            router_settings['window'],
+            router_settings['cooldown']
+        )
+        self.latency = router_settings['initial_latency']  # Exponentially weighted moving average, in seconds
+        self.latencies = deque(maxlen=router_settings['latency_samples'])
+        self.requests = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def weight(self) -> float:
+        """Faster providers get proportionally more traffic"""
+        weight = 1 / max(self.latency, 0.01)
+        if self.name == DEFAULT_TRANSLATION_SERVICE:
+            weight *= CONFIG['provider_router']['default_bias']
+        # Providers close to their character budget get less traffic
+        if budget_manager.provider_level(self.name) == SOFT:
+            weight *= CONFIG['budgets']['soft_weight']
+        return weight
+
+    def p95_latency(self) -> Optional[float]:
+        """95th percentile of recent successful latencies, or None until there are enough samples"""
+        if len(self.latencies) < CONFIG['provider_router']['hedge_min_samples']:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+class ProviderRouter:
+    """Chooses a healthy, non-rate-limited provider for each upstream request"""
+
+    def __init__(self):
+        self.providers: Dict[str, ProviderHealth] = {
+            name: ProviderHealth(name, settings)
+            for name, settings in TRANSLATION_SERVICES.items()
+        }
+        # Every primary request earns a fraction of a hedge, which caps hedging's share of upstream traffic
+        self.hedge_tokens = float(CONFIG['provider_router']['hedge_burst'])
+        self.hedge_stats = {'sent': 0, 'won': 0, 'skipped': 0}
+
+    @staticmethod
+    def is_configured(name: str) -> bool:
+        """Enabled and, where the provider needs one, has an API key"""
+        settings = TRANSLATION_SERVICES.get(name, {})
+        if not settings.get('enabled'):
+            return False
+        return bool(settings.get('api_key')) or not settings.get('requires_api_key', False)
+
+    def candidates(self, exclude: Iterable[str] = ()) -> List[ProviderHealth]:
+        """Configured providers within budget whose breaker currently allows traffic"""
+        return [
+            health for name, health in self.providers.items()
+            if name not in exclude
+            and self.is_configured(name)
+            and health.breaker.allows_request()
+            and budget_manager.provider_level(name) != HARD
+        ]
+
+    def preferred(self) -> str:
+        """The provider new requests would most likely go to"""
+        candidates = self.candidates()
+        if not candidates:
+            return DEFAULT_TRANSLATION_SERVICE
+        return max(candidates, key=lambda health: health.weight()).name
+
+    def use_local(self, characters: int, economy: bool = False) -> bool:
+        """Whether a text should try the local engine before the providers.
+
+        Short texts always do; longer ones do while budgets are tight, that is
+        when economy is set or no provider is still within its soft budget.
+        """
+        settings = CONFIG['local_translation']
+        if not settings['enabled']:
+            return False
+        if characters <= settings['max_chars']:
+            return True
+        if characters > settings['economy_max_chars']:
+            return False
+        return economy or not any(budget_manager.provider_level(health.name) == OK for health in self.candidates())
+
+    def try_acquire(self, exclude: Iterable[str] = ()) -> Optional[str]:
+        """Pick a provider with a free token, weighted by observed latency, without waiting"""
+        name = self._take(exclude)
+        if name:
+            settings = CONFIG['provider_router']
+            self.hedge_tokens = min(settings['hedge_burst'], self.hedge_tokens + settings['hedge_max_ratio'])
+        return name
+
+    def _take(self, exclude: Iterable[str]) -> Optional[str]:
+        ready = [health for health in self.candidates(exclude) if health.bucket.available()]
+        if not ready:
+            return None
+        health = random.choices(ready, weights=[health.weight() for health in ready])[0]
+        health.bucket.try_acquire()
+        health.breaker.on_request()
+        health.requests += 1
+        return health.name
+
+    async def acquire(self, exclude: Iterable[str] = ()) -> Optional[str]:
+        """Pick a provider, queueing briefly if one frees up soon and rejecting (None) otherwise"""
+        exclude = set(exclude)
+        deadline = time.monotonic() + CONFIG['provider_router']['max_queue_wait']
+        while True:
+            name = self.try_acquire(exclude)
+            if name:
+                return name
+            candidates = self.candidates(exclude)
+            if not candidates:
+                return None
+            wait = min(health.bucket.time_until_available() for health in candidates)
+            if time.monotonic() + wait > deadline:
+                return None
+            await asyncio.sleep(wait)
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """How long to wait on a provider before hedging, or None if its request shouldn't be hedged"""
+        if not CONFIG['provider_router']['hedging']:
+            return None
+        return self.providers[name].p95_latency()
+
+    def try_acquire_hedge(self, exclude: Iterable[str] = ()) -> Optional[str]:
+        """Pick a backup provider for a hedged request if the hedging budget allows one"""
+        if self.hedge_tokens < 1:
+            self.hedge_stats['skipped'] += 1
+            return None
+        name = self._take(exclude)
+        if name:
+            self.hedge_tokens -= 1
+            self.hedge_stats['sent'] += 1
+        return name
+
+    def release(self, name: str):
+        """Forget a request that was cancelled before it finished, without judging the provider"""
+        self.providers[name].breaker.trial_in_flight = False
+
+    def record_success(self, name: str, latency: float):
+        health = self.providers[name]
+        alpha = CONFIG['provider_router']['latency_alpha']
+        health.latency = (1 - alpha) * health.latency + alpha * latency
+        health.latencies.append(latency)
+        health.breaker.record(True)
+
+    def record_failure(self, name: str, latency: float, timeout: bool = False):
+        health = self.providers[name]
+        health.failures += 1
+        if timeout:
+            health.timeouts += 1
+            # A timeout still tells us how slow the provider is right now
+            alpha = CONFIG['provider_router']['latency_alpha']
+            health.latency = (1 - alpha) * health.latency + alpha * latency
+        was_open = health.breaker.state == CircuitBreaker.OPEN
+        health.breaker.record(False)
+        if health.breaker.state == CircuitBreaker.OPEN and not was_open:
+            logger.warning(f"Circuit breaker opened for translation service {name}")
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Per-provider health, for logging and metrics"""
+        return {
+            name: {
+                'state': health.breaker.state,
+                'latency': health.latency,
+                'tokens': health.bucket.tokens,
+                'requests': health.requests,
+                'failures': health.failures,
+                'timeouts': health.timeouts,
+                'p95_latency': health.p95_latency(),
+            }
+            for name, health in self.providers.items()
+        }
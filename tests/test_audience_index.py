@@ -0,0 +1,93 @@
+import asyncio
+from types import SimpleNamespace
+
+from utils.audience_index import AudienceIndex
+
+GUILD = SimpleNamespace(id=10)
+
+def member(member_id, bot=False):
+    return SimpleNamespace(id=member_id, bot=bot)
+
+def channel(channel_id, members, guild=GUILD):
+    return SimpleNamespace(id=channel_id, guild=guild, members=members)
+
+def make_index(languages):
+    lookups = []
+
+    async def get_user_language(user_id):
+        lookups.append(user_id)
+        await asyncio.sleep(0)
+        return languages[user_id]
+
+    index = AudienceIndex(get_user_language)
+    index.lookups = lookups
+    return index
+
+def test_channel_is_scanned_once_and_skips_bots():
+    index = make_index({1: 'fr', 2: 'fr', 3: 'de'})
+    general = channel(100, [member(1), member(2), member(3), member(4, bot=True)])
+
+    async def main():
+        # Concurrent messages share the first scan
+        return await asyncio.gather(index.ensure(general), index.ensure(general), index.ensure(general))
+
+    assert asyncio.run(main()) == [{'fr', 'de'}] * 3
+    assert index.language_counts(100) == {'fr': 2, 'de': 1}
+    assert index.lookups == [1, 2, 3]
+    assert index.channels_in_guild(10) == {100}
+
+def test_invalidated_channel_is_rescanned():
+    languages = {1: 'fr', 2: 'de'}
+    index = make_index(languages)
+    general = channel(100, [member(1), member(2)])
+
+    asyncio.run(index.ensure(general))
+    languages[2] = 'es'
+    index.invalidate(100)
+    assert not index.is_indexed(100)
+    assert index.channels_in_guild(10) == set()
+
+    assert asyncio.run(index.ensure(general)) == {'fr', 'es'}
+    assert index.lookups == [1, 2, 1, 2]
+
+def test_invalidating_a_guild_forgets_only_its_channels():
+    index = make_index({1: 'fr', 2: 'de'})
+    general = channel(100, [member(1)])
+    random = channel(101, [member(2)])
+    elsewhere = channel(200, [member(1)], guild=SimpleNamespace(id=20))
+
+    async def main():
+        for indexed in (general, random, elsewhere):
+            await index.ensure(indexed)
+
+    asyncio.run(main())
+    index.invalidate_guild(10)
+    assert not index.is_indexed(100)
+    assert not index.is_indexed(101)
+    assert index.is_indexed(200)
+    assert index.channels_in_guild(20) == {200}
+
+def test_member_changes_update_counts_in_place():
+    index = make_index({1: 'fr', 2: 'fr'})
+    asyncio.run(index.ensure(channel(100, [member(1), member(2)])))
+
+    index.add_member(100, 3, 'de')
+    index.add_member(100, 3, 'de')
+    assert index.language_counts(100) == {'fr': 2, 'de': 1}
+    assert index.has_member(100, 3)
+
+    index.update_language(1, 'es')
+    assert index.language_counts(100) == {'fr': 1, 'de': 1, 'es': 1}
+
+    index.remove_member(100, 2)
+    index.remove_member(100, 2)
+    assert index.languages(100) == {'de', 'es'}
+    assert not index.has_member(100, 2)
+
+def test_member_changes_ignore_channels_that_are_not_indexed():
+    index = make_index({})
+    index.add_member(100, 1, 'fr')
+    index.update_language(1, 'de')
+    index.remove_member(100, 1)
+    assert not index.is_indexed(100)
+    assert index.language_counts(100) == {}
@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import pytest
+
+import budget
+from budget import HARD, OK, SOFT, BudgetManager
+from config import CONFIG, TRANSLATION_SERVICES
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONFIG, 'budgets', dict(
+        CONFIG['budgets'],
+        guild_daily_chars=1000,
+        channel_daily_chars=100,
+        soft_limit=0.8
+    ))
+    monkeypatch.setitem(TRANSLATION_SERVICES, 'google', dict(TRANSLATION_SERVICES['google'], monthly_char_budget=1000))
+    return BudgetManager(str(tmp_path / 'budget_state.json'))
+
+
+def test_budgets_are_off_by_default():
+    assert CONFIG['budgets']['guild_daily_chars'] is None
+    assert CONFIG['budgets']['channel_daily_chars'] is None
+    assert all(settings.get('monthly_char_budget') is None for settings in TRANSLATION_SERVICES.values())
+
+
+def test_provider_levels(manager):
+    assert manager.provider_level('google') == OK
+    manager.charge_provider('google', 799)
+    assert manager.provider_level('google') == OK
+    manager.charge_provider('google', 1)
+    assert manager.provider_level('google') == SOFT
+    manager.charge_provider('google', 200)
+    assert manager.provider_level('google') == HARD
+    # Providers without a budget never run out
+    manager.charge_provider('libre', 10 ** 9)
+    assert manager.provider_level('libre') == OK
+
+
+def test_scope_level_is_the_stricter_of_guild_and_channel(manager):
+    manager.charge_scope(1, 10, 100)
+    assert manager.scope_level(1, None) == OK
+    assert manager.scope_level(1, 10) == HARD
+    assert manager.scope_level(1, 11) == OK
+    assert manager.scope_level(None, None) == OK
+
+
+def test_new_day_resets_daily_usage(manager, monkeypatch):
+    manager.charge_scope(1, 10, 100)
+    manager.data['day'] = '2000-01-01'
+    assert manager.scope_level(1, 10) == OK
+    assert manager.data['monthly']['channels']['10'] == 100
+
+
+def test_usage_survives_a_restart(manager):
+    manager.charge_provider('google', 900)
+    asyncio.run(manager.flush())
+    with open(manager.filename) as f:
+        assert json.load(f)['monthly']['providers']['google'] == 900
+    assert BudgetManager(manager.filename).provider_level('google') == SOFT
+
+
+def test_unreadable_state_starts_from_zero(tmp_path):
+    path = tmp_path / 'budget_state.json'
+    path.write_text('{not json')
+    assert BudgetManager(str(path)).provider_level('google') == OK
+
+
+def test_free_providers():
+    assert budget.BudgetManager.is_free('libre')
+    assert not budget.BudgetManager.is_free('deepl')
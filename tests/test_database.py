@@ -0,0 +1,149 @@
+import asyncio
+import json
+
+import pytest
+
+import database
+from config import CONFIG
+from database import Database, SQLiteDatabase
+
+def write_json(path, data):
+    path.write_text(json.dumps(data))
+    return str(path)
+
+def test_sqlite_database_migrates_the_json_database_once(tmp_path):
+    json_filename = write_json(tmp_path / 'user_preferences.json', {
+        'users': {'1': {'language': 'fr'}},
+        'guilds': {'10': {
+            'auto_translate': True,
+            'auto_translate_channels': ['100'],
+            'delivery_modes': {'100': 'combined'},
+        }},
+        'messages': {'1000': {'translations': {'fr': 'bonjour'}, 'created_at': 0}},
+    })
+    db = SQLiteDatabase(str(tmp_path / 'user_preferences.db'), json_filename)
+
+    async def read():
+        try:
+            return (
+                await db.get_user_language(1),
+                await db.get_guild_channels_auto_translate(10),
+                await db.get_channel_delivery_mode(10, 100),
+                await db._run(db._fetchall, "SELECT translation FROM message_translations", ()),
+            )
+        finally:
+            await db.close()
+
+    language, channels, mode, translations = asyncio.run(read())
+    assert language == 'fr'
+    assert channels == ['100']
+    assert mode == 'combined'
+    assert [tuple(row) for row in translations] == [('bonjour',)]
+    assert db.is_auto_translate_channel(10, 100)
+
+def test_json_changes_after_the_migration_are_not_imported_again(tmp_path):
+    json_path = tmp_path / 'user_preferences.json'
+    db_filename = str(tmp_path / 'user_preferences.db')
+    write_json(json_path, {'users': {'1': {'language': 'fr'}}})
+    asyncio.run(SQLiteDatabase(db_filename, str(json_path)).close())
+
+    write_json(json_path, {'users': {'1': {'language': 'de'}, '2': {'language': 'es'}}})
+    db = SQLiteDatabase(db_filename, str(json_path))
+
+    async def read():
+        try:
+            return await db.get_user_language(1), await db.get_user_language(2)
+        finally:
+            await db.close()
+
+    # User 2 gets the default language, not the one only in the newer JSON file
+    first, second = asyncio.run(read())
+    assert first == 'fr'
+    assert second == 'en'
+
+def saved(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+def test_json_writes_are_batched_until_the_flush_interval(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONFIG, 'database_flush_interval_ms', 50)
+    filename = str(tmp_path / 'user_preferences.json')
+    db = Database(filename)
+
+    async def main():
+        await db.set_user_language(1, 'fr')
+        await db.set_user_language(2, 'de')
+        # Nothing is written until the flusher wakes up
+        before = saved(filename)['users']
+        await asyncio.sleep(0.2)
+        after = saved(filename)['users']
+        await db.close()
+        return before, after
+
+    before, after = asyncio.run(main())
+    assert before == {}
+    assert after == {'1': {'language': 'fr'}, '2': {'language': 'de'}}
+
+def test_json_flushes_early_once_enough_changes_pile_up(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONFIG, 'database_flush_interval_ms', 60000)
+    monkeypatch.setitem(CONFIG, 'database_flush_max_changes', 3)
+    filename = str(tmp_path / 'user_preferences.json')
+    db = Database(filename)
+
+    async def main():
+        for user_id in range(3):
+            await db.set_user_language(user_id, 'fr')
+        await asyncio.sleep(0.05)
+        users = saved(filename)['users']
+        await db.close()
+        return users
+
+    assert len(asyncio.run(main())) == 3
+
+def test_json_close_writes_pending_changes(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONFIG, 'database_flush_interval_ms', 60000)
+    filename = str(tmp_path / 'user_preferences.json')
+    db = Database(filename)
+
+    async def main():
+        await db.set_user_language(1, 'fr')
+        await db.close()
+
+    asyncio.run(main())
+    assert saved(filename)['users'] == {'1': {'language': 'fr'}}
+    assert Database(filename).data['users'] == {'1': {'language': 'fr'}}
+
+@pytest.fixture(params=['json', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'json':
+        return Database(str(tmp_path / 'user_preferences.json'))
+    return SQLiteDatabase(str(tmp_path / 'user_preferences.db'), str(tmp_path / 'user_preferences.json'))
+
+def test_compaction_counts_messages_on_both_backends(backend, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(database.time, 'time', lambda: clock[0])
+
+    async def main():
+        # Three messages with two translations each, the first one an hour older than the rest
+        for message_id in (1, 2, 3):
+            for language in ('fr', 'de'):
+                await backend.add_message_translation(message_id, language, f"{language} {message_id}")
+            clock[0] += 3600 if message_id == 1 else 1
+        removed = await backend.compact_messages(max_age=60, max_entries=1)
+        kept = {message_id: await backend.get_message_translations(message_id) for message_id in (1, 2, 3)}
+        await backend.close()
+        return removed, kept
+
+    removed, kept = asyncio.run(main())
+    # One expired message and one over the cap, not four translation rows
+    assert removed == 2
+    assert kept == {1: {}, 2: {}, 3: {'fr': 'fr 3', 'de': 'de 3'}}
+
+def test_compaction_with_nothing_to_remove(backend):
+    async def main():
+        await backend.add_message_translation(1, 'fr', 'bonjour')
+        removed = await backend.compact_messages(max_age=60, max_entries=10)
+        await backend.close()
+        return removed
+
+    assert asyncio.run(main()) == 0
@@ -0,0 +1,59 @@
+from config import CONFIG
+from utils.language_detection import detect_language_local, normalize_text
+
+
+def test_no_letters_gives_no_guess():
+    assert detect_language_local("12345 https://example.com <@123>") == (None, 0.0)
+
+
+def test_scripts_identify_their_language():
+    assert detect_language_local("Привет, как дела?")[0] == 'ru'
+    assert detect_language_local("안녕하세요 반갑습니다")[0] == 'ko'
+    assert detect_language_local("これはテストです")[0] == 'ja'
+
+
+def test_traditional_and_simplified_chinese():
+    assert detect_language_local("我们今天去吃饭")[0] == 'zh-CN'
+    assert detect_language_local("這個問題我們說過了")[0] == 'zh-TW'
+
+
+def test_latin_languages_by_stopwords():
+    assert detect_language_local("the cat is on the table and it is happy")[0] == 'en'
+    assert detect_language_local("der Hund ist nicht mit dem Ball")[0] == 'de'
+    assert detect_language_local("el perro y la casa de mi madre")[0] == 'es'
+
+
+def test_french_elision_counts():
+    language, confidence = detect_language_local("c'est ce que je veux")
+    assert language == 'fr'
+    assert confidence > 0.5
+
+
+def test_code_and_urls_carry_no_signal():
+    assert detect_language_local("`the and is` https://the.and.is/you") == (None, 0.0)
+
+
+def test_normalize_text():
+    assert normalize_text("  Hello\n  WORLD  ") == "hello world"
+
+
+def test_short_obvious_messages_clear_the_threshold():
+    threshold = CONFIG['language_detection']['min_confidence']
+    for text, language in (
+        ("thank you", 'en'),
+        ("the cat is on the table", 'en'),
+        ("hello", 'en'),
+        ("Hello!", 'en'),
+        ("bonjour", 'fr'),
+        ("guten morgen", 'de'),
+        ("buenos días", 'es'),
+    ):
+        detected, confidence = detect_language_local(text)
+        assert detected == language, text
+        assert confidence >= threshold, text
+
+
+def test_words_shared_between_languages_stay_below_the_threshold():
+    threshold = CONFIG['language_detection']['min_confidence']
+    for text in ("no", "la", "ja", "de", "a", "je", "que"):
+        assert detect_language_local(text)[1] < threshold, text
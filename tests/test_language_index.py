@@ -0,0 +1,94 @@
+from language_index import KNOWN_LANGUAGES, LanguageIndex
+from translation_providers import DeepLProvider, GoogleProvider, LibreProvider
+
+
+def _index(provider, languages=None):
+    return LanguageIndex(
+        provider.name,
+        languages,
+        source_codes=provider.source_codes,
+        target_codes=provider.target_codes,
+        aliases=provider.language_aliases,
+        uppercase=provider.uppercase_codes
+    )
+
+
+def test_google_codes_are_unchanged():
+    index = _index(GoogleProvider)
+    assert index.target_code('zh-CN') == 'zh-CN'
+    assert index.source_code('fr') == 'fr'
+    assert index.source_code(None) is None
+    assert index.source_code('auto') is None
+
+
+def test_deepl_codes_before_refresh():
+    index = _index(DeepLProvider, ['en', 'de', 'pt', 'zh-CN', 'zh-TW'])
+    assert index.target_code('zh-CN') == 'ZH-HANS'
+    assert index.target_code('zh-TW') == 'ZH-HANT'
+    assert index.target_code('en') == 'EN-US'
+    assert index.target_code('pt') == 'PT-BR'
+    assert index.target_code('de') == 'DE'
+    assert index.source_code('zh-TW') == 'ZH'
+    assert index.source_code('en') == 'EN'
+
+
+def test_configured_languages_limit_support_before_refresh():
+    index = _index(DeepLProvider, ['en', 'de'])
+    assert index.supports('en', 'de')
+    assert index.supports(None, 'de')
+    assert not index.supports('en', 'hi')
+    assert not index.supports('hi', 'en')
+    # Codes the bot doesn't know are let through until the provider says otherwise
+    assert 'xx' not in KNOWN_LANGUAGES
+    assert index.supports('xx', 'en')
+
+
+def test_deepl_refresh():
+    index = _index(DeepLProvider, ['en', 'de'])
+    index.refresh(['EN', 'DE', 'FR', 'ZH'], ['EN-GB', 'EN-US', 'DE', 'FR', 'ZH-HANS', 'ZH-HANT'])
+    assert index.refreshed
+    assert index.supports('fr', 'zh-TW')
+    assert index.supports('zh-CN', 'en')
+    assert not index.supports('en', 'hi')
+    assert not index.supports('xx', 'en')
+    assert index.target_code('zh-TW') == 'ZH-HANT'
+
+
+def test_deepl_refresh_adopts_reported_codes():
+    index = _index(DeepLProvider)
+    # An older API that only knows one Chinese target
+    index.refresh(['EN', 'ZH'], ['EN-US', 'ZH'])
+    assert index.target_code('zh-CN') == 'ZH'
+    assert index.target_code('zh-TW') == 'ZH'
+    assert index.target_code('en') == 'EN-US'
+
+
+def test_libre_codes_and_pairs():
+    index = _index(LibreProvider)
+    assert index.target_code('zh-CN') == 'zh'
+    assert index.target_code('zh-TW') == 'zt'
+    index.refresh(
+        ['en', 'zh', 'de'],
+        ['en', 'zh', 'de'],
+        {'en': ['zh', 'de'], 'zh': ['en'], 'de': ['en']}
+    )
+    assert index.supports('en', 'zh-CN')
+    assert index.supports('zh-CN', 'en')
+    assert not index.supports('zh-CN', 'de')
+    assert not index.supports('en', 'zh-TW')
+
+
+def test_libre_script_aliases_replace_the_old_codes():
+    index = _index(LibreProvider)
+    index.refresh(['en', 'zh-Hans', 'zh-Hant'], ['en', 'zh-Hans', 'zh-Hant'])
+    assert index.supports('en', 'zh-TW')
+    assert index.target_code('zh-CN') == 'zh-Hans'
+    assert index.target_code('zh-TW') == 'zh-Hant'
+    assert index.source_code('zh-CN') == 'zh-Hans'
+
+
+def test_empty_refresh_keeps_the_index():
+    index = _index(DeepLProvider, ['en', 'de'])
+    index.refresh([], [])
+    assert not index.refreshed
+    assert index.supports('en', 'de')
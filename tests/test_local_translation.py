@@ -0,0 +1,18 @@
+from local_translation import PhraseTableEngine
+
+
+def test_phrases_translate_with_a_source_language():
+    engine = PhraseTableEngine()
+    assert engine.translate_one('Hola!', 'en', 'es') == 'Hello!'
+    assert engine.translate_one('hi', 'de', 'en') == 'hallo'
+
+
+def test_nothing_is_guessed_without_a_source_language():
+    engine = PhraseTableEngine()
+    assert engine.translate_one('hi', 'de') is None
+    assert engine.translate_one('ya', 'en') is None
+
+
+def test_unknown_text_goes_to_the_providers():
+    engine = PhraseTableEngine()
+    assert engine.translate(['hello', 'what a lovely day'], ['fr', 'fr'], 'en') == ['bonjour', None]
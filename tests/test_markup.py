@@ -0,0 +1,53 @@
+from utils.markup import mask_markup
+
+
+def test_plain_text_is_untouched():
+    masked = mask_markup("Hello there, how are you?")
+    assert masked.text == "Hello there, how are you?"
+    assert masked.spans == []
+    assert masked.restore("Bonjour, comment ça va ?") == "Bonjour, comment ça va ?"
+
+
+def test_round_trip_keeps_protected_spans():
+    text = "Ping <@123456> about `npm install` and see https://example.com/docs?id=1 <:wave:987654>"
+    masked = mask_markup(text)
+    for span in ("<@123456>", "`npm install`", "https://example.com/docs?id=1"):
+        assert span not in masked.text
+    # A translation that leaves the placeholders as they are restores every span
+    assert masked.restore(masked.text) == text
+
+
+def test_leading_and_trailing_spans_are_not_sent():
+    masked = mask_markup("<@123>  good morning everyone  <:sun:42>")
+    assert masked.text == "good morning everyone"
+    assert masked.restore("bonjour à tous") == "<@123>  bonjour à tous  <:sun:42>"
+
+
+def test_reordered_placeholders_follow_their_index():
+    masked = mask_markup("Tell <@1> to ask <@2> today")
+    assert masked.spans == ["<@1>", "<@2>"]
+    # Word order changed in translation, and the provider padded the brackets
+    assert masked.restore("Demande à ⟦ 1 ⟧ de dire à ⟦0⟧ aujourd'hui") == "Demande à <@2> de dire à <@1> aujourd'hui"
+
+
+def test_dropped_placeholders_are_appended():
+    masked = mask_markup("Use `git pull` then read https://example.com first")
+    assert masked.restore("D'abord lisez") == "D'abord lisez `git pull` https://example.com"
+
+
+def test_unknown_placeholder_index_is_left_alone():
+    masked = mask_markup("Hi <@1> there")
+    assert masked.restore("Salut ⟦0⟧ ⟦7⟧") == "Salut <@1> ⟦7⟧"
+
+
+def test_code_block_is_one_span():
+    text = "Run this:\n```py\nprint('hi')\n```\nthen tell me"
+    masked = mask_markup(text)
+    assert masked.spans == ["```py\nprint('hi')\n```"]
+    assert masked.restore(masked.text) == text
+
+
+def test_only_markup_is_not_translatable():
+    masked = mask_markup("<@123> https://example.com <:wave:1>")
+    assert not masked.translatable
+    assert mask_markup("hello <@123>").translatable
@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from outbound import BACKGROUND, INTERACTIVE, OutboundQueueFull, OutboundScheduler
+
+def http_error(status: int, retry_after: float = None) -> discord.HTTPException:
+    error = discord.HTTPException(SimpleNamespace(status=status, reason='error'), 'error')
+    if retry_after is not None:
+        error.retry_after = retry_after
+    return error
+
+def run(scheduler: OutboundScheduler, coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await scheduler.close()
+    return asyncio.run(main())
+
+def test_rate_limited_job_is_requeued_and_retried():
+    scheduler = OutboundScheduler()
+    attempts = []
+
+    async def job():
+        attempts.append(asyncio.get_running_loop().time())
+        if len(attempts) == 1:
+            raise http_error(429, retry_after=0.05)
+        return 'sent'
+
+    assert run(scheduler, scheduler.submit('channel:1', job)) == 'sent'
+    assert len(attempts) == 2
+    # The route waited out the retry_after before trying again
+    assert attempts[1] - attempts[0] >= 0.04
+    assert scheduler.stats['rate_limited'] == 1
+    assert scheduler.stats['completed'] == 1
+    assert scheduler.stats['failed'] == 0
+
+def test_other_http_errors_fail_the_job():
+    scheduler = OutboundScheduler()
+
+    async def job():
+        raise http_error(403)
+
+    with pytest.raises(discord.HTTPException):
+        run(scheduler, scheduler.submit('channel:1', job))
+    assert scheduler.stats['failed'] == 1
+    assert scheduler.stats['rate_limited'] == 0
+
+def test_interactive_jobs_run_before_queued_background_jobs():
+    scheduler = OutboundScheduler()
+    order = []
+
+    def job(name):
+        async def run_job():
+            order.append(name)
+        return run_job
+
+    async def main():
+        futures = [
+            scheduler.submit_nowait('channel:1', job('background 1'), BACKGROUND),
+            scheduler.submit_nowait('channel:1', job('background 2'), BACKGROUND),
+            scheduler.submit_nowait('channel:1', job('interactive'), INTERACTIVE),
+        ]
+        await asyncio.gather(*futures)
+
+    run(scheduler, main())
+    assert order == ['interactive', 'background 1', 'background 2']
+
+def test_full_route_rejects_background_work_only():
+    scheduler = OutboundScheduler()
+    scheduler.max_queue_depth = 1
+
+    async def job():
+        return None
+
+    async def main():
+        scheduler.submit_nowait('channel:1', job)
+        with pytest.raises(OutboundQueueFull):
+            scheduler.submit_nowait('channel:1', job)
+        assert scheduler.post('channel:1', job) is None
+        await scheduler.submit('channel:1', job, INTERACTIVE)
+
+    run(scheduler, main())
+    assert scheduler.stats['rejected'] == 2
+
+def test_close_cancels_queued_jobs():
+    scheduler = OutboundScheduler()
+
+    async def main():
+        running = asyncio.Event()
+
+        async def slow():
+            running.set()
+            await asyncio.sleep(10)
+
+        first = scheduler.submit_nowait('channel:1', slow)
+        queued = scheduler.submit_nowait('channel:1', slow)
+        await running.wait()
+        await scheduler.close()
+        await asyncio.sleep(0)
+        return first, queued
+
+    first, queued = asyncio.run(main())
+    assert queued.cancelled()
+    assert not first.done() or first.cancelled()
@@ -0,0 +1,98 @@
+import pytest
+
+import provider_router
+from provider_router import CircuitBreaker, TokenBucket
+
+
+class Clock:
+    """Stands in for time.monotonic so tests control how much time passes"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(provider_router.time, 'monotonic', clock)
+    return clock
+
+
+def test_token_bucket_burst_then_refill(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    assert bucket.time_until_available() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.try_acquire()
+    # Refills never go past capacity
+    clock.now += 60
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_token_bucket_without_refill_never_frees_up(clock):
+    bucket = TokenBucket(rate=0, capacity=1)
+    assert bucket.try_acquire()
+    assert bucket.time_until_available() == float('inf')
+
+
+def _breaker():
+    return CircuitBreaker(failure_rate=0.5, min_requests=4, window=30, cooldown=10)
+
+
+def test_breaker_waits_for_enough_requests(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record(False)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allows_request()
+
+
+def test_breaker_stays_closed_below_failure_rate(clock):
+    breaker = _breaker()
+    for succeeded in (True, True, True, False, True, False):
+        breaker.record(succeeded)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_forgets_results_outside_the_window(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record(False)
+    clock.now += 31
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_half_open_trial_success_closes(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(False)
+    clock.now += 10
+    assert breaker.allows_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.on_request()
+    # Only one trial at a time
+    assert not breaker.allows_request()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allows_request()
+
+
+def test_breaker_half_open_trial_failure_reopens(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(False)
+    clock.now += 10
+    assert breaker.allows_request()
+    breaker.on_request()
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 5
+    assert not breaker.allows_request()
+    clock.now += 5
+    assert breaker.allows_request()
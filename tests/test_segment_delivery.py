@@ -0,0 +1,78 @@
+import asyncio
+
+from cogs.auto_translate import AutoTranslate
+from config import CONFIG
+from outbound import OutboundScheduler
+
+
+class FakeBot:
+    def __init__(self):
+        self.outbound = OutboundScheduler()
+
+
+class FakeMessage:
+    id = 1
+
+
+def test_segments_post_in_order_without_holding_route_workers(monkeypatch):
+    monkeypatch.setitem(CONFIG, 'outbound', dict(CONFIG['outbound'], route_concurrency={'webhook': 2}))
+
+    async def scenario():
+        bot = FakeBot()
+        cog = AutoTranslate(bot)
+        posted = []
+
+        async def post_translation(message, text, source_lang, target_lang, jump_link=True, sent=None):
+            # Earlier segments are slower, so a second worker would overtake them if it could
+            await asyncio.sleep(0.03 if text == 'one' else 0.001)
+            posted.append(text)
+        cog._post_translation = post_translation
+
+        deliver = cog._make_delivery(FakeMessage(), 'webhook:1', 'en', 'fr')
+        for index, text in enumerate(['one', 'two', 'three']):
+            deliver(index, text)
+        # Only the segment being posted is queued; the rest wait outside the scheduler
+        assert bot.outbound.stats['submitted'] == 1
+
+        # The other worker is free for the channel's other posts meanwhile
+        other = bot.outbound.submit_nowait('webhook:1', lambda: asyncio.sleep(0, result='other'))
+        assert await asyncio.wait_for(other, 0.02) == 'other'
+
+        while len(posted) < 3:
+            await asyncio.sleep(0.005)
+        await bot.outbound.close()
+        return posted
+
+    assert asyncio.run(scenario()) == ['one', 'two', 'three']
+
+
+def test_a_rejected_segment_stops_the_rest(monkeypatch):
+    async def scenario():
+        bot = FakeBot()
+        cog = AutoTranslate(bot)
+        posted = []
+
+        async def post_translation(message, text, *args, **kwargs):
+            posted.append(text)
+        cog._post_translation = post_translation
+        submitted = []
+
+        def post(route, job, priority=None):
+            submitted.append(job)
+            # The queue is full for the second segment only
+            if len(submitted) == 2:
+                return None
+            future = asyncio.get_running_loop().create_future()
+            asyncio.ensure_future(job()).add_done_callback(lambda _: future.set_result(None))
+            return future
+        bot.outbound.post = post
+
+        deliver = cog._make_delivery(FakeMessage(), 'webhook:1', 'en', 'fr')
+        deliver(0, 'one')
+        await asyncio.sleep(0.01)
+        deliver(1, 'two')
+        deliver(2, 'three')
+        await asyncio.sleep(0.01)
+        return posted, len(submitted)
+
+    assert asyncio.run(scenario()) == (['one'], 2)
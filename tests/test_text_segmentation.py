@@ -0,0 +1,52 @@
+from utils.text_segmentation import join_segments, split_segments
+
+
+def _round_trip(text, max_length):
+    segments = split_segments(text, max_length)
+    assert join_segments([segment for segment, _ in segments], [separator for _, separator in segments]) == text
+    return segments
+
+
+def test_short_text_is_one_segment():
+    assert split_segments("hello", 10) == [("hello", "")]
+
+
+def test_text_exactly_at_the_limit_is_not_split():
+    text = "a" * 50
+    assert split_segments(text, 50) == [(text, "")]
+
+
+def test_segments_respect_the_limit_and_round_trip():
+    text = "\n\n".join(
+        " ".join(f"Sentence {paragraph}.{sentence} has a few words in it." for sentence in range(6))
+        for paragraph in range(5)
+    )
+    for max_length in (40, 100, 250, 1000):
+        segments = _round_trip(text, max_length)
+        assert all(len(segment) <= max_length for segment, _ in segments)
+
+
+def test_paragraph_boundaries_are_preferred():
+    first = "First paragraph. It has two sentences."
+    second = "Second paragraph. Also two sentences."
+    segments = _round_trip(f"{first}\n\n{second}", len(first) + 5)
+    assert segments == [(first, "\n\n"), (second, "")]
+
+
+def test_sentences_are_used_before_words():
+    text = "One short sentence. Another short sentence. A third one."
+    segments = _round_trip(text, 25)
+    assert [segment for segment, _ in segments] == ["One short sentence.", "Another short sentence.", "A third one."]
+
+
+def test_unbroken_text_is_cut_at_the_limit():
+    text = "x" * 25
+    segments = _round_trip(text, 10)
+    assert [segment for segment, _ in segments] == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_fenced_code_blocks_are_not_split_inside():
+    code = "```\nline one\n\nline two\n```"
+    text = f"Intro text here.\n\n{code}\n\nOutro text here."
+    segments = _round_trip(text, len(code) + 2)
+    assert code in [segment for segment, _ in segments]
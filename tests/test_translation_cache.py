@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+import translation_cache
+from translation_cache import TranslationCache
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'cache.db')
+
+
+def test_keys_separate_source_target_and_provider():
+    keys = {
+        TranslationCache.make_key("hello", 'en', 'fr', 'google'),
+        TranslationCache.make_key("hello", None, 'fr', 'google'),
+        TranslationCache.make_key("hello", 'en', 'de', 'google'),
+        TranslationCache.make_key("hello", 'en', 'fr', 'deepl'),
+    }
+    assert len(keys) == 4
+    assert TranslationCache.make_key("hello", None, 'fr', 'google') == TranslationCache.make_key("hello", 'auto', 'fr', 'google')
+
+
+def test_memory_tier_evicts_least_recently_used(path):
+    async def scenario():
+        cache = TranslationCache(path, memory_entries=2)
+        await cache.set_many({'a': 'A', 'b': 'B'})
+        await cache.get('a')
+        await cache.set_many({'c': 'C'})
+        memory = list(cache.memory)
+        await cache.close()
+        return memory, cache.stats['evictions']
+
+    assert asyncio.run(scenario()) == (['a', 'c'], 1)
+
+
+def test_disk_tier_outlives_the_process(path):
+    async def write():
+        cache = TranslationCache(path)
+        await cache.set_many({'a': 'A'})
+        await cache.close()
+
+    async def read():
+        cache = TranslationCache(path)
+        found = await cache.get_many(['a', 'missing'])
+        await cache.close()
+        return found, cache.stats
+
+    asyncio.run(write())
+    found, stats = asyncio.run(read())
+    assert found == {'a': 'A'}
+    assert stats['disk_hits'] == 1
+    assert stats['misses'] == 1
+
+
+def test_entries_expire_after_the_ttl(path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(translation_cache.time, 'time', lambda: now[0])
+
+    async def scenario():
+        cache = TranslationCache(path, ttl=60)
+        await cache.set_many({'a': 'A'})
+        assert await cache.get('a') == 'A'
+        now[0] += 61
+        # Expired in memory and on disk
+        result = await cache.get('a')
+        await cache.close()
+        return result
+
+    assert asyncio.run(scenario()) is None
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import pytest
+
+from outbound import BACKGROUND, INTERACTIVE
+from translation_scheduler import DeadlineExceeded, TranslationScheduler
+
+
+def _scheduler(max_in_flight):
+    scheduler = TranslationScheduler()
+    scheduler.max_in_flight = max_in_flight
+    return scheduler
+
+
+def test_interactive_jobs_go_first_and_guilds_take_turns():
+    async def scenario():
+        scheduler = _scheduler(1)
+        order = []
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        def job(name):
+            async def run():
+                order.append(name)
+            return run
+
+        first = asyncio.ensure_future(scheduler.submit(blocker, BACKGROUND, guild_id=0))
+        await asyncio.sleep(0)
+        waiting = [
+            scheduler.submit(job('a1'), BACKGROUND, guild_id=1),
+            scheduler.submit(job('a2'), BACKGROUND, guild_id=1),
+            scheduler.submit(job('a3'), BACKGROUND, guild_id=1),
+            scheduler.submit(job('b1'), BACKGROUND, guild_id=2),
+            scheduler.submit(job('i1'), INTERACTIVE, guild_id=1),
+        ]
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in waiting]
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth() == 5
+        gate.set()
+        await asyncio.gather(first, *tasks)
+        return order, scheduler
+
+    order, scheduler = asyncio.run(scenario())
+    assert order == ['i1', 'a1', 'b1', 'a2', 'a3']
+    assert scheduler.in_flight == 0
+    assert scheduler.stats['completed'] == 6
+
+
+def test_queued_job_expires_and_frees_nothing():
+    async def scenario():
+        scheduler = _scheduler(1)
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        async def never_runs():
+            raise AssertionError("expired job ran")
+
+        first = asyncio.ensure_future(scheduler.submit(blocker))
+        await asyncio.sleep(0)
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.submit(never_runs, deadline=time.monotonic() + 0.01)
+        assert scheduler.queue_depth() == 0
+        gate.set()
+        await first
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.in_flight == 0
+    assert scheduler.stats['expired'] == 1
+
+
+def test_running_job_past_its_deadline_is_cancelled():
+    async def scenario():
+        scheduler = _scheduler(2)
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.submit(lambda: asyncio.sleep(1), deadline=time.monotonic() + 0.01)
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.in_flight == 0
+
+
+def test_failing_job_releases_its_slot():
+    async def scenario():
+        scheduler = _scheduler(1)
+
+        async def broken():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            await scheduler.submit(broken)
+        assert await scheduler.submit(lambda: asyncio.sleep(0, result='ok')) == 'ok'
+        return scheduler
+
+    assert asyncio.run(scenario()).in_flight == 0
@@ -0,0 +1,210 @@
+import asyncio
+
+import pytest
+
+from config import CONFIG, TRANSLATION_SERVICES
+from translation import TranslationService
+from translation_providers import TranslationError
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """A TranslationService whose providers answer from memory instead of the network"""
+    monkeypatch.setitem(CONFIG, 'translation_cache', dict(CONFIG['translation_cache'], path=str(tmp_path / 'cache.db')))
+    monkeypatch.setitem(CONFIG, 'provider_router', dict(CONFIG['provider_router'], hedging=False))
+    for name in TRANSLATION_SERVICES:
+        monkeypatch.setitem(TRANSLATION_SERVICES, name, dict(TRANSLATION_SERVICES[name], api_key='key', enabled=True))
+    # One request at a time to libre, so concurrent calls contend for its semaphore
+    TRANSLATION_SERVICES['libre']['max_concurrency'] = 1
+    service = TranslationService()
+    service.calls = []
+
+    for name, provider in service.providers.items():
+        async def translate(texts, target_lang, source_lang=None, name=name):
+            service.calls.append((name, list(texts), target_lang))
+            await asyncio.sleep(0.01)
+            return [f"[{target_lang}] {text}" for text in texts]
+        provider.translate = translate
+    return service
+
+
+def test_concurrency_cap_survives_a_restart_on_a_new_loop(service):
+    async def contend():
+        # Two requests at once, so the second has to wait on the semaphore
+        return await asyncio.gather(
+            service._call_provider('libre', ['one'], 'fr', 'en'),
+            service._call_provider('libre', ['two'], 'fr', 'en'),
+        )
+
+    # The dashboard's stop/start runs the bot on a fresh event loop each time
+    assert asyncio.run(contend()) == [['[fr] one'], ['[fr] two']]
+    assert asyncio.run(contend()) == [['[fr] one'], ['[fr] two']]
+
+
+def test_unexpected_errors_release_the_router_token(service):
+    async def broken(texts, target_lang, source_lang=None):
+        raise RuntimeError("boom")
+    service.providers['libre'].translate = broken
+    breaker = service.router.providers['libre'].breaker
+    breaker.state = breaker.HALF_OPEN
+    breaker.on_request()
+
+    async def call():
+        await service._call_provider('libre', ['hello'], 'fr', 'en')
+
+    with pytest.raises(Exception):
+        asyncio.run(call())
+    # The half-open trial isn't stuck in flight
+    assert not breaker.trial_in_flight
+
+
+def _only(*names):
+    """Leave only the named providers enabled"""
+    for name in TRANSLATION_SERVICES:
+        TRANSLATION_SERVICES[name]['enabled'] = name in names
+
+
+def test_oversized_groups_are_one_routed_request_per_batch(service):
+    _only('libre')
+    service.providers['libre'].capabilities.max_batch_size = 2
+    texts = [f"text {i}" for i in range(5)]
+
+    results = asyncio.run(service._translate_upstream(texts, ['fr'] * 5, 'en'))
+
+    assert results == [f"[fr] text {i}" for i in range(5)]
+    assert sorted(len(batch) for _, batch, _ in service.calls) == [1, 2, 2]
+    # Every upstream request took its own token and was counted by the router
+    assert service.router.providers['libre'].requests == 3
+
+
+def test_a_failed_batch_falls_back_alone(service):
+    _only('libre', 'google')
+    service.providers['libre'].capabilities.max_batch_size = 2
+    service.providers['google'].capabilities.max_batch_size = 2
+    # Libre is tried first, and fails only the batch holding 'bad'
+    service.router.providers['google'].bucket.tokens = 0
+
+    async def libre(texts, target_lang, source_lang=None):
+        service.calls.append(('libre', list(texts), target_lang))
+        if 'bad' in texts:
+            service.router.providers['google'].bucket.tokens = 1
+            raise TranslationError("libre failed")
+        return [f"[{target_lang}] {text}" for text in texts]
+    service.providers['libre'].translate = libre
+
+    results = asyncio.run(service._translate_upstream(['one', 'two', 'bad', 'four'], ['fr'] * 4, 'en'))
+
+    assert results == ['[fr] one', '[fr] two', '[fr] bad', '[fr] four']
+    # Only the failed batch went to the fallback provider
+    assert [batch for name, batch, _ in service.calls if name == 'google'] == [['bad', 'four']]
+
+
+def test_concurrent_requests_are_coalesced_into_one_call(service, monkeypatch):
+    _only('libre')
+    monkeypatch.setitem(CONFIG, 'coalesce_window_ms', 20)
+
+    async def burst():
+        return await asyncio.gather(
+            service.translate("good morning", 'fr', 'en'),
+            service.translate("see you later", 'fr', 'en'),
+            service.translate("good morning", 'fr', 'en'),
+        )
+
+    assert asyncio.run(burst()) == ["[fr] good morning", "[fr] see you later", "[fr] good morning"]
+    # One upstream request, with the duplicate sent once
+    assert service.calls == [('libre', ["good morning", "see you later"], 'fr')]
+
+
+def test_uncoalesced_requests_go_out_separately(service, monkeypatch):
+    _only('libre')
+    monkeypatch.setitem(CONFIG, 'coalesce_window_ms', 20)
+
+    async def burst():
+        return await asyncio.gather(
+            service.translate("good morning", 'fr', 'en', coalesce=False),
+            service.translate("see you later", 'fr', 'en', coalesce=False),
+        )
+
+    asyncio.run(burst())
+    assert len(service.calls) == 2
+
+
+def test_full_batches_flush_before_the_window(service, monkeypatch):
+    _only('libre')
+    monkeypatch.setitem(CONFIG, 'coalesce_window_ms', 10_000)
+    monkeypatch.setitem(CONFIG, 'coalesce_max_batch', 2)
+
+    async def burst():
+        return await asyncio.wait_for(asyncio.gather(
+            service.translate("good morning", 'fr', 'en'),
+            service.translate("see you later", 'fr', 'en'),
+        ), 1)
+
+    assert asyncio.run(burst()) == ["[fr] good morning", "[fr] see you later"]
+
+
+def test_cached_translations_skip_the_providers(service):
+    _only('libre')
+
+    async def twice():
+        first = await service.translate("good morning", 'fr', 'en', coalesce=False)
+        second = await service.translate("good morning", 'fr', 'en', coalesce=False)
+        return first, second
+
+    assert asyncio.run(twice()) == ("[fr] good morning", "[fr] good morning")
+    assert len(service.calls) == 1
+
+
+def test_slow_primary_is_hedged_and_the_backup_wins(service):
+    _only('libre', 'google')
+    service.router.hedge_delay = lambda name: 0.01
+
+    async def slow(texts, target_lang, source_lang=None):
+        await asyncio.sleep(1)
+        return ["too late"] * len(texts)
+    service.providers['libre'].translate = slow
+
+    async def hedged():
+        return await service._translate_hedged('libre', ["hello"], 'fr', 'en', ['libre'])
+
+    winner, translated = asyncio.run(hedged())
+    assert (winner, translated) == ('google', ["[fr] hello"])
+    assert service.router.hedge_stats['won'] == 1
+    # The losing request was cancelled rather than judged
+    assert service.router.providers['libre'].failures == 0
+
+
+def test_no_hedge_when_the_budget_is_spent(service):
+    _only('libre', 'google')
+    service.router.hedge_delay = lambda name: 0.001
+    service.router.hedge_tokens = 0
+
+    async def hedged():
+        return await service._translate_hedged('libre', ["hello"], 'fr', 'en', ['libre'])
+
+    assert asyncio.run(hedged()) == ('libre', ["[fr] hello"])
+    assert service.router.hedge_stats['skipped'] == 1
+
+
+def test_failed_provider_falls_back_to_another(service):
+    _only('libre', 'google')
+    service.router.providers['google'].bucket.tokens = 0
+
+    async def broken(texts, target_lang, source_lang=None):
+        service.router.providers['google'].bucket.tokens = 1
+        raise TranslationError("libre is down")
+    service.providers['libre'].translate = broken
+
+    results = asyncio.run(service._translate_upstream(["hello"], ['fr'], 'en'))
+    assert results == ["[fr] hello"]
+    assert service.router.providers['libre'].failures == 1
+
+
+def test_every_provider_failing_returns_the_fallback_text(service):
+    _only('libre')
+
+    async def broken(texts, target_lang, source_lang=None):
+        raise TranslationError("libre is down", "[fr]")
+    service.providers['libre'].translate = broken
+
+    assert asyncio.run(service._translate_upstream(["hello"], ['fr'], 'en')) == ["[fr] hello"]
@@ -1,12 +1,23 @@
 import os
 import aiohttp
-from aiohttp import ClientTimeout, ClientConnectionError
+from aiohttp import ClientTimeout
 import asyncio
+import hashlib
 import logging
+import ssl
 import time
-from typing import Dict, Optional, Tuple, List
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, List, Union
 
-from config import TRANSLATION_SERVICES, DEFAULT_TRANSLATION_SERVICE, LANGUAGES, CONFIG
+from config import TRANSLATION_SERVICES, LANGUAGES, CONFIG
+from budget import HARD, OK, budget_manager
+from local_translation import LocalTranslator
+from metrics import PROVIDER_CHARACTERS_TOTAL, PROVIDER_REQUESTS_TOTAL, PROVIDER_SECONDS, REGISTRY, CallbackMetric
+from provider_router import ProviderRouter
+from translation_cache import TranslationCache
+from translation_providers import TranslationError, TranslationProvider, create_providers
+from utils.language_detection import detect_language_local, normalize_text
+from utils.markup import mask_markup
 
 logger = logging.getLogger('discord')
 
@@ -14,243 +25,543 @@ class TranslationService:
     """Translation service that handles API requests to translation services"""
     
     def __init__(self):
-        self.service = DEFAULT_TRANSLATION_SERVICE
-        self.session = None
-        self.rate_limits = {
-            'google': {
-                'calls': 0,
-                'reset_time': time.time() + 60,
-                'limit': 500  # Google Translate API limit per minute
-            },
-            'libre': {
-                'calls': 0,
-                'reset_time': time.time() + 60,
-                'limit': 100  # LibreTranslate estimated limit
-            },
-            'deepl': {
-                'calls': 0,
-                'reset_time': time.time() + 60,
-                'limit': 50
+        # One session per provider so each gets its own connection pool and limits
+        self.sessions: Dict[str, aiohttp.ClientSession] = {}
+        # Shared so the CA store is loaded once for every provider connection
+        self._ssl_context = ssl.create_default_context()
+        # Picks a provider per request from token buckets, circuit breakers and observed latency
+        self.router = ProviderRouter()
+        # Provider implementations by TRANSLATION_SERVICES name, from the provider registry
+        self.providers: Dict[str, TranslationProvider] = create_providers(self.get_session)
+        # Cap concurrent in-flight requests per provider; bound to one event loop, so built by _semaphore()
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Requests held for coalescing, keyed by (service, source, target, economy)
+        self._pending: Dict[Tuple[str, Optional[str], str, bool], List[Tuple[str, asyncio.Future]]] = {}
+        self._flush_handles: Dict[Tuple[str, Optional[str], str, bool], asyncio.TimerHandle] = {}
+        self._flush_tasks = set()
+        self.cache = TranslationCache()
+        # Phrase-table (or custom) engine in worker processes, tried first for short texts
+        self.local = LocalTranslator()
+        # Detected languages by normalized text hash, least recently used first
+        self.detections: 'OrderedDict[str, str]' = OrderedDict()
+    
+    @property
+    def service(self) -> str:
+        """The provider new requests are most likely to be routed to"""
+        return self.router.preferred()
+    
+    def _cache_keys(self, text: str, source_lang: Optional[str], target_lang: str) -> List[str]:
+        """Cache keys for text from every usable provider that handles the language pair, the preferred one first"""
+        services = [self.service]
+        services.extend(
+            service for service in self.providers
+            if service not in services and self.router.is_configured(service)
+        )
+        return [
+            self.cache.make_key(text, source_lang, target_lang, service) for service in services
+            if service in self.providers and self.providers[service].supports(source_lang, target_lang)
+        ]
+    
+    def _unsupported(self, source_lang: Optional[str], target_lang: str) -> List[str]:
+        """Providers that can't translate between the two languages, so requests skip them without a round trip"""
+        return [
+            name for name in TRANSLATION_SERVICES
+            if name not in self.providers or not self.providers[name].supports(source_lang, target_lang)
+        ]
+    
+    def _semaphore(self, service: str) -> asyncio.Semaphore:
+        """The provider's concurrency cap for the running loop, rebuilt after the bot is restarted on a new one"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore_loop = loop
+            self.semaphores = {
+                name: asyncio.Semaphore(settings.get('max_concurrency', 4))
+                for name, settings in TRANSLATION_SERVICES.items()
             }
-        }
+        return self.semaphores[service]
     
-    async def get_session(self) -> aiohttp.ClientSession:
-        """Get aiohttp session, creating it if it doesn't exist"""
-        if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
-        return self.session
+    async def get_session(self, service: str) -> aiohttp.ClientSession:
+        """Get the provider's aiohttp session, creating it if it doesn't exist"""
+        session = self.sessions.get(service)
+        if session is None or session.closed:
+            settings = TRANSLATION_SERVICES[service]
+            http = CONFIG['http']
+            connector = aiohttp.TCPConnector(
+                limit=settings.get('max_connections', 4),
+                limit_per_host=settings.get('max_connections', 4),
+                keepalive_timeout=http['keepalive_timeout'],
+                ttl_dns_cache=http['dns_cache_ttl'],
+                ssl=self._ssl_context
+            )
+            timeout = ClientTimeout(
+                total=settings.get('timeout', 5),
+                connect=http['connect_timeout']
+            )
+            session = self.sessions[service] = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return session
     
+    async def warm_up(self):
+        """Open a pooled connection to every usable provider so early translations skip DNS and TLS setup"""
+        async def warm(service: str):
+            try:
+                session = await self.get_session(service)
+                async with session.head(self.providers[service].endpoint) as response:
+                    await response.read()
+                logger.info(f"Warmed up connection to translation service {service}")
+            except Exception as e:
+                logger.warning(f"Could not warm up connection to translation service {service}: {e}")
+        
+        await asyncio.gather(
+            self.local.warm_up(),
+            *(warm(service) for service in self.providers if self.router.is_configured(service))
+        )
+
+    async def refresh_languages(self):
+        """Update every usable provider's language index from its languages endpoint, keeping the old one on failure"""
+        async def refresh(service: str):
+            try:
+                await self.providers[service].refresh_languages()
+                logger.info(f"Refreshed languages for translation service {service}")
+            except Exception as e:
+                logger.warning(f"Could not refresh languages for translation service {service}: {e}")
+
+        await asyncio.gather(
+            *(refresh(service) for service in self.providers if self.router.is_configured(service))
+        )
+
     async def close(self):
-        """Close aiohttp session"""
-        if self.session and not self.session.closed:
-            await self.session.close()
+        """Close the aiohttp sessions and the translation cache, and drop requests still held for coalescing"""
+        # Held requests and their timers belong to this loop; a restarted bot runs on a new one
+        for handle in self._flush_handles.values():
+            handle.cancel()
+        self._flush_handles.clear()
+        for pending in self._pending.values():
+            for _, future in pending:
+                future.cancel()
+        self._pending.clear()
+        for session in self.sessions.values():
+            if not session.closed:
+                await session.close()
+        self.sessions.clear()
+        self.local.close()
+        await self.cache.close()
     
-    async def translate(self, text: str, target_lang: str, source_lang: Optional[str] = None) -> str:
-        """Translate text to the target language"""
+    async def translate(
+        self,
+        text: str,
+        target_lang: str,
+        source_lang: Optional[str] = None,
+        coalesce: bool = True,
+        guild_id: Optional[int] = None,
+        channel_id: Optional[int] = None
+    ) -> str:
+        """Translate text to the target language.
+        
+        coalesce=False sends the text in a request of its own, for callers that
+        want concurrent texts translated in parallel rather than batched.
+        guild_id and channel_id attribute the characters sent upstream to their
+        budgets, and past those budgets translation degrades.
+        """
         if not text or not target_lang:
             return text
-            
-        # Update rate limits
-        current_time = time.time()
-        for service in self.rate_limits:
-            if current_time > self.rate_limits[service]['reset_time']:
-                self.rate_limits[service]['calls'] = 0
-                self.rate_limits[service]['reset_time'] = current_time + 60
         
-        # Check if we need to switch services due to rate limits
-        if self.rate_limits[self.service]['calls'] >= self.rate_limits[self.service]['limit']:
-            # Try to find another service that's not rate limited
-            for service in TRANSLATION_SERVICES:
-                if TRANSLATION_SERVICES[service]['enabled'] and self.rate_limits[service]['calls'] < self.rate_limits[service]['limit']:
-                    self.service = service
-                    break
-            else:
-                # All services are rate limited
-                logger.warning("All translation services are rate limited. Translation will be delayed.")
-                # Wait until the next reset
-                await asyncio.sleep(self.rate_limits[self.service]['reset_time'] - current_time)
-                self.rate_limits[self.service]['calls'] = 0
-                self.rate_limits[self.service]['reset_time'] = time.time() + 60
+        # Only the translatable part is sent; code, URLs, mentions and emoji are put back afterwards
+        masked = mask_markup(text)
+        if not masked.translatable:
+            return text
+        translated = await self._translate_text(masked.text, target_lang, source_lang, coalesce, guild_id, channel_id)
+        return masked.restore(translated)
+    
+    async def _translate_text(
+        self,
+        text: str,
+        target_lang: str,
+        source_lang: Optional[str],
+        coalesce: bool,
+        guild_id: Optional[int],
+        channel_id: Optional[int]
+    ) -> str:
+        """Translate already masked text through the cache and the coalescer"""
+        # Cache hits skip the network entirely
+        keys = self._cache_keys(text, source_lang, target_lang)
+        cached = await self.cache.get_many(keys)
+        for key in keys:
+            if key in cached:
+                return cached[key]
         
-        # Increment the call counter
-        self.rate_limits[self.service]['calls'] += 1
+        # Short texts, and longer ones once budgets are tight, try the free local engine first
+        level = budget_manager.scope_level(guild_id, channel_id)
+        if self.router.use_local(len(text), level != OK):
+            translated = (await self._translate_local([text], [target_lang], source_lang))[0]
+            if translated is not None:
+                return translated
         
-        # Call the appropriate translation method
-        if self.service == 'google':
-            return await self._translate_google(text, target_lang, source_lang)
-        elif self.service == 'libre':
-            return await self._translate_libre(text, target_lang, source_lang)
-        elif self.service == 'deepl':
-            return await self._translate_deepl(text, target_lang, source_lang)
-        else:
-            logger.error(f"Unknown translation service: {self.service}")
+        # Past a hard budget only cached and local translations are served; past a soft one only free providers are used
+        if level == HARD:
+            logger.warning(f"Translation budget exhausted for guild {guild_id} / channel {channel_id}; returning original text")
             return text
+        economy = level != OK
+        budget_manager.charge_scope(guild_id, channel_id, len(text))
+        
+        window_ms = CONFIG['coalesce_window_ms']
+        if window_ms <= 0 or not coalesce:
+            results = await self._translate_upstream([text], [target_lang], source_lang, economy)
+            return results[0]
+        
+        # Hold the request briefly so concurrent callers share one upstream call
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (self.service, source_lang, target_lang, economy)
+        pending = self._pending.setdefault(key, [])
+        pending.append((text, future))
+        if len(pending) >= CONFIG['coalesce_max_batch']:
+            self._flush_pending(key)
+        elif key not in self._flush_handles:
+            self._flush_handles[key] = loop.call_later(window_ms / 1000, self._flush_pending, key)
+        return await future
     
-    async def _translate_google(self, text: str, target_lang: str, source_lang: Optional[str] = None) -> str:
-        """Translate text using Google Translate API"""
+    def _flush_pending(self, key: Tuple[str, Optional[str], str, bool]):
+        """Send all requests held under key as one batch"""
+        handle = self._flush_handles.pop(key, None)
+        if handle:
+            handle.cancel()
+        pending = self._pending.pop(key, None)
+        if pending:
+            task = asyncio.ensure_future(self._run_coalesced(key, pending))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+    
+    async def _run_coalesced(self, key: Tuple[str, Optional[str], str, bool], pending: List[Tuple[str, asyncio.Future]]):
+        """Translate a coalesced batch and resolve each caller's future"""
+        _, source_lang, target_lang, economy = key
+        # Identical texts in the same window only need translating once
+        unique_texts = list(dict.fromkeys(text for text, _ in pending))
         try:
-            api_key = TRANSLATION_SERVICES['google']['api_key']
-            base_url = TRANSLATION_SERVICES['google']['base_url']
-            
-            if not api_key:
-                logger.error("Google Translate API key not set")
-                return text
-            
-            session = await self.get_session()
-            
-            params = {
-                'key': api_key,
-                'q': text,
-                'target': target_lang
-            }
-            
-            if source_lang:
-                params['source'] = source_lang
-            
-            async with session.post(base_url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if 'data' in data and 'translations' in data['data'] and len(data['data']['translations']) > 0:
-                        return data['data']['translations'][0]['translatedText']
-                    else:
-                        logger.error(f"Unexpected Google Translate API response: {data}")
-                        return text
-                else:
-                    logger.error(f"Google Translate API error: {response.status} - {await response.text()}")
-                    return text
+            translated = await self._translate_upstream(unique_texts, [target_lang] * len(unique_texts), source_lang, economy)
+            results = dict(zip(unique_texts, translated))
+            for text, future in pending:
+                if not future.done():
+                    future.set_result(results[text])
         except Exception as e:
-            logger.error(f"Error translating with Google Translate: {e}")
-            return text
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
     
-    async def _translate_libre(self, text: str, target_lang: str, source_lang: Optional[str] = None) -> str:
-        """Translate text using LibreTranslate API"""
-        try:
-            api_key = TRANSLATION_SERVICES['libre']['api_key']
-            base_url = TRANSLATION_SERVICES['libre']['base_url']
-            
-            # Use a public LibreTranslate instance if none is configured
-            if not base_url:
-                base_url = "https://libretranslate.de/translate"
-                logger.info("Using public LibreTranslate instance")
-
-            if not base_url.endswith('/translate'):
-                base_url = base_url.rstrip('/') + '/translate'
-            
-            session = await self.get_session()
-            
-            payload = {
-                'q': text,
-                'target': target_lang,
-                'format': 'text'
-            }
-            
-            if api_key:
-                payload['api_key'] = api_key
-                
-            if source_lang:
-                payload['source'] = source_lang
+    async def translate_batch(
+        self,
+        texts: List[str],
+        target_langs: Union[str, List[str]],
+        source_lang: Optional[str] = None,
+        guild_id: Optional[int] = None,
+        channel_id: Optional[int] = None
+    ) -> List[str]:
+        """Translate many texts, grouping them into as few provider requests as possible.
+        
+        target_langs is either one language for every text or a list matching texts.
+        Results are returned in input order. Budgets apply as in translate().
+        """
+        if isinstance(target_langs, str):
+            target_langs = [target_langs] * len(texts)
+        if len(target_langs) != len(texts):
+            raise ValueError("texts and target_langs must have the same length")
+        
+        results = list(texts)
+        
+        # Mask markup the same way translate() does; texts with nothing translatable are left as they are
+        masks = {
+            index: mask_markup(text)
+            for index, (text, target_lang) in enumerate(zip(texts, target_langs))
+            if text and target_lang
+        }
+        masks = {index: masked for index, masked in masks.items() if masked.translatable}
+        
+        # Answer what we can from the cache
+        keys = {
+            index: self._cache_keys(masked.text, source_lang, target_langs[index])
+            for index, masked in masks.items()
+        }
+        cached = await self.cache.get_many([key for index_keys in keys.values() for key in index_keys])
+        missing = []
+        for index, index_keys in keys.items():
+            hit = next((cached[key] for key in index_keys if key in cached), None)
+            if hit is not None:
+                results[index] = masks[index].restore(hit)
             else:
-                # If auto detection doesn't work, use English as fallback
-                payload['source'] = 'en'
-            
-            try:
-                timeout = aiohttp.ClientTimeout(total=5)
-                async with session.post(base_url, json=payload, timeout=timeout) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if 'translatedText' in data:
-                            return data['translatedText']
-                        else:
-                            logger.error(f"Unexpected LibreTranslate API response: {data}")
-                            return f"[Translation format error] {text}"
+                missing.append(index)
+        
+        level = budget_manager.scope_level(guild_id, channel_id)
+        local = [i for i in missing if self.router.use_local(len(masks[i].text), level != OK)]
+        if local:
+            translated = await self._translate_local(
+                [masks[i].text for i in local],
+                [target_langs[i] for i in local],
+                source_lang
+            )
+            for index, translated_text in zip(local, translated):
+                if translated_text is not None:
+                    results[index] = masks[index].restore(translated_text)
+                    missing.remove(index)
+        
+        if missing and level == HARD:
+            logger.warning(f"Translation budget exhausted for guild {guild_id} / channel {channel_id}; returning original text")
+            missing = []
+        if missing:
+            budget_manager.charge_scope(guild_id, channel_id, sum(len(masks[i].text) for i in missing))
+            translated = await self._translate_upstream(
+                [masks[i].text for i in missing],
+                [target_langs[i] for i in missing],
+                source_lang,
+                level != OK
+            )
+            for index, translated_text in zip(missing, translated):
+                results[index] = masks[index].restore(translated_text)
+        return results
+    
+    async def _translate_upstream(
+        self,
+        texts: List[str],
+        target_langs: List[str],
+        source_lang: Optional[str] = None,
+        economy: bool = False
+    ) -> List[str]:
+        """Send texts to the providers in as few requests as possible and cache the successful results.
+        
+        economy restricts the request to free providers when one is available.
+        """
+        results = list(texts)
+        
+        # Group text indices by target language, since providers take one target per request
+        groups: Dict[str, List[int]] = {}
+        for index, (text, target_lang) in enumerate(zip(texts, target_langs)):
+            if text and target_lang:
+                groups.setdefault(target_lang, []).append(index)
+        
+        # Leftover batches split off by run_batch, awaited along with the groups
+        spawned: List[asyncio.Task] = []
+        
+        async def run_batch(target_lang: str, indices: List[int]):
+            # Providers that don't handle the language pair count as already tried
+            tried: List[str] = self._unsupported(source_lang, target_lang)
+            if len(tried) == len(TRANSLATION_SERVICES):
+                logger.warning(f"No translation service supports {source_lang or 'auto'} -> {target_lang}; returning original text")
+                return
+            error = None
+            # Paid providers count as already tried too, unless no free one is usable
+            if economy:
+                paid = [name for name in self.providers if not budget_manager.is_free(name) and name not in tried]
+                if self.router.candidates(tried + paid):
+                    tried.extend(paid)
+            # A failed request gets one more try on a provider that hasn't been tried yet
+            for _ in range(2):
+                service = await self.router.acquire(exclude=tried)
+                if service is None:
+                    break
+                tried.append(service)
+                # The token covers one request within the routed provider's limits; the rest is routed on its own
+                batches = self._split_indices(service, texts, indices)
+                indices = batches[0]
+                spawned.extend(asyncio.ensure_future(run_batch(target_lang, batch)) for batch in batches[1:])
+                batch_texts = [texts[i] for i in indices]
+                try:
+                    service, translated = await self._translate_hedged(service, batch_texts, target_lang, source_lang, tried)
+                except TranslationError as e:
+                    if e.timeout:
+                        logger.warning(str(e))
                     else:
-                        error_text = await response.text()
-                        logger.error(f"LibreTranslate API error: {response.status} - {error_text}")
-                        return f"[{target_lang}] {text}"
-            except (asyncio.TimeoutError, ClientConnectionError) as timeout_error:
-                logger.warning(f"LibreTranslate request timed out or failed to connect: {timeout_error}")
-                return f"[Translation timeout] {text}"
-            except Exception as req_error:
-                logger.error(f"LibreTranslate request error: {req_error}")
-                return f"[Translation request error] {text}"
-        except Exception as e:
-            logger.error(f"Error translating with LibreTranslate: {e}")
-            return f"[Translation failed] {text}"
-
-    async def _translate_deepl(self, text: str, target_lang: str, source_lang: Optional[str] = None) -> str:
-        """Translate text using DeepL API"""
+                        logger.error(str(e))
+                    error = e
+                    continue
+                for i, translated_text in zip(indices, translated):
+                    results[i] = translated_text
+                await self.cache.set_many({
+                    self.cache.make_key(text, source_lang, target_lang, service): translated_text
+                    for text, translated_text in zip(batch_texts, translated)
+                })
+                return
+            
+            if error is None:
+                # Rejected rather than queued: every provider is rate limited, over budget or has an open breaker
+                logger.warning("All translation services are rate limited, over budget or unavailable; returning original text")
+                error = TranslationError("No translation service available")
+            for i in indices:
+                results[i] = error.fallback(texts[i])
+        
         try:
-            api_key = TRANSLATION_SERVICES['deepl']['api_key']
-            base_url = TRANSLATION_SERVICES['deepl'].get('base_url', 'https://api-free.deepl.com/v2/translate')
-
-            if not api_key:
-                logger.error("DeepL API key not set")
-                return text
-
-            session = await self.get_session()
-
-            payload = {
-                'auth_key': api_key,
-                'text': text,
-                'target_lang': target_lang.upper()
-            }
-
-            if source_lang and source_lang.lower() != 'auto':
-                payload['source_lang'] = source_lang.upper()
-
-            timeout = aiohttp.ClientTimeout(total=5)
-            async with session.post(base_url, data=payload, timeout=timeout) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if 'translations' in data and len(data['translations']) > 0:
-                        return data['translations'][0]['text']
-                    else:
-                        logger.error(f"Unexpected DeepL API response: {data}")
-                        return f"[Translation format error] {text}"
-                else:
-                    error_text = await response.text()
-                    logger.error(f"DeepL API error: {response.status} - {error_text}")
-                    return f"[{target_lang}] {text}"
-
-        except (asyncio.TimeoutError, ClientConnectionError) as timeout_error:
-            logger.warning(f"DeepL request timed out or failed: {timeout_error}")
-            return f"[Translation timeout] {text}"
+            await asyncio.gather(*(run_batch(target_lang, indices) for target_lang, indices in groups.items()))
+            # Split-off batches can split again, so keep going until none are left
+            while spawned:
+                await spawned.pop()
+        finally:
+            for task in spawned:
+                task.cancel()
+        return results
+    
+    def _split_indices(self, service: str, texts: List[str], indices: List[int]) -> List[List[int]]:
+        """Split indices into batches that fit one request to the provider"""
+        batches = []
+        position = 0
+        for batch in self.providers[service].split([texts[i] for i in indices]):
+            batches.append(indices[position:position + len(batch)])
+            position += len(batch)
+        return batches
+    
+    async def _translate_local(self, texts: List[str], target_langs: List[str], source_lang: Optional[str]) -> List[Optional[str]]:
+        """Translate with the local engine, None for each text it can't handle"""
+        start = time.monotonic()
+        translated = await self.local.translate(texts, target_langs, source_lang)
+        hits = [text for text, result in zip(texts, translated) if result is not None]
+        self._observe_provider('local', 'ok' if hits else 'miss', time.monotonic() - start)
+        if hits:
+            PROVIDER_CHARACTERS_TOTAL.inc(sum(len(text) for text in hits), provider='local')
+        return translated
+    
+    async def _call_provider(self, service: str, texts: List[str], target_lang: str, source_lang: Optional[str]) -> List[str]:
+        """Send one request to a routed provider, charge its budget and report the outcome to the router and the metrics"""
+        start = time.monotonic()
+        sent = False
+        try:
+            async with self._semaphore(service):
+                sent = True
+                translated = await self.providers[service].translate(texts, target_lang, source_lang)
+        except asyncio.CancelledError:
+            self.router.release(service)
+            self._observe_provider(service, 'cancelled', time.monotonic() - start)
+            raise
+        except TranslationError as e:
+            self.router.record_failure(service, time.monotonic() - start, timeout=e.timeout)
+            self._observe_provider(service, 'timeout' if e.timeout else 'error', time.monotonic() - start)
+            raise
         except Exception as e:
-            logger.error(f"Error translating with DeepL: {e}")
-            return f"[Translation failed] {text}"
+            # Not the provider's fault (nothing reached it, or our own code failed), so free the token without judging it
+            self.router.release(service)
+            self._observe_provider(service, 'error', time.monotonic() - start)
+            raise TranslationError(f"Error calling translation service {service}: {e}") from e
+        finally:
+            # The characters went out whether or not an answer came back (failed tries and losing hedges included)
+            if sent:
+                budget_manager.charge_provider(service, sum(len(text) for text in texts))
+        self.router.record_success(service, time.monotonic() - start)
+        self._observe_provider(service, 'ok', time.monotonic() - start)
+        PROVIDER_CHARACTERS_TOTAL.inc(sum(len(text) for text in texts), provider=service)
+        return translated
     
-    async def detect_language(self, text: str) -> str:
-        """Detect the language of the text"""
+    @staticmethod
+    def _observe_provider(service: str, outcome: str, latency: float):
+        PROVIDER_SECONDS.observe(latency, provider=service, outcome=outcome)
+        PROVIDER_REQUESTS_TOTAL.inc(provider=service, outcome=outcome)
+    
+    async def _translate_hedged(
+        self,
+        service: str,
+        texts: List[str],
+        target_lang: str,
+        source_lang: Optional[str],
+        tried: List[str]
+    ) -> Tuple[str, List[str]]:
+        """Call service, racing a backup provider if it is slower than its usual p95 latency.
+        
+        Returns the provider that answered and its translations. Backup providers
+        are appended to tried.
+        """
+        primary = asyncio.ensure_future(self._call_provider(service, texts, target_lang, source_lang))
+        tasks = {primary: service}
         try:
-            # Default to Google's detection since it's more reliable
-            api_key = TRANSLATION_SERVICES['google']['api_key']
-            if not api_key:
-                return CONFIG['default_language']
-                
-            base_url = 'https://translation.googleapis.com/language/translate/v2/detect'
-            
-            session = await self.get_session()
+            delay = self.router.hedge_delay(service)
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+                if not primary.done():
+                    # The backup gets the same single request, so it has to fit within the backup's limits
+                    too_small = [name for name, provider in self.providers.items() if len(provider.split(texts)) > 1]
+                    backup_service = self.router.try_acquire_hedge(exclude=tried + too_small)
+                    if backup_service:
+                        tried.append(backup_service)
+                        backup = asyncio.ensure_future(self._call_provider(backup_service, texts, target_lang, source_lang))
+                        tasks[backup] = backup_service
             
-            params = {
-                'key': api_key,
-                'q': text
-            }
-            
-            async with session.post(base_url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if 'data' in data and 'detections' in data['data'] and len(data['data']['detections']) > 0:
-                        detections = data['data']['detections'][0]
-                        if len(detections) > 0 and 'language' in detections[0]:
-                            return detections[0]['language']
-                    logger.error(f"Unexpected language detection response: {data}")
-                    return CONFIG['default_language']
-                else:
-                    logger.error(f"Language detection API error: {response.status} - {await response.text()}")
-                    return CONFIG['default_language']
-        except Exception as e:
-            logger.error(f"Error detecting language: {e}")
+            # First successful answer wins; if every request fails, the last error is raised
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.router.hedge_stats['won'] += 1
+                        return tasks[task], task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    async def detect_language(self, text: str) -> str:
+        """Detect the language of the text"""
+        if not text:
             return CONFIG['default_language']
+        
+        # Reuse earlier results for the same normalized text
+        memo_key = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+        language = self.detections.get(memo_key)
+        if language:
+            self.detections.move_to_end(memo_key)
+            return language
+        
+        # Short and obvious cases are settled locally without a network call
+        local_language, confidence = detect_language_local(text)
+        if local_language and confidence >= CONFIG['language_detection']['min_confidence']:
+            language = local_language
+        else:
+            language = await self._detect_language_remote(text)
+            if not language:
+                # Don't remember fallbacks so a later call can still reach the remote detector
+                return local_language or CONFIG['default_language']
+        
+        self.detections[memo_key] = language
+        while len(self.detections) > CONFIG['language_detection']['cache_entries']:
+            self.detections.popitem(last=False)
+        return language
+    
+    async def _detect_language_remote(self, text: str) -> Optional[str]:
+        """Detect the language of the text with the first usable provider that supports detection, returning None if unavailable"""
+        for name, provider in self.providers.items():
+            if not provider.capabilities.supports_detection or not self.router.is_configured(name):
+                continue
+            try:
+                return await provider.detect(text)
+            except TranslationError as e:
+                logger.error(str(e))
+        return None
 
 # Create the translation service instance
 translation_service = TranslationService()
+
+REGISTRY.register(CallbackMetric(
+    'tonguetwist_translation_cache_lookups_total',
+    'Translation cache lookups, by result',
+    'counter',
+    lambda: {
+        (('result', 'memory_hit'),): translation_service.cache.stats['memory_hits'],
+        (('result', 'disk_hit'),): translation_service.cache.stats['disk_hits'],
+        (('result', 'miss'),): translation_service.cache.stats['misses'],
+    }
+))
+REGISTRY.register(CallbackMetric(
+    'tonguetwist_provider_latency_ewma_seconds',
+    'Moving average of provider latency used for routing',
+    'gauge',
+    lambda: {
+        (('provider', name),): health['latency']
+        for name, health in translation_service.router.snapshot().items()
+    }
+))
+REGISTRY.register(CallbackMetric(
+    'tonguetwist_provider_breaker_open',
+    "Whether a provider's circuit breaker is open (1) or not (0)",
+    'gauge',
+    lambda: {
+        (('provider', name),): int(health['state'] == 'open')
+        for name, health in translation_service.router.snapshot().items()
+    }
+))
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from config import CONFIG
+
+logger = logging.getLogger('discord')
+
+class TranslationCache:
+    """Content-addressed translation cache with an in-memory LRU tier and an SQLite tier"""
+
+    def __init__(self, path: str = None, memory_entries: int = None, disk_entries: int = None, ttl: int = None):
+        settings = CONFIG['translation_cache']
+        self.path = path or settings['path']
+        self.memory_entries = memory_entries or settings['memory_entries']
+        self.disk_entries = disk_entries or settings['disk_entries']
+        self.ttl = ttl or settings['ttl']
+        self.memory: 'OrderedDict[str, Tuple[str, float]]' = OrderedDict()  # key -> (translation, created_at)
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self._connection = None
+        # SQLite work runs on one dedicated thread so it never blocks the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='translation-cache')
+        self._writes_since_prune = 0
+
+    @staticmethod
+    def make_key(text: str, source_lang: Optional[str], target_lang: str, provider: str) -> str:
+        """Build the cache key for a translation"""
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f"{provider}:{source_lang or 'auto'}:{target_lang}:{text_hash}"
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the SQLite database, creating the table if needed (runs on the cache thread)"""
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, translation TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_translations_accessed ON translations (accessed_at)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def _disk_get_many(self, keys: List[str]) -> Dict[str, Tuple[str, float]]:
+        """Look up keys in the SQLite tier (runs on the cache thread)"""
+        connection = self._connect()
+        now = time.time()
+        found = {}
+        # Stay under SQLite's bound parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = connection.execute(
+                f"SELECT key, translation, created_at FROM translations WHERE key IN ({placeholders}) AND created_at > ?",
+                (*chunk, now - self.ttl)
+            ).fetchall()
+            for key, translation, created_at in rows:
+                found[key] = (translation, created_at)
+        if found:
+            connection.executemany(
+                "UPDATE translations SET accessed_at = ? WHERE key = ?",
+                [(now, key) for key in found]
+            )
+            connection.commit()
+        return found
+
+    def _disk_set_many(self, entries: List[Tuple[str, str, float]]) -> int:
+        """Write entries to the SQLite tier and prune it when needed (runs on the cache thread)"""
+        connection = self._connect()
+        now = time.time()
+        connection.executemany(
+            "INSERT OR REPLACE INTO translations (key, translation, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            [(key, translation, created_at, now) for key, translation, created_at in entries]
+        )
+        connection.commit()
+
+        self._writes_since_prune += len(entries)
+        if self._writes_since_prune < CONFIG['translation_cache']['prune_interval']:
+            return 0
+        self._writes_since_prune = 0
+
+        # Drop expired entries, then the least recently used ones above the size cap
+        evicted = connection.execute("DELETE FROM translations WHERE created_at <= ?", (now - self.ttl,)).rowcount
+        count = connection.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        if count > self.disk_entries:
+            evicted += connection.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.disk_entries,)
+            ).rowcount
+        connection.commit()
+        return evicted
+
+    def _remember(self, key: str, translation: str, created_at: float):
+        """Put an entry in the memory tier, evicting the least recently used one if full"""
+        self.memory[key] = (translation, created_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    async def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """Return cached translations for the keys that have one"""
+        now = time.time()
+        found = {}
+        disk_keys = []
+        for key in keys:
+            entry = self.memory.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self.memory.move_to_end(key)
+                found[key] = entry[0]
+                self.stats['memory_hits'] += 1
+            else:
+                if entry:
+                    del self.memory[key]
+                disk_keys.append(key)
+
+        if disk_keys:
+            try:
+                loop = asyncio.get_running_loop()
+                disk_found = await loop.run_in_executor(self._executor, self._disk_get_many, disk_keys)
+            except Exception as e:
+                logger.error(f"Error reading translation cache: {e}")
+                disk_found = {}
+            for key, (translation, created_at) in disk_found.items():
+                self._remember(key, translation, created_at)
+                found[key] = translation
+            self.stats['disk_hits'] += len(disk_found)
+            self.stats['misses'] += len(disk_keys) - len(disk_found)
+
+        return found
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached translation for key, if any"""
+        found = await self.get_many([key])
+        return found.get(key)
+
+    async def set_many(self, entries: Dict[str, str]):
+        """Store translations in both tiers"""
+        if not entries:
+            return
+        now = time.time()
+        for key, translation in entries.items():
+            self._remember(key, translation, now)
+        self.stats['writes'] += len(entries)
+        try:
+            loop = asyncio.get_running_loop()
+            evicted = await loop.run_in_executor(
+                self._executor,
+                self._disk_set_many,
+                [(key, translation, now) for key, translation in entries.items()]
+            )
+            self.stats['evictions'] += evicted
+        except Exception as e:
+            logger.error(f"Error writing translation cache: {e}")
+
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from either tier"""
+        hits = self.stats['memory_hits'] + self.stats['disk_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+
+    def _close_connection(self):
+        """Close the SQLite connection (runs on the cache thread)"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def close(self):
+        """Close the SQLite connection; it is reopened on next use"""
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._close_connection)
+        except Exception as e:
+            logger.error(f"Error closing translation cache: {e}")
@@ -0,0 +1,394 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+import aiohttp
+from aiohttp import ClientConnectionError
+
+from config import TRANSLATION_SERVICES
+from language_index import LanguageIndex
+
+logger = logging.getLogger('discord')
+
+class TranslationError(Exception):
+    """Raised when a provider request fails"""
+
+    def __init__(self, message: str, prefix: Optional[str] = None, timeout: bool = False):
+        super().__init__(message)
+        self.prefix = prefix  # Prepended to the original text to build the fallback result
+        self.timeout = timeout
+
+    def fallback(self, text: str) -> str:
+        """Text returned to the caller in place of a translation"""
+        return f"{self.prefix} {text}" if self.prefix else text
+
+class ProviderCapabilities:
+    """What a provider can do, from its class and its TRANSLATION_SERVICES entry"""
+
+    def __init__(
+        self,
+        max_batch_size: int,
+        max_batch_chars: int,
+        languages: LanguageIndex,
+        cost_per_char: float,
+        supports_detection: bool,
+        supports_streaming: bool
+    ):
+        self.max_batch_size = max_batch_size  # Texts per request
+        self.max_batch_chars = max_batch_chars  # Characters per request
+        self.languages = languages  # Supported languages and the provider's codes for them
+        self.cost_per_char = cost_per_char
+        self.supports_detection = supports_detection
+        self.supports_streaming = supports_streaming
+
+class TranslationProvider:
+    """Base class for translation APIs.
+
+    Subclasses set name and implement _translate and fetch_languages; those
+    that can detect languages also set supports_detection and implement
+    detect. Codes the provider spells differently from the bot go in
+    source_codes and target_codes. Settings come
+    from the provider's TRANSLATION_SERVICES entry, looked up on every request
+    so keys set from the dashboard apply straight away.
+    """
+
+    name = ''
+    default_endpoint = ''
+    supports_detection = False
+    supports_streaming = False
+    # Bot code -> provider code, where they differ
+    source_codes: Dict[str, str] = {}
+    target_codes: Dict[str, str] = {}
+    # Other provider codes for a bot code, recognised when reading the languages endpoint
+    language_aliases: Dict[str, str] = {}
+    uppercase_codes = False
+
+    def __init__(self, get_session: Callable[[str], Awaitable[aiohttp.ClientSession]]):
+        self._get_session = get_session
+        settings = self.settings
+        self.capabilities = ProviderCapabilities(
+            max_batch_size=settings.get('max_batch_size', 1),
+            max_batch_chars=settings.get('max_batch_chars', 5000),
+            languages=LanguageIndex(
+                self.name,
+                settings.get('languages'),
+                source_codes=self.source_codes,
+                target_codes=self.target_codes,
+                aliases=self.language_aliases,
+                uppercase=self.uppercase_codes
+            ),
+            cost_per_char=settings.get('cost_per_million', 0.0) / 1_000_000,
+            supports_detection=self.supports_detection,
+            supports_streaming=self.supports_streaming
+        )
+
+    @property
+    def settings(self) -> Dict:
+        return TRANSLATION_SERVICES[self.name]
+
+    @property
+    def endpoint(self) -> str:
+        """The translate endpoint, also used to warm up connections"""
+        return self.settings.get('base_url') or self.default_endpoint
+
+    @property
+    def languages(self) -> LanguageIndex:
+        return self.capabilities.languages
+
+    def session(self) -> Awaitable[aiohttp.ClientSession]:
+        return self._get_session(self.name)
+
+    def supports(self, source_lang: Optional[str], target_lang: str) -> bool:
+        """Whether the provider can translate between the two languages; a missing source means auto-detect"""
+        return self.languages.supports(source_lang, target_lang)
+
+    def split(self, texts: List[str]) -> List[List[str]]:
+        """Split texts into requests that respect the provider's count and size limits"""
+        batches = []
+        current: List[str] = []
+        current_chars = 0
+        for text in texts:
+            # A text that is too long on its own still gets a request to itself
+            if current and (
+                len(current) >= self.capabilities.max_batch_size
+                or current_chars + len(text) > self.capabilities.max_batch_chars
+            ):
+                batches.append(current)
+                current = []
+                current_chars = 0
+            current.append(text)
+            current_chars += len(text)
+        if current:
+            batches.append(current)
+        return batches
+
+    async def translate(self, texts: List[str], target_lang: str, source_lang: Optional[str] = None) -> List[str]:
+        """Translate texts in one request; callers split() them first so each request is routed and counted"""
+        return await self._translate(texts, target_lang, source_lang)
+
+    async def _translate(self, texts: List[str], target_lang: str, source_lang: Optional[str]) -> List[str]:
+        """Send one request, raising TranslationError on failure"""
+        raise NotImplementedError
+
+    async def detect(self, text: str) -> Optional[str]:
+        """Detect the language of text, raising TranslationError on failure"""
+        raise TranslationError(f"{self.name} does not support language detection")
+
+    async def refresh_languages(self):
+        """Update the language index from the provider's languages endpoint"""
+        try:
+            self.languages.refresh(*await self.fetch_languages())
+        except TranslationError:
+            raise
+        except (asyncio.TimeoutError, ClientConnectionError) as timeout_error:
+            raise TranslationError(f"{self.name} languages request timed out or failed: {timeout_error}", timeout=True) from timeout_error
+        except Exception as e:
+            raise TranslationError(f"Error fetching {self.name} languages: {e}") from e
+
+    async def fetch_languages(self) -> Tuple:
+        """Return (sources, targets) or (sources, targets, pair_targets) in the provider's codes"""
+        raise NotImplementedError
+
+# Provider classes by TRANSLATION_SERVICES name
+PROVIDER_CLASSES: Dict[str, Type[TranslationProvider]] = {}
+
+def register_provider(cls: Type[TranslationProvider]) -> Type[TranslationProvider]:
+    """Class decorator that makes a provider available under its name"""
+    PROVIDER_CLASSES[cls.name] = cls
+    return cls
+
+def create_providers(get_session: Callable[[str], Awaitable[aiohttp.ClientSession]]) -> Dict[str, TranslationProvider]:
+    """Instantiate a provider for every TRANSLATION_SERVICES entry with a registered class, in config order"""
+    providers = {}
+    for name in TRANSLATION_SERVICES:
+        cls = PROVIDER_CLASSES.get(name)
+        if cls is None:
+            logger.warning(f"No provider class registered for translation service {name}; ignoring it")
+            continue
+        providers[name] = cls(get_session)
+    return providers
+
+@register_provider
+class GoogleProvider(TranslationProvider):
+    name = 'google'
+    default_endpoint = 'https://translation.googleapis.com/language/translate/v2'
+    supports_detection = True
+
+    async def _translate(self, texts: List[str], target_lang: str, source_lang: Optional[str]) -> List[str]:
+        """Translate texts using Google Translate API"""
+        api_key = self.settings['api_key']
+
+        if not api_key:
+            raise TranslationError("Google Translate API key not set")
+
+        try:
+            session = await self.session()
+
+            # Send the texts in the form body; a query string cannot hold a full batch
+            payload = [('q', text) for text in texts]
+            payload.append(('target', self.languages.target_code(target_lang)))
+
+            source_code = self.languages.source_code(source_lang)
+            if source_code:
+                payload.append(('source', source_code))
+
+            async with session.post(self.endpoint, params={'key': api_key}, data=payload) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    if 'data' in data and 'translations' in data['data'] and len(data['data']['translations']) == len(texts):
+                        return [translation['translatedText'] for translation in data['data']['translations']]
+                    else:
+                        raise TranslationError(f"Unexpected Google Translate API response: {data}")
+                else:
+                    raise TranslationError(f"Google Translate API error: {response.status} - {await response.text()}")
+        except TranslationError:
+            raise
+        except (asyncio.TimeoutError, ClientConnectionError) as timeout_error:
+            raise TranslationError(
+                f"Google Translate request timed out or failed: {timeout_error}",
+                timeout=True
+            ) from timeout_error
+        except Exception as e:
+            raise TranslationError(f"Error translating with Google Translate: {e}") from e
+
+    async def detect(self, text: str) -> Optional[str]:
+        """Detect the language of the text with Google Translate API"""
+        api_key = self.settings['api_key']
+        if not api_key:
+            raise TranslationError("Google Translate API key not set")
+
+        try:
+            session = await self.session()
+            async with session.post(f"{self.endpoint}/detect", params={'key': api_key, 'q': text}) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    if 'data' in data and 'detections' in data['data'] and len(data['data']['detections']) > 0:
+                        detections = data['data']['detections'][0]
+                        if len(detections) > 0 and 'language' in detections[0]:
+                            return detections[0]['language']
+                    raise TranslationError(f"Unexpected language detection response: {data}")
+                else:
+                    raise TranslationError(f"Language detection API error: {response.status} - {await response.text()}")
+        except TranslationError:
+            raise
+        except (asyncio.TimeoutError, ClientConnectionError) as timeout_error:
+            raise TranslationError(f"Language detection timed out or failed: {timeout_error}", timeout=True) from timeout_error
+        except Exception as e:
+            raise TranslationError(f"Error detecting language: {e}") from e
+
+    async def fetch_languages(self) -> Tuple:
+        """Google answers with one list; every language works as both source and target"""
+        api_key = self.settings['api_key']
+        if not api_key:
+            raise TranslationError("Google Translate API key not set")
+
+        session = await self.session()
+        async with session.get(f"{self.endpoint}/languages", params={'key': api_key}) as response:
+            if response.status != 200:
+                raise TranslationError(f"Google Translate languages error: {response.status} - {await response.text()}")
+            data = await response.json()
+        codes = [language['language'] for language in data.get('data', {}).get('languages', [])]
+        return codes, codes
+
+@register_provider
+class LibreProvider(TranslationProvider):
+    name = 'libre'
+    # Public LibreTranslate instance, used if none is configured
+    default_endpoint = 'https://libretranslate.de/translate'
+    source_codes = {'zh-CN': 'zh', 'zh-TW': 'zt'}
+    target_codes = {'zh-CN': 'zh', 'zh-TW': 'zt'}
+    # Newer LibreTranslate releases report Chinese by script
+    language_aliases = {'zh-Hans': 'zh-CN', 'zh-Hant': 'zh-TW'}
+
+    @property
+    def endpoint(self) -> str:
+        base_url = self.settings.get('base_url') or self.default_endpoint
+        if not base_url.endswith('/translate'):
+            base_url = base_url.rstrip('/') + '/translate'
+        return base_url
+
+    async def _translate(self, texts: List[str], target_lang: str, source_lang: Optional[str]) -> List[str]:
+        """Translate texts using LibreTranslate API"""
+        try:
+            api_key = self.settings['api_key']
+
+            session = await self.session()
+
+            # LibreTranslate accepts a list for q and answers with a list of the same length
+            payload = {
+                'q': texts if len(texts) > 1 else texts[0],
+                'source': self.languages.source_code(source_lang) or 'auto',
+                'target': self.languages.target_code(target_lang),
+                'format': 'text'
+            }
+
+            if api_key:
+                payload['api_key'] = api_key
+
+            try:
+                async with session.post(self.endpoint, json=payload) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        translated = data.get('translatedText') if isinstance(data, dict) else None
+                        if isinstance(translated, str) and len(texts) == 1:
+                            return [translated]
+                        elif isinstance(translated, list) and len(translated) == len(texts):
+                            return translated
+                        else:
+                            raise TranslationError(f"Unexpected LibreTranslate API response: {data}", "[Translation format error]")
+                    else:
+                        error_text = await response.text()
+                        raise TranslationError(f"LibreTranslate API error: {response.status} - {error_text}", f"[{target_lang}]")
+            except TranslationError:
+                raise
+            except (asyncio.TimeoutError, ClientConnectionError) as timeout_error:
+                raise TranslationError(
+                    f"LibreTranslate request timed out or failed to connect: {timeout_error}",
+                    "[Translation timeout]",
+                    timeout=True
+                ) from timeout_error
+            except Exception as req_error:
+                raise TranslationError(f"LibreTranslate request error: {req_error}", "[Translation request error]") from req_error
+        except TranslationError:
+            raise
+        except Exception as e:
+            raise TranslationError(f"Error translating with LibreTranslate: {e}", "[Translation failed]") from e
+
+    async def fetch_languages(self) -> Tuple:
+        """LibreTranslate lists each source language with the targets it pairs with"""
+        session = await self.session()
+        url = self.endpoint[:-len('/translate')] + '/languages'
+        async with session.get(url) as response:
+            if response.status != 200:
+                raise TranslationError(f"LibreTranslate languages error: {response.status} - {await response.text()}")
+            data = await response.json()
+        sources = [language['code'] for language in data]
+        pair_targets = {language['code']: language.get('targets', sources) for language in data}
+        targets = sorted({code for codes in pair_targets.values() for code in codes})
+        return sources, targets, pair_targets
+
+@register_provider
+class DeepLProvider(TranslationProvider):
+    name = 'deepl'
+    default_endpoint = 'https://api-free.deepl.com/v2/translate'
+    uppercase_codes = True
+    # DeepL takes Chinese without a region as a source, and wants a variant for some targets
+    source_codes = {'zh-CN': 'ZH', 'zh-TW': 'ZH'}
+    target_codes = {'en': 'EN-US', 'pt': 'PT-BR', 'zh-CN': 'ZH-HANS', 'zh-TW': 'ZH-HANT'}
+
+    async def _translate(self, texts: List[str], target_lang: str, source_lang: Optional[str]) -> List[str]:
+        """Translate texts using DeepL API"""
+        api_key = self.settings['api_key']
+
+        if not api_key:
+            raise TranslationError("DeepL API key not set")
+
+        try:
+            session = await self.session()
+
+            # DeepL takes the text parameter once per text to translate
+            payload = [('auth_key', api_key)]
+            payload.extend(('text', text) for text in texts)
+            payload.append(('target_lang', self.languages.target_code(target_lang)))
+
+            source_code = self.languages.source_code(source_lang)
+            if source_code:
+                payload.append(('source_lang', source_code))
+
+            async with session.post(self.endpoint, data=payload) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    if 'translations' in data and len(data['translations']) == len(texts):
+                        return [translation['text'] for translation in data['translations']]
+                    else:
+                        raise TranslationError(f"Unexpected DeepL API response: {data}", "[Translation format error]")
+                else:
+                    error_text = await response.text()
+                    raise TranslationError(f"DeepL API error: {response.status} - {error_text}", f"[{target_lang}]")
+
+        except TranslationError:
+            raise
+        except (asyncio.TimeoutError, ClientConnectionError) as timeout_error:
+            raise TranslationError(
+                f"DeepL request timed out or failed: {timeout_error}",
+                "[Translation timeout]",
+                timeout=True
+            ) from timeout_error
+        except Exception as e:
+            raise TranslationError(f"Error translating with DeepL: {e}", "[Translation failed]") from e
+
+    async def fetch_languages(self) -> Tuple:
+        """DeepL lists source and target languages separately"""
+        api_key = self.settings['api_key']
+        if not api_key:
+            raise TranslationError("DeepL API key not set")
+
+        session = await self.session()
+        url = self.endpoint.rsplit('/', 1)[0] + '/languages'
+        lists = []
+        for kind in ('source', 'target'):
+            async with session.get(url, params={'auth_key': api_key, 'type': kind}) as response:
+                if response.status != 200:
+                    raise TranslationError(f"DeepL languages error: {response.status} - {await response.text()}")
+                lists.append([language['language'] for language in await response.json()])
+        return lists[0], lists[1]
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from config import CONFIG
+from metrics import REGISTRY, CallbackMetric
+from outbound import BACKGROUND, INTERACTIVE
+
+logger = logging.getLogger('discord')
+
+class DeadlineExceeded(Exception):
+    """Raised when a translation job's deadline passes before it finishes"""
+
+class TranslationScheduler:
+    """Shared queue in front of TranslationService.
+
+    Caps how many translation jobs run at once. Free slots go to the highest
+    priority class first, and within a class to guilds in turn, so one busy
+    guild's auto-translate can't starve everyone else. Jobs whose deadline
+    passes, queued or running, are dropped with DeadlineExceeded.
+    """
+
+    def __init__(self):
+        settings = CONFIG['translation_scheduler']
+        self.max_in_flight = settings['max_in_flight']
+        self.in_flight = 0
+        # Priority -> guild ID -> waiting futures, guilds in round-robin order
+        self._queues: Dict[int, 'OrderedDict[Optional[int], Deque[asyncio.Future]]'] = {
+            INTERACTIVE: OrderedDict(),
+            BACKGROUND: OrderedDict(),
+        }
+        self.stats = {'submitted': 0, 'completed': 0, 'expired': 0}
+
+    def queue_depth(self, priority: Optional[int] = None) -> int:
+        """Jobs waiting for a slot, in one priority class or all of them"""
+        queues = [self._queues[priority]] if priority is not None else self._queues.values()
+        return sum(len(waiters) for guilds in queues for waiters in guilds.values())
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Pop the next waiter: highest priority class first, then the guild whose turn it is"""
+        for priority in sorted(self._queues):
+            guilds = self._queues[priority]
+            while guilds:
+                guild_id, waiters = next(iter(guilds.items()))
+                future = waiters.popleft()
+                # The guild goes to the back of the line, or leaves it when it has nothing left
+                if waiters:
+                    guilds.move_to_end(guild_id)
+                else:
+                    del guilds[guild_id]
+                if not future.done():
+                    return future
+        return None
+
+    def _release(self):
+        """Hand a finished job's slot to the next waiter, or free it"""
+        future = self._next_waiter()
+        if future is not None:
+            future.set_result(None)
+        else:
+            self.in_flight -= 1
+
+    async def _acquire(self, priority: int, guild_id: Optional[int], deadline: Optional[float]):
+        # Slots are only free when nobody is queued, since releases hand them straight to waiters
+        if self.in_flight < self.max_in_flight:
+            self.in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        guilds = self._queues.setdefault(priority, OrderedDict())
+        guilds.setdefault(guild_id, deque()).append(future)
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # A slot handed over just as we gave up goes to the next waiter
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                future.cancel()
+                # Leave the queue now so it isn't counted in the queue depth
+                waiters = guilds.get(guild_id)
+                if waiters is not None and future in waiters:
+                    waiters.remove(future)
+                    if not waiters:
+                        del guilds[guild_id]
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats['expired'] += 1
+                raise DeadlineExceeded("Translation job expired while queued") from None
+            raise
+
+    async def submit(
+        self,
+        job: Callable[[], Awaitable[Any]],
+        priority: int = BACKGROUND,
+        guild_id: Optional[int] = None,
+        deadline: Optional[float] = None
+    ) -> Any:
+        """Run a translation job when a slot is free and return its result.
+
+        deadline is a time.monotonic() timestamp; by default it is the
+        priority class's configured timeout from now.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.default_timeout(priority)
+        self.stats['submitted'] += 1
+        await self._acquire(priority, guild_id, deadline)
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.stats['expired'] += 1
+                raise DeadlineExceeded("Translation job expired before it started")
+            try:
+                result = await asyncio.wait_for(job(), remaining)
+            except asyncio.TimeoutError:
+                self.stats['expired'] += 1
+                raise DeadlineExceeded("Translation job did not finish before its deadline") from None
+            self.stats['completed'] += 1
+            return result
+        finally:
+            self._release()
+
+    @staticmethod
+    def default_timeout(priority: int) -> float:
+        settings = CONFIG['translation_scheduler']
+        return settings['interactive_timeout'] if priority == INTERACTIVE else settings['background_timeout']
+
+# Create the translation scheduler instance
+translation_scheduler = TranslationScheduler()
+
+REGISTRY.register(CallbackMetric(
+    'tonguetwist_translation_queue_depth',
+    'Translation jobs waiting for a scheduler slot, by priority class',
+    'gauge',
+    lambda: {
+        (('priority', 'interactive'),): translation_scheduler.queue_depth(INTERACTIVE),
+        (('priority', 'background'),): translation_scheduler.queue_depth(BACKGROUND),
+    }
+))
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Set
+
+import discord
+
+logger = logging.getLogger('discord')
+
+class AudienceIndex:
+    """Tracks the preferred languages of the members who can read each auto-translate channel"""
+
+    def __init__(self, get_user_language: Callable[[int], Awaitable[str]]):
+        self.get_user_language = get_user_language
+        self._languages: Dict[int, Counter] = {}  # channel ID -> language -> member count
+        self._members: Dict[int, Dict[int, str]] = {}  # channel ID -> member ID -> language
+        self._guild_channels: Dict[int, Set[int]] = {}  # guild ID -> indexed channel IDs
+        self._builds: Dict[int, asyncio.Task] = {}
+
+    def is_indexed(self, channel_id: int) -> bool:
+        return channel_id in self._languages
+
+    def languages(self, channel_id: int) -> Set[str]:
+        """Distinct languages of an indexed channel's audience"""
+        return set(self._languages.get(channel_id, ()))
+
+    def language_counts(self, channel_id: int) -> Counter:
+        """Number of audience members per language for an indexed channel"""
+        return Counter(self._languages.get(channel_id, Counter()))
+
+    def channels_in_guild(self, guild_id: int) -> Set[int]:
+        return set(self._guild_channels.get(guild_id, ()))
+
+    async def ensure(self, channel: discord.abc.GuildChannel) -> Set[str]:
+        """Return the channel's audience languages, scanning its members the first time"""
+        if channel.id not in self._languages:
+            # Concurrent messages in a new channel share one scan
+            build = self._builds.get(channel.id)
+            if build is None:
+                build = asyncio.ensure_future(self._build(channel))
+                self._builds[channel.id] = build
+                build.add_done_callback(lambda _: self._builds.pop(channel.id, None))
+            await build
+        return self.languages(channel.id)
+
+    async def _build(self, channel: discord.abc.GuildChannel):
+        """Scan the channel's members once to fill its index entry"""
+        members: Dict[int, str] = {}
+        for member in channel.members:
+            if not member.bot:
+                members[member.id] = await self.get_user_language(member.id)
+        self._members[channel.id] = members
+        self._languages[channel.id] = Counter(members.values())
+        self._guild_channels.setdefault(channel.guild.id, set()).add(channel.id)
+        logger.debug(f"Indexed {len(members)} members in channel {channel.id}")
+
+    def invalidate(self, channel_id: int):
+        """Forget a channel so it is rescanned on its next message"""
+        self._languages.pop(channel_id, None)
+        self._members.pop(channel_id, None)
+        for channels in self._guild_channels.values():
+            channels.discard(channel_id)
+
+    def invalidate_guild(self, guild_id: int):
+        """Forget every indexed channel in a guild"""
+        for channel_id in self._guild_channels.pop(guild_id, set()):
+            self._languages.pop(channel_id, None)
+            self._members.pop(channel_id, None)
+
+    def add_member(self, channel_id: int, member_id: int, language: str):
+        """Count a member in a channel's audience"""
+        members = self._members.get(channel_id)
+        if members is None or member_id in members:
+            return
+        members[member_id] = language
+        self._languages[channel_id][language] += 1
+
+    def remove_member(self, channel_id: int, member_id: int):
+        """Stop counting a member in a channel's audience"""
+        members = self._members.get(channel_id)
+        if members is None or member_id not in members:
+            return
+        language = members.pop(member_id)
+        counts = self._languages[channel_id]
+        counts[language] -= 1
+        if counts[language] <= 0:
+            del counts[language]
+
+    def has_member(self, channel_id: int, member_id: int) -> bool:
+        return member_id in self._members.get(channel_id, {})
+
+    def update_language(self, member_id: int, language: str):
+        """Move a member to a new language in every channel they are counted in"""
+        for channel_id, members in self._members.items():
+            old_language = members.get(member_id)
+            if old_language is None or old_language == language:
+                continue
+            members[member_id] = language
+            counts = self._languages[channel_id]
+            counts[old_language] -= 1
+            if counts[old_language] <= 0:
+                del counts[old_language]
+            counts[language] += 1
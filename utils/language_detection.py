@@ -0,0 +1,126 @@
+import re
+from typing import Dict, Optional, Tuple
+
+# Spans that carry no language signal
+_NOISE_PATTERN = re.compile(
+    r'```.*?```|`[^`]*`|https?://\S+|<a?:\w+:\d+>|<[@#][!&]?\d+>|[\d_]+',
+    re.DOTALL
+)
+_WORD_PATTERN = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+# Unicode ranges of scripts that identify a language on their own
+_SCRIPT_RANGES = [
+    ('ko', [(0xAC00, 0xD7AF), (0x1100, 0x11FF), (0x3130, 0x318F)]),
+    ('ja', [(0x3040, 0x30FF), (0x31F0, 0x31FF)]),
+    ('han', [(0x4E00, 0x9FFF), (0x3400, 0x4DBF)]),
+    ('th', [(0x0E00, 0x0E7F)]),
+    ('ar', [(0x0600, 0x06FF), (0x0750, 0x077F)]),
+    ('hi', [(0x0900, 0x097F)]),
+    ('ru', [(0x0400, 0x04FF)]),
+    ('he', [(0x0590, 0x05FF)]),
+    ('el', [(0x0370, 0x03FF)]),
+]
+
+# Common characters that only appear in Traditional Chinese
+_TRADITIONAL_CHARS = set('這們說個來時會對為國學還後見過與裡麼嗎體開關書長車門點頭聽話讓應該從現實際')
+
+# Frequent short words for languages written in the Latin script
+_STOPWORDS: Dict[str, set] = {
+    'en': {'the', 'a', 'and', 'is', 'are', 'you', 'that', 'this', 'it', 'to', 'of', 'what', 'with', 'have', 'for', 'not', 'was', 'my', 'do', 'how', 'i', 'be', 'can', 'will', 'just', 'your', 'hello', 'hi', 'hey', 'thank', 'thanks', 'please', 'yes', 'no', 'good', 'morning', 'night', 'bye'},
+    'es': {'el', 'la', 'los', 'las', 'que', 'de', 'y', 'es', 'en', 'un', 'una', 'por', 'con', 'para', 'no', 'lo', 'como', 'pero', 'muy', 'hola', 'gracias', 'estoy', 'qué', 'está', 'yo', 'sí', 'buenos', 'días', 'buenas', 'noches', 'adiós'},
+    'fr': {'le', 'la', 'les', 'des', 'est', 'et', 'je', 'tu', 'vous', 'nous', 'une', 'un', 'que', 'qui', 'pas', 'ne', 'pour', 'dans', 'avec', 'sur', 'bonjour', 'merci', 'oui', 'mais', 'ce', 'du', 'au', 'salut', 'bonsoir', 'revoir', 'bonne', 'nuit'},
+    'de': {'der', 'die', 'das', 'und', 'ist', 'ich', 'du', 'nicht', 'ein', 'eine', 'zu', 'mit', 'auf', 'sie', 'es', 'wir', 'was', 'wie', 'auch', 'danke', 'hallo', 'ja', 'nein', 'aber', 'bin', 'den', 'dem', 'guten', 'morgen', 'tag', 'bitte', 'tschüss'},
+    'it': {'il', 'lo', 'la', 'gli', 'che', 'di', 'e', 'è', 'non', 'un', 'una', 'per', 'con', 'sono', 'come', 'ciao', 'grazie', 'anche', 'ma', 'mi', 'ti', 'della', 'questo', 'io', 'buongiorno', 'buonanotte', 'prego', 'sì'},
+    'pt': {'o', 'a', 'os', 'as', 'que', 'de', 'e', 'é', 'não', 'um', 'uma', 'para', 'com', 'você', 'eu', 'mas', 'muito', 'obrigado', 'obrigada', 'olá', 'tudo', 'bem', 'isso', 'do', 'da', 'em', 'oi', 'bom', 'dia', 'boa', 'noite', 'tchau'},
+    'nl': {'de', 'het', 'een', 'en', 'is', 'ik', 'je', 'niet', 'van', 'dat', 'op', 'met', 'zijn', 'wat', 'hoe', 'ook', 'maar', 'dank', 'hallo', 'wij', 'jij', 'goed', 'er', 'bedankt', 'goedemorgen', 'doei'},
+    'sv': {'och', 'är', 'jag', 'du', 'det', 'att', 'en', 'ett', 'inte', 'som', 'på', 'med', 'för', 'vi', 'har', 'hej', 'tack', 'men', 'hur', 'vad', 'bra', 'kan'},
+    'pl': {'i', 'w', 'nie', 'to', 'jest', 'się', 'na', 'że', 'z', 'do', 'jak', 'co', 'ale', 'tak', 'dziękuję', 'cześć', 'mam', 'jestem', 'ty', 'ja', 'czy', 'dobrze'},
+    'tr': {'bir', 've', 'bu', 'ne', 'için', 'çok', 'ben', 'sen', 'evet', 'hayır', 'merhaba', 'teşekkürler', 'değil', 'var', 'yok', 'ama', 'gibi', 'nasıl', 'da', 'de', 'mi'},
+    'id': {'dan', 'yang', 'di', 'ini', 'itu', 'saya', 'kamu', 'tidak', 'ada', 'dengan', 'untuk', 'apa', 'aku', 'sudah', 'juga', 'terima', 'kasih', 'bisa', 'akan', 'ke', 'dari'},
+    'vi': {'và', 'là', 'của', 'có', 'không', 'tôi', 'bạn', 'một', 'những', 'được', 'cho', 'này', 'với', 'người', 'các', 'chào', 'cảm', 'ơn', 'rất', 'đã'},
+}
+
+# Letters that point strongly to one Latin-script language
+_CHARACTER_HINTS: Dict[str, str] = {
+    'ñ': 'es', '¿': 'es', '¡': 'es',
+    'ã': 'pt', 'õ': 'pt',
+    'ß': 'de',
+    'å': 'sv',
+    'ł': 'pl', 'ą': 'pl', 'ę': 'pl', 'ś': 'pl', 'ź': 'pl', 'ż': 'pl', 'ć': 'pl', 'ń': 'pl',
+    'ğ': 'tr', 'ş': 'tr', 'ı': 'tr',
+    'ơ': 'vi', 'ư': 'vi', 'đ': 'vi', 'ạ': 'vi', 'ả': 'vi', 'ế': 'vi', 'ề': 'vi', 'ộ': 'vi', 'ờ': 'vi', 'ữ': 'vi',
+    'œ': 'fr', 'ç': 'fr', 'è': 'fr', 'ê': 'fr', 'à': 'fr',
+}
+
+# Word hits after which more evidence no longer raises confidence
+_SATURATING_HITS = 2
+
+def _script_of(char: str) -> Optional[str]:
+    """Return the script bucket for a character, or None for Latin and everything else"""
+    code = ord(char)
+    for script, ranges in _SCRIPT_RANGES:
+        for start, end in ranges:
+            if start <= code <= end:
+                return script
+    return None
+
+def normalize_text(text: str) -> str:
+    """Lowercase text and collapse whitespace so trivially different messages share a cache entry"""
+    return ' '.join(text.lower().split())
+
+def detect_language_local(text: str) -> Tuple[Optional[str], float]:
+    """Guess the language of text without any network call.
+
+    Returns (language code, confidence between 0 and 1), or (None, 0.0) when
+    the text carries too little signal to make a guess.
+    """
+    cleaned = _NOISE_PATTERN.sub(' ', text)
+    letters = [char for char in cleaned if char.isalpha()]
+    if not letters:
+        return None, 0.0
+
+    # Non-Latin scripts mostly identify the language on their own
+    script_counts: Dict[str, int] = {}
+    for char in letters:
+        script = _script_of(char)
+        if script:
+            script_counts[script] = script_counts.get(script, 0) + 1
+
+    if script_counts:
+        # Kana marks Japanese even when most characters are Han
+        if 'ja' in script_counts:
+            share = (script_counts['ja'] + script_counts.get('han', 0)) / len(letters)
+            return 'ja', min(1.0, share)
+        script, count = max(script_counts.items(), key=lambda item: item[1])
+        share = count / len(letters)
+        if share >= 0.5:
+            if script == 'han':
+                if any(char in _TRADITIONAL_CHARS for char in letters):
+                    return 'zh-TW', share * 0.9
+                return 'zh-CN', share * 0.8
+            return script, share
+
+    # Latin script: score frequent words and telltale letters; a word several languages share is split between them
+    words = _WORD_PATTERN.findall(cleaned.lower())
+    scores: Dict[str, float] = {}
+    for word in words:
+        languages = [language for language, stopwords in _STOPWORDS.items() if word in stopwords]
+        for language in languages:
+            scores[language] = scores.get(language, 0) + 1 / len(languages)
+    for char in cleaned.lower():
+        language = _CHARACTER_HINTS.get(char)
+        if language:
+            scores[language] = scores.get(language, 0) + 0.5
+
+    if not scores:
+        return None, 0.0
+
+    ranked = sorted(scores.values(), reverse=True)
+    best_language = max(scores, key=scores.get)
+    best = ranked[0]
+    second = ranked[1] if len(ranked) > 1 else 0
+    # Confidence needs both a clear margin over the runner-up and enough evidence;
+    # short messages can't have many hits, so they need fewer of them
+    margin = (best - second) / best
+    evidence = min(1.0, best / min(_SATURATING_HITS, len(words) or 1))
+    return best_language, margin * evidence
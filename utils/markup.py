@@ -0,0 +1,89 @@
+import re
+from typing import List
+
+# Discord markup that must reach the reader unchanged
+_PROTECTED_PATTERN = re.compile(
+    r'```.*?```'  # Fenced code blocks
+    r'|`[^`\n]+`'  # Inline code
+    r'|https?://[^\s<>]+'  # URLs
+    r'|<a?:\w+:\d+>'  # Custom emoji
+    r'|<(?:@[!&]?|#)\d+>'  # User, role and channel mentions
+    r'|</[\w -]+:\d+>'  # Slash command mentions
+    r'|<t:-?\d+(?::[tTdDfFR])?>'  # Timestamps
+    r'|@(?:everyone|here)\b',
+    re.DOTALL
+)
+_PLACEHOLDER = '⟦{}⟧'
+# Providers sometimes add spaces inside the brackets
+_PLACEHOLDER_PATTERN = re.compile(r'⟦\s*(\d+)\s*⟧')
+
+class MaskedText:
+    """Text with its protected spans swapped for placeholders.
+
+    text is what gets translated; restore() puts the spans back into a
+    translation of it. Protected spans at the very start or end of the
+    message are kept out of text altogether.
+    """
+
+    def __init__(self, prefix: str, text: str, suffix: str, spans: List[str]):
+        self.prefix = prefix
+        self.text = text
+        self.suffix = suffix
+        self.spans = spans
+
+    @property
+    def translatable(self) -> bool:
+        """Whether anything is left to translate once protected spans are removed"""
+        return any(char.isalpha() for char in _PLACEHOLDER_PATTERN.sub('', self.text))
+
+    def restore(self, translated: str) -> str:
+        """Put the protected spans back into a translation of text"""
+        used = set()
+
+        def replace(match: re.Match) -> str:
+            index = int(match.group(1))
+            if index >= len(self.spans):
+                return match.group(0)
+            used.add(index)
+            return self.spans[index]
+
+        restored = _PLACEHOLDER_PATTERN.sub(replace, translated)
+        # Never lose a span the provider dropped; append it instead
+        missing = [span for index, span in enumerate(self.spans) if index not in used]
+        if missing:
+            restored = ' '.join([restored, *missing])
+        return self.prefix + restored + self.suffix
+
+def mask_markup(text: str) -> MaskedText:
+    """Replace code, URLs, mentions, custom emoji and timestamps with placeholders"""
+    matches = list(_PROTECTED_PATTERN.finditer(text))
+    if not matches:
+        return MaskedText('', text, '', [])
+
+    # Leading and trailing protected spans (and the whitespace around them) don't need to be sent at all
+    start, end = 0, len(text)
+    first, last = 0, len(matches)
+    while first < last and not text[start:matches[first].start()].strip():
+        start = matches[first].end()
+        first += 1
+    while last > first and not text[matches[last - 1].end():end].strip():
+        end = matches[last - 1].start()
+        last -= 1
+
+    # Whitespace next to the prefix and suffix stays with them
+    core = text[start:end]
+    core_start = start + len(core) - len(core.lstrip())
+    core_end = end - (len(core) - len(core.rstrip()))
+    if not core.strip():
+        core_start = core_end = start
+
+    spans = []
+    pieces = []
+    position = core_start
+    for match in matches[first:last]:
+        pieces.append(text[position:match.start()])
+        pieces.append(_PLACEHOLDER.format(len(spans)))
+        spans.append(match.group(0))
+        position = match.end()
+    pieces.append(text[position:core_end])
+    return MaskedText(text[:core_start], ''.join(pieces), text[core_end:], spans)
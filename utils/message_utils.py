@@ -1,50 +1,174 @@
 import discord
-from typing import Optional
+import asyncio
+from typing import Dict, List, Optional, Set
 import logging
 
 from config import CONFIG, LANGUAGE_TO_FLAG
+from metrics import STAGE_SECONDS
 from translation import translation_service
 from utils.language_utils import get_language_name
 
 logger = logging.getLogger('discord')
 
+WEBHOOK_NAME = "TongueTwist"
+
 def language_code_to_flag(code: str) -> str:
     if not code or len(code) < 2:
         return "🌐"
     code = code[:2].upper()
     return chr(ord(code[0]) + 127397) + chr(ord(code[1]) + 127397)
 
+# Webhooks per channel ID, reused across sends instead of being fetched every time
+_webhook_pools: Dict[int, List[discord.Webhook]] = {}
+_webhook_cursors: Dict[int, int] = {}
+_webhook_locks: Dict[int, asyncio.Lock] = {}
+
+async def get_channel_webhooks(channel: discord.TextChannel) -> List[discord.Webhook]:
+    """Get the channel's pool of bot webhooks, fetching or creating them on first use"""
+    pool = _webhook_pools.get(channel.id)
+    if pool:
+        return pool
+    
+    lock = _webhook_locks.setdefault(channel.id, asyncio.Lock())
+    async with lock:
+        pool = _webhook_pools.get(channel.id)
+        if pool:
+            return pool
+        
+        # Only webhooks created by the bot carry a token we can send with
+        pool = [
+            webhook for webhook in await channel.webhooks()
+            if webhook.name == WEBHOOK_NAME and webhook.token
+        ][:CONFIG['webhook_pool_size']]
+        
+        # Each webhook has its own rate-limit bucket, so a few of them spread the load
+        while len(pool) < CONFIG['webhook_pool_size']:
+            try:
+                pool.append(await channel.create_webhook(name=WEBHOOK_NAME))
+            except discord.HTTPException as e:
+                # Out of permissions or at Discord's per-channel webhook limit; make do with what we have
+                if not pool:
+                    raise
+                logger.warning(f"Could not grow webhook pool for channel {channel.id}: {e}")
+                break
+        
+        _webhook_pools[channel.id] = pool
+        return pool
+
+def invalidate_webhooks(channel_id: int):
+    """Forget a channel's cached webhooks so they are fetched again on next send"""
+    _webhook_pools.pop(channel_id, None)
+    _webhook_cursors.pop(channel_id, None)
+
+async def warm_webhooks(channel: discord.TextChannel):
+    """Fetch or create a channel's webhooks ahead of its first translated message"""
+    try:
+        await get_channel_webhooks(channel)
+    except Exception as e:
+        logger.warning(f"Could not prepare webhooks for channel {channel.id}: {e}")
+
+async def _next_webhook(channel: discord.TextChannel) -> discord.Webhook:
+    """Pick the next webhook in the channel's pool, round robin"""
+    with STAGE_SECONDS.time(handler='webhook', stage='webhook_fetch'):
+        pool = await get_channel_webhooks(channel)
+    cursor = _webhook_cursors.get(channel.id, 0)
+    _webhook_cursors[channel.id] = cursor + 1
+    return pool[cursor % len(pool)]
+
 async def send_translated_message(
     channel: discord.TextChannel,
     original_message: discord.Message,
     translated_text: str,
     source_lang: str,
-    target_lang: str
+    target_lang: str,
+    jump_link: bool = True
 ):
-    try:
-        # Get language flags
-        from config import LANGUAGE_TO_FLAG
-        source_flag = language_code_to_flag(source_lang)
-        target_flag = language_code_to_flag(target_lang)
-
-        # Get webhooks (or create one if missing)
-        webhooks = await channel.webhooks()
-        webhook = discord.utils.get(webhooks, name="TongueTwist")
-        if webhook is None:
-            webhook = await channel.create_webhook(name="TongueTwist")
-
-        # Username with translation label
-        display_name = original_message.author.display_name
-        username = f"{source_flag} → {target_flag} {original_message.author.display_name}"
-
-        # Send message impersonating original user
-        await webhook.send(
-            content=f"{translated_text}\n\n[🔗 Jump to Original]({original_message.jump_url})",
-            username=username,
-            avatar_url=original_message.author.display_avatar.url
-        )
-    except Exception as e:
-        logging.getLogger("discord").error(f"Webhook error: {e}")
+    """Post a translation through the channel's webhooks as the original author.
+
+    Discord errors are raised so the outbound scheduler can pause and retry on rate limits.
+    """
+    # Get language flags
+    source_flag = language_code_to_flag(source_lang)
+    target_flag = language_code_to_flag(target_lang)
+
+    # Username with translation label
+    username = f"{source_flag} → {target_flag} {original_message.author.display_name}"
+
+    content = translated_text
+    if jump_link:
+        content += f"\n\n[🔗 Jump to Original]({original_message.jump_url})"
+
+    # Send message impersonating original user; retry once with fresh webhooks if ours was deleted
+    for attempt in range(2):
+        webhook = await _next_webhook(channel)
+        try:
+            with STAGE_SECONDS.time(handler='webhook', stage='send'):
+                await webhook.send(
+                    content=content,
+                    username=username,
+                    avatar_url=original_message.author.display_avatar.url
+                )
+            return
+        except discord.NotFound:
+            invalidate_webhooks(channel.id)
+            if attempt:
+                raise
+
+
+def build_combined_messages(translations: Dict[str, str], max_length: int) -> List[str]:
+    """Lay out translations as one section per language, split into as few messages as fit max_length"""
+    messages = []
+    current = ""
+    for target_lang, translated_text in translations.items():
+        section = f"**{language_code_to_flag(target_lang)} {get_language_name(target_lang)}**\n{translated_text}"
+        # A section that is too long on its own is split across messages
+        pieces = [section[i:i + max_length] for i in range(0, len(section), max_length)]
+        for piece in pieces:
+            if current and len(current) + 2 + len(piece) > max_length:
+                messages.append(current)
+                current = ""
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        messages.append(current)
+    return messages
+
+async def send_combined_translation(
+    channel: discord.TextChannel,
+    original_message: discord.Message,
+    translations: Dict[str, str],
+    source_lang: str,
+    sent: Optional[Set[int]] = None
+):
+    """Send all translations of a message in one webhook message, or a few if they exceed the length limit.
+
+    Discord errors are raised so the outbound scheduler can pause and retry on
+    rate limits; pass the same sent set on every attempt so a retry skips the
+    messages that already went out.
+    """
+    sent = set() if sent is None else sent
+    source_flag = language_code_to_flag(source_lang)
+    username = f"{source_flag} → 🌐 {original_message.author.display_name}"
+    suffix = f"\n\n[🔗 Jump to Original]({original_message.jump_url})"
+    
+    for index, content in enumerate(build_combined_messages(translations, CONFIG['max_message_length'] - len(suffix))):
+        if index in sent:
+            continue
+        # Retry once with fresh webhooks if ours was deleted
+        for attempt in range(2):
+            webhook = await _next_webhook(channel)
+            try:
+                with STAGE_SECONDS.time(handler='webhook', stage='send'):
+                    await webhook.send(
+                        content=content + suffix,
+                        username=username,
+                        avatar_url=original_message.author.display_avatar.url
+                    )
+                sent.add(index)
+                break
+            except discord.NotFound:
+                invalidate_webhooks(channel.id)
+                if attempt:
+                    raise
 
 
 #         channel: discord.TextChannel,
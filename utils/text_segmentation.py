@@ -0,0 +1,67 @@
+import re
+from typing import List, Tuple
+
+# Places to split long text, from most to least preferred
+_BOUNDARIES = [
+    re.compile(r'\n\s*\n\s*'),  # Paragraphs
+    re.compile(r'\n'),  # Lines, including markdown list items, quotes and headings
+    re.compile(r'(?<=[.!?;。！？])\s+'),  # Sentences
+    re.compile(r'\s+'),  # Words
+]
+
+def _in_code_block(text: str, position: int) -> bool:
+    """Whether position falls inside a ``` fenced code block"""
+    return text.count('```', 0, position) % 2 == 1
+
+def _split(text: str, level: int, max_length: int) -> List[Tuple[str, str]]:
+    if len(text) <= max_length:
+        return [(text, '')]
+    if level == len(_BOUNDARIES):
+        # No boundary left to use, so cut at the limit
+        return [(text[i:i + max_length], '') for i in range(0, len(text), max_length)]
+
+    # Cut text into pieces at this level's boundaries, keeping each boundary as the piece's separator
+    pieces = []
+    start = 0
+    for match in _BOUNDARIES[level].finditer(text):
+        if match.start() == 0 or match.end() == len(text) or _in_code_block(text, match.start()):
+            continue
+        pieces.append((text[start:match.start()], match.group()))
+        start = match.end()
+    pieces.append((text[start:], ''))
+    if len(pieces) == 1:
+        return _split(text, level + 1, max_length)
+
+    # Pack pieces back together into segments as large as the limit allows
+    segments = []
+    current, current_separator = None, ''
+    for piece, separator in pieces:
+        if len(piece) > max_length:
+            if current is not None:
+                segments.append((current, current_separator))
+                current = None
+            parts = _split(piece, level + 1, max_length)
+            parts[-1] = (parts[-1][0], separator)
+            segments.extend(parts)
+            continue
+        if current is not None and len(current) + len(current_separator) + len(piece) > max_length:
+            segments.append((current, current_separator))
+            current = None
+        current = piece if current is None else current + current_separator + piece
+        current_separator = separator
+    if current is not None:
+        segments.append((current, current_separator))
+    return segments
+
+def split_segments(text: str, max_length: int) -> List[Tuple[str, str]]:
+    """Split text into (segment, separator) pairs of at most max_length characters.
+
+    Splits prefer paragraph, then line, then sentence, then word boundaries,
+    and avoid the inside of fenced code blocks. Joining each segment with the
+    separator that follows it gives back the original text.
+    """
+    return _split(text, 0, max_length)
+
+def join_segments(segments: List[str], separators: List[str]) -> str:
+    """Rebuild text from (translated) segments and the separators split_segments returned"""
+    return ''.join(segment + separator for segment, separator in zip(segments, separators))